@@ -1,3 +1,57 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from .aging import move_invoice_balance, record_invoice_balance
+from .archive import archive_invoices
+from .reports import move_invoice_rollups, record_invoice_rollups, saved_items
+from .models import Invoice, PeriodSummary
 
-# Register your models here.
+@admin.action(description='Archive selected invoices (close their period)', permissions=['delete'])
+def archive_selected(modeladmin, request, queryset):
+    moved = archive_invoices(queryset)
+    modeladmin.message_user(request, f"Archived {moved} invoices.", messages.SUCCESS)
+
+@admin.register(Invoice)
+class InvoiceAdmin(admin.ModelAdmin):
+    # Narrow to a cutoff with the date drill-down, then "select all" and archive
+    list_display = ('id', 'invoice_type', 'transaction_date', 'customer', 'supplier', 'total_amount')
+    list_filter = ('invoice_type',)
+    date_hierarchy = 'transaction_date'
+    actions = [archive_selected]
+
+    # Keep party balances and rollups in step with edits and deletes, as the API does
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            before = Invoice.objects.get(pk=obj.pk) if change else None
+            super().save_model(request, obj, form, change)
+            if before is None:
+                record_invoice_balance(obj)
+                record_invoice_rollups(obj, saved_items(obj))
+            else:
+                move_invoice_balance(before, obj)
+                move_invoice_rollups(before, obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            self.reverse_invoice(obj)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for invoice in queryset:
+                self.reverse_invoice(invoice)
+            super().delete_queryset(request, queryset)
+
+    def reverse_invoice(self, invoice):
+        record_invoice_balance(invoice, reverse=True)
+        record_invoice_rollups(invoice, saved_items(invoice), reverse=True)
+
+@admin.register(PeriodSummary)
+class PeriodSummaryAdmin(admin.ModelAdmin):
+    list_display = ('period', 'invoice_type', 'invoice_count', 'item_count', 'net_amount', 'tax_amount', 'total_amount')
+    list_filter = ('invoice_type',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
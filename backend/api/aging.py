@@ -0,0 +1,134 @@
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.utils import timezone
+from .bulk import update_rows
+from .models import ArchivedInvoice, Customer, Invoice, Supplier
+from .versioning import bump_versions
+
+# Balances are the invoiced totals: sales for customers, purchases for
+# suppliers, archived periods included. Each bucket is (field, first day
+# overdue, last day overdue); "overdue" counts from due_date to aged_on.
+AGING_BUCKETS = (
+    ('aging_current', None, 0),
+    ('aging_1_30', 1, 30),
+    ('aging_31_60', 31, 60),
+    ('aging_61_90', 61, 90),
+    ('aging_over_90', 91, None),
+)
+AGING_FIELDS = tuple(field for field, _, _ in AGING_BUCKETS)
+BALANCE_FIELDS = ('balance', *AGING_FIELDS, 'aged_on')
+# Party model -> (invoice type it takes part in, invoice column naming it)
+PARTY_SIDES = {Customer: ('SALE', 'customer_id'), Supplier: ('PURCHASE', 'supplier_id')}
+# Invoice fields that decide which balance and bucket it is booked under
+INVOICE_BALANCE_FIELDS = ('invoice_type', 'customer_id', 'supplier_id', 'due_date', 'total_amount')
+RECONCILE_CHUNK_SIZE = 1000
+ZERO = Decimal('0.00')
+
+Drift = namedtuple('Drift', 'party_id field stored expected')
+
+def aging_field(due_date, as_of):
+    overdue = (as_of - due_date).days if due_date else 0
+    for field, _, last in AGING_BUCKETS:
+        if last is None or overdue <= last:
+            return field
+
+def record_invoice_balance(invoice, reverse=False):
+    """Add a posted invoice to its customer's or supplier's balance, or take
+    it off again with ``reverse``; call inside its transaction."""
+    model = Customer if invoice.invoice_type == 'SALE' else Supplier
+    party_id = getattr(invoice, PARTY_SIDES[model][1])
+    if party_id is None:
+        return
+    amount = -invoice.total_amount if reverse else invoice.total_amount
+    # .update() skips auto_now, and balances are part of the change feed
+    updates = {'balance': F('balance') + amount, 'updated_at': timezone.now()}
+    if invoice.due_date is None:
+        updates['aging_current'] = F('aging_current') + amount
+    else:
+        # The bucket depends on the row's aged_on, so pick it in the UPDATE
+        # itself rather than read the row first
+        for field, first, last in AGING_BUCKETS:
+            window = Q()
+            if first is not None:
+                window &= Q(aged_on__gte=invoice.due_date + timedelta(days=first))
+            if last is not None:
+                window &= Q(aged_on__lte=invoice.due_date + timedelta(days=last))
+            updates[field] = Case(When(window, then=F(field) + amount), default=F(field))
+    model.objects.filter(pk=party_id).update(**updates)
+    # Balances are part of the party endpoints' output
+    bump_versions(model)
+
+def move_invoice_balance(before, invoice):
+    """Re-book an edited invoice (``before`` is a copy of it as it was) under
+    the party, type, due date and total it has now; call inside its transaction."""
+    if any(getattr(before, field) != getattr(invoice, field) for field in INVOICE_BALANCE_FIELDS):
+        record_invoice_balance(before, reverse=True)
+        record_invoice_balance(invoice)
+
+def _balances(owed, as_of):
+    values = dict.fromkeys(('balance', *AGING_FIELDS), ZERO)
+    for due_date, amount in owed:
+        values['balance'] += amount
+        field = aging_field(due_date, as_of)
+        values[field] += amount
+    return values
+
+def reconcile_balances(model, as_of=None, fix=True, chunk_size=RECONCILE_CHUNK_SIZE):
+    """Recompute ``model``'s (Customer or Supplier) balances from invoices and
+    return a Drift per stored value that disagrees with them.
+
+    Drift is judged as of each party's own aged_on; with ``fix`` every party
+    is then rewritten aged as of ``as_of`` (default today), which is also how
+    buckets move along as invoices fall overdue. Parties are locked a chunk
+    at a time, so postings for them wait rather than get overwritten.
+    """
+    as_of = as_of or timezone.localdate()
+    invoice_type, party_field = PARTY_SIDES[model]
+    drift = []
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            parties = list(
+                model.objects.filter(pk__gt=last_id).order_by('pk').select_for_update()
+                .only('pk', *BALANCE_FIELDS)[:chunk_size]
+            )
+            if not parties:
+                return drift
+            last_id = parties[-1].pk
+
+            owed = defaultdict(list)
+            for invoice_model in (Invoice, ArchivedInvoice):
+                rows = (
+                    invoice_model.objects.filter(invoice_type=invoice_type, **{f'{party_field}__in': [p.pk for p in parties]})
+                    .values_list(party_field, 'due_date')
+                    .annotate(amount=Sum('total_amount'))
+                    .order_by()
+                )
+                for party_id, due_date, amount in rows:
+                    # SQLite sums decimals as floats
+                    owed[party_id].append((due_date, amount.quantize(ZERO)))
+
+            changed = []
+            for party in parties:
+                for field, value in _balances(owed[party.pk], party.aged_on).items():
+                    if getattr(party, field) != value:
+                        drift.append(Drift(party.pk, field, getattr(party, field), value))
+                current = {**_balances(owed[party.pk], as_of), 'aged_on': as_of}
+                if any(getattr(party, field) != current[field] for field in BALANCE_FIELDS):
+                    changed.append((*(current[field] for field in BALANCE_FIELDS), timezone.now(), party.pk))
+            if fix and changed:
+                update_rows(model, (*BALANCE_FIELDS, 'updated_at'), changed)
+                bump_versions(model)
+
+def aging_report(parties, limit):
+    """Totals per bucket over ``parties`` plus the ``limit`` largest balances, from the stored fields alone."""
+    owing = parties.exclude(balance=0)
+    totals = owing.aggregate(count=Count('pk'), **{field: Sum(field, default=ZERO) for field in ('balance', *AGING_FIELDS)})
+    results = list(owing.order_by('-balance', 'pk').values('id', 'name', *BALANCE_FIELDS)[:limit])
+    for row in [totals, *results]:
+        for field in ('balance', *AGING_FIELDS):
+            row[field] = str(row[field].quantize(ZERO))
+    return {'totals': totals, 'results': results}
@@ -0,0 +1,45 @@
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+from .bulk import insert_from_query
+from .models import LowStockEntry, Product, StockAlert
+
+def sync_low_stock(product_ids, invoice=None):
+    """Bring the low-stock set in line with the current stock of ``product_ids``.
+
+    Only the given rows are examined, so callers pass just the products they
+    wrote. Each product that enters or leaves the set gets a StockAlert.
+    Call inside the transaction that changed the stock.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return []
+    listed = set(LowStockEntry.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+    levels = Product.objects.filter(pk__in=product_ids).values_list('id', 'stock_quantity', 'reorder_level')
+
+    occurred_at = invoice.transaction_date if invoice is not None else timezone.now()
+    entered, cleared, alerts = [], [], []
+    for product_id, stock, level in levels.order_by('id'):
+        low = stock < level
+        if low == (product_id in listed):
+            continue
+        (entered if low else cleared).append(product_id)
+        alerts.append(StockAlert(
+            product_id=product_id,
+            alert_type='LOW' if low else 'CLEARED',
+            stock_quantity=stock,
+            reorder_level=level,
+            invoice=invoice,
+            occurred_at=occurred_at,
+        ))
+    LowStockEntry.objects.bulk_create([LowStockEntry(product_id=pk, since=occurred_at) for pk in entered])
+    if cleared:
+        LowStockEntry.objects.filter(product_id__in=cleared).delete()
+    StockAlert.objects.bulk_create(alerts)
+    return alerts
+
+def rebuild_low_stock():
+    """Recompute the whole low-stock set without alerts (seeding, repairs)."""
+    LowStockEntry.objects.all().delete()
+    low = Product.objects.filter(stock_quantity__lt=F('reorder_level'))
+    return insert_from_query(LowStockEntry, ['product_id', 'since'], low.values_list('id', Now()))
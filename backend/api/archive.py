@@ -0,0 +1,105 @@
+from operator import itemgetter
+from django.db import transaction
+from django.db.models import Count, DateField, DateTimeField, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .bulk import delete_rows, insert_from_query
+from .models import (
+    ArchivedInvoice, ArchivedInvoiceItem, Invoice, InvoiceItem, PeriodSummary, StockAlert, StockMovement,
+)
+from .reports import increment
+from .sync import record_tombstones
+from .versioning import bump_versions
+
+# Closing a period moves its invoices out of the hot tables, so lists,
+# filters and index upkeep only pay for open periods. Daily rollups and the
+# stock ledger keep covering archived history.
+
+ARCHIVE_CHUNK_SIZE = 1000
+INVOICE_COLUMNS = [field.attname for field in Invoice._meta.concrete_fields]
+ITEM_COLUMNS = [field.attname for field in InvoiceItem._meta.concrete_fields]
+
+def archive_invoices(invoices, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Move ``invoices`` and their items into the archive tables, one transaction
+    per ``chunk_size`` invoices, adding them to the monthly PeriodSummary rows.
+    Returns how many invoices were moved.
+    """
+    invoices = invoices.order_by('id')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # Locked so an edit cannot land between the copy and the delete
+            ids = list(invoices.select_for_update().values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return moved
+            _archive_chunk(ids)
+        moved += len(ids)
+
+def _archive_chunk(ids):
+    invoices = Invoice.objects.filter(pk__in=ids)
+    items = InvoiceItem.objects.filter(invoice_id__in=ids)
+    _add_to_summaries(invoices, items)
+
+    archived_at = Value(timezone.now(), output_field=DateTimeField())
+    insert_from_query(ArchivedInvoice, [*INVOICE_COLUMNS, 'archived_at'], invoices.values_list(*INVOICE_COLUMNS, archived_at))
+    insert_from_query(ArchivedInvoiceItem, ITEM_COLUMNS, items.values_list(*ITEM_COLUMNS))
+
+    # Ledger movements and alerts outlive their invoice, as on a delete
+    StockMovement.objects.filter(invoice_id__in=ids).update(invoice=None)
+    StockAlert.objects.filter(invoice_id__in=ids).update(invoice=None)
+    items.delete()
+    # One statement and one version bump rather than a signal per invoice
+    delete_rows(Invoice, ids)
+    # Archived invoices leave the default list, so change feeds report them deleted
+    record_tombstones(Invoice, ids)
+    bump_versions(Invoice)
+
+def _add_to_summaries(invoices, items):
+    item_counts = {
+        (period, invoice_type): count
+        for period, invoice_type, count in (
+            items.annotate(period=TruncMonth('invoice__transaction_date', output_field=DateField()))
+            .values_list('period', 'invoice__invoice_type')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+    }
+    totals = (
+        invoices.annotate(period=TruncMonth('transaction_date', output_field=DateField()))
+        .values('period', 'invoice_type')
+        .annotate(count=Count('id'), net=Sum('net_amount'), tax=Sum('tax_amount'), total=Sum('total_amount'))
+        .order_by('period', 'invoice_type')
+    )
+    for row in totals:
+        key = (row['period'], row['invoice_type'])
+        increment(
+            PeriodSummary, {'period': row['period'], 'invoice_type': row['invoice_type']},
+            invoice_count=row['count'], item_count=item_counts.get(key, 0),
+            net_amount=row['net'], tax_amount=row['tax'], total_amount=row['total'],
+        )
+
+class MergedRows:
+    """Stands in for a queryset under CursorPagination to page through several
+    querysets at once (the hot and archived invoices) ordered by id.
+
+    ``serialize(queryset)`` turns a slice of one source into output dicts;
+    a page fetches up to its end from every source and keeps the first rows
+    of the merge, so each source pays at most one page per request.
+    """
+    def __init__(self, querysets, serialize, ordering='-id'):
+        self.querysets = querysets
+        self.serialize = serialize
+        self.ordering = ordering
+
+    def order_by(self, *ordering):
+        return MergedRows([queryset.order_by(*ordering) for queryset in self.querysets], self.serialize, ordering[0])
+
+    def filter(self, *args, **kwargs):
+        return MergedRows([queryset.filter(*args, **kwargs) for queryset in self.querysets], self.serialize, self.ordering)
+
+    def __getitem__(self, bounds):
+        rows = []
+        for queryset in self.querysets:
+            rows.extend(self.serialize(queryset[:bounds.stop]))
+        rows.sort(key=itemgetter(self.ordering.lstrip('-')), reverse=self.ordering.startswith('-'))
+        return rows[bounds]
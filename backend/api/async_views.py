@@ -0,0 +1,136 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Prefetch
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .authentication import ClaimsJWTAuthentication
+from .broadcast import get_broadcaster
+from .dashboard import aget_summary
+from .models import Category, Supplier, Customer, Product, Invoice, InvoiceItem
+from .serializers import (
+    CategorySerializer, SupplierSerializer, CustomerSerializer, ProductSerializer, InvoiceSerializer
+)
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Comment lines on idle streams keep proxies from timing them out
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_RETRY_MS = 3000
+
+# Read-only resources served natively under ASGI. Querysets preload every
+# relation the serializer touches, so serialization never reaches the DB.
+RESOURCES = {
+    'categories': (Category.objects.all(), CategorySerializer),
+    'suppliers': (Supplier.objects.all(), SupplierSerializer),
+    'customers': (Customer.objects.all(), CustomerSerializer),
+    'products': (Product.objects.select_related('category', 'supplier'), ProductSerializer),
+    'invoices': (
+        Invoice.objects.select_related('supplier', 'customer', 'user').prefetch_related(
+            Prefetch('items', queryset=InvoiceItem.objects.select_related('product'))
+        ),
+        InvoiceSerializer,
+    ),
+}
+
+_authenticator = ClaimsJWTAuthentication()
+
+async def _authenticate(request):
+    """Return the DRF request for an authenticated caller, or a 401 response."""
+    drf_request = Request(request)
+    try:
+        result = await sync_to_async(_authenticator.authenticate)(drf_request)
+    except (AuthenticationFailed, InvalidToken) as exc:
+        detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+        return None, JsonResponse(detail, status=exc.status_code)
+    if result is None:
+        return None, JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    drf_request.user, drf_request.auth = result
+    return drf_request, None
+
+def _page_size(request):
+    try:
+        return min(max(int(request.GET.get('page_size', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return PAGE_SIZE
+
+async def resource_list(request, resource):
+    """Newest-first keyset page; ``?before=<id>`` continues from the previous page."""
+    if resource not in RESOURCES:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    drf_request, error = await _authenticate(request)
+    if error:
+        return error
+    queryset, serializer_class = RESOURCES[resource]
+    size = _page_size(request)
+    before = request.GET.get('before')
+    if before:
+        try:
+            queryset = queryset.filter(id__lt=int(before))
+        except ValueError:
+            return JsonResponse({'detail': 'Invalid cursor.'}, status=400)
+    rows = [obj async for obj in queryset.order_by('-id')[:size + 1].aiterator(chunk_size=size + 1)]
+
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        params = request.GET.copy()
+        params['before'] = rows[-1].id
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    data = serializer_class(rows, many=True, context={'request': drf_request}).data
+    return JsonResponse({'next': next_url, 'previous': None, 'results': data})
+
+async def resource_detail(request, resource, pk):
+    if resource not in RESOURCES:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    drf_request, error = await _authenticate(request)
+    if error:
+        return error
+    queryset, serializer_class = RESOURCES[resource]
+    try:
+        obj = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        return JsonResponse({'detail': 'No %s matches the given query.' % queryset.model._meta.object_name}, status=404)
+    return JsonResponse(serializer_class(obj, context={'request': drf_request}).data)
+
+async def dashboard_summary(request):
+    _, error = await _authenticate(request)
+    if error:
+        return error
+    return JsonResponse(await aget_summary())
+
+async def stock_stream(request):
+    """Server-Sent Events: a ``stock`` event listing ``{id, stock_quantity}``
+    for the products each committed invoice changed. A ``reset`` event ends
+    the stream when the client has fallen behind; it should refetch and
+    reconnect. Needs ASGI, where an open stream holds no thread.
+    """
+    if not isinstance(request, ASGIRequest):
+        # WSGI collects an async body in full before sending it, which never
+        # happens for an endless stream; it would only pin a worker thread
+        return JsonResponse({'detail': 'The stock stream needs the ASGI server.'}, status=501)
+    _, error = await _authenticate(request)
+    if error:
+        return error
+    response = StreamingHttpResponse(_stock_events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def _stock_events():
+    with get_broadcaster().subscribe() as subscription:
+        yield f'retry: {STREAM_RETRY_MS}\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if message is None:
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            event, data = message
+            yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
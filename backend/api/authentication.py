@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+# How long a worker trusts its cached copy of a user's token version. A
+# role change, deactivation or delete is seen at once by the worker that
+# made it (and by all of them with a shared cache); other locmem workers see
+# it within this window.
+AUTH_STATE_TTL = 30
+
+def _state_key(user_id):
+    return f'auth:user:{user_id}'
+
+def get_auth_state(user_id):
+    """Return ``(token_version, is_active)`` for a user, or None if they don't exist."""
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = User.objects.filter(pk=user_id).values_list('token_version', 'is_active').first()
+        if state is None:
+            return None
+        cache.set(key, state, AUTH_STATE_TTL)
+    return state
+
+def forget_auth_state(user_id):
+    cache.delete(_state_key(user_id))
+
+def revoke_claims(user):
+    """Invalidate role/username claims in tokens already issued to ``user``."""
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    forget_auth_state(user.pk)
+
+class ClaimsUser(TokenUser):
+    """Request user built from token claims (``role``, ``username``) with no DB row."""
+
+    @property
+    def role(self):
+        return self.token.get('role')
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the token's claims while they are current.
+
+    The only lookup is the user's token version, served from a short-lived
+    cache. Tokens minted before a role change carry an older version and fall
+    back to loading the full ``User`` row.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidToken("Token contained no recognizable user identification") from e
+
+        state = get_auth_state(user_id)
+        if state is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        token_version, is_active = state
+        if not is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if 'role' in validated_token and validated_token.get('token_version') == token_version:
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
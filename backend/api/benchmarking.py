@@ -0,0 +1,31 @@
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def latency_report(latencies, errors, elapsed, percentiles=(50, 99)):
+    """Throughput and latency percentiles (ms) for one benchmark run."""
+    report = {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'req_per_sec': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+    for pct in percentiles:
+        value = percentile(latencies, pct)
+        report[f'p{pct}_ms'] = round(value * 1000, 2) if value is not None else None
+    return report
+
+def compare_to_baseline(results, baseline):
+    """Percent change per endpoint and metric against a stored run (negative is faster for latencies)."""
+    changes = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            metric: round((current[metric] - previous[metric]) / previous[metric] * 100, 1)
+            for metric in ('req_per_sec', 'p50_ms', 'p95_ms', 'p99_ms')
+            if current.get(metric) is not None and previous.get(metric)
+        }
+    return changes
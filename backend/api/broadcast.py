@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .models import Product
+
+# Messages a subscriber may fall behind by before its stream is reset
+SUBSCRIBER_BUFFER = 100
+
+class LocalBackend:
+    """Delivers published messages to this process's subscribers only.
+
+    A backend has ``publish(message)``, called from any thread, and
+    ``start(deliver)``, after which it calls ``deliver(message)`` for every
+    message published through it (from any process it relays between).
+    """
+    in_process = True
+
+    def __init__(self):
+        self.deliver = None
+
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, message):
+        self.deliver(message)
+
+class Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_BUFFER)
+        self.overflowed = False
+
+    def put(self, message):
+        # Runs on self.loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Drop the backlog and end the stream; the client resyncs
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self):
+        """Next message, or None once this subscriber has fallen too far behind."""
+        return await self.queue.get()
+
+class Broadcaster:
+    """Fans messages out to subscribers waiting on asyncio queues, so an idle
+    subscriber costs a queue rather than a thread. Publishing is thread-safe.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        # Event loop -> its subscriptions; each loop gets one wake-up per message
+        self._subscribers = {}
+        backend.start(self._fan_out)
+
+    def has_listeners(self):
+        return not self.backend.in_process or bool(self._subscribers)
+
+    def publish(self, message):
+        self.backend.publish(message)
+
+    @contextmanager
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(loop)
+        with self._lock:
+            self._subscribers.setdefault(loop, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscriptions = self._subscribers.get(loop, set())
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    self._subscribers.pop(loop, None)
+
+    def _fan_out(self, message):
+        with self._lock:
+            targets = [(loop, list(subscriptions)) for loop, subscriptions in self._subscribers.items()]
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(_put_all, subscriptions, message)
+            except RuntimeError:
+                # Loop closed without its subscribers unwinding
+                with self._lock:
+                    self._subscribers.pop(loop, None)
+
+def _put_all(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.put(message)
+
+_broadcasters = {}
+_broadcasters_lock = threading.Lock()
+
+def get_broadcaster():
+    path = settings.STOCK_BROADCAST_BACKEND
+    with _broadcasters_lock:
+        if path not in _broadcasters:
+            _broadcasters[path] = Broadcaster(import_string(path)())
+        return _broadcasters[path]
+
+def publish_stock_levels(product_ids):
+    """Send the committed stock of ``product_ids`` as one ``stock`` event; run from on_commit."""
+    broadcaster = get_broadcaster()
+    if not broadcaster.has_listeners():
+        return
+    rows = Product.objects.filter(pk__in=product_ids).order_by('pk').values('id', 'stock_quantity')
+    broadcaster.publish(('stock', list(rows)))
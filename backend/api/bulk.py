@@ -0,0 +1,62 @@
+from django.db import connection
+
+# Set-based inserts and deletes for rebuilds, seeding and archival, where
+# building a model instance per row would dominate the cost.
+
+BULK_BATCH_SIZE = 5000
+
+def _insert_sql(model, columns):
+    qn = connection.ops.quote_name
+    return 'INSERT INTO %s (%s)' % (model._meta.db_table, ', '.join(qn(column) for column in columns))
+
+def insert_rows(model, columns, rows, batch_size=BULK_BATCH_SIZE):
+    """Insert tuples of database-ready values (see ``adapt_datetime``) with executemany."""
+    sql = '%s VALUES (%s)' % (_insert_sql(model, columns), ', '.join(['%s'] * len(columns)))
+    count = 0
+    with connection.cursor() as cursor:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+    return count
+
+def insert_from_query(model, columns, queryset):
+    """``INSERT INTO model (columns) SELECT ...`` from a values()/values_list() queryset
+    whose selected expressions line up with ``columns``."""
+    select_sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{_insert_sql(model, columns)} {select_sql}', params)
+        return cursor.rowcount
+
+def update_rows(model, columns, rows, batch_size=BULK_BATCH_SIZE):
+    """UPDATE ``columns`` from tuples of values followed by the row's primary key,
+    with executemany; unlike bulk_update's CASE per column it stays linear."""
+    qn = connection.ops.quote_name
+    sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+        qn(model._meta.db_table), ', '.join(f'{qn(column)} = %s' for column in columns), qn(model._meta.pk.column),
+    )
+    rows = list(rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+    return len(rows)
+
+def delete_rows(model, pks):
+    """DELETE rows by primary key in one statement, without loading instances
+    or sending per-row signals; callers handle related rows themselves."""
+    qn = connection.ops.quote_name
+    sql = 'DELETE FROM %s WHERE %s IN (%s)' % (
+        qn(model._meta.db_table), qn(model._meta.pk.column), ', '.join(['%s'] * len(pks)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(pks))
+        return cursor.rowcount
+
+def adapt_datetime(value):
+    return connection.ops.adapt_datetimefield_value(value)
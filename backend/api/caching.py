@@ -0,0 +1,51 @@
+import time
+from django.core.cache import cache
+
+RESPONSE_CACHE_TIMEOUT = 600
+HITS_KEY = 'response-cache:hits'
+MISSES_KEY = 'response-cache:misses'
+
+def _generation_key(label):
+    return f'generation:{label}'
+
+def get_generations(models):
+    """Return ``{label: generation}`` for ``models`` straight from the cache.
+
+    A missing (never set or evicted) generation is seeded from the clock, so
+    it can never collide with a value that earlier cached payloads used.
+    """
+    keys = {_generation_key(model._meta.label_lower): model._meta.label_lower for model in models}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        found[key] = cache.get(key)
+    return {keys[key]: value for key, value in found.items()}
+
+def bump_generations(labels):
+    for label in labels:
+        key = _generation_key(label)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+def get_cached_response(key):
+    data = cache.get(key)
+    _count(HITS_KEY if data is not None else MISSES_KEY)
+    return data
+
+def set_cached_response(key, data):
+    cache.set(key, data, RESPONSE_CACHE_TIMEOUT)
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
@@ -0,0 +1,67 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from .models import Category, LowStockEntry, Product
+
+DASHBOARD_CACHE_KEY = 'dashboard:summary'
+DASHBOARD_CACHE_TIMEOUT = 300 # Safety net; writes invalidate the snapshot explicitly
+
+def _totals():
+    stock_value = ExpressionWrapper(
+        F('price') * F('stock_quantity'),
+        output_field=DecimalField(max_digits=20, decimal_places=2)
+    )
+    return {'products_count': Count('id'), 'total_value': Sum(stock_value)}
+
+def _distribution():
+    return (
+        Product.objects.values('category__name')
+        .annotate(count=Count('id'))
+        .order_by('category__name')
+    )
+
+def _build_summary(totals, low_stock_count, categories_count, distribution):
+    total_value = totals['total_value'] or Decimal('0')
+    return {
+        'products_count': totals['products_count'],
+        'total_value': str(total_value.quantize(Decimal('0.01'))),
+        'low_stock_count': low_stock_count,
+        'categories_count': categories_count,
+        'category_distribution': [
+            {'name': row['category__name'] or 'Uncategorized', 'count': row['count']}
+            for row in distribution
+        ],
+    }
+
+def compute_summary():
+    return _build_summary(
+        Product.objects.aggregate(**_totals()),
+        LowStockEntry.objects.count(),
+        Category.objects.count(),
+        _distribution(),
+    )
+
+async def acompute_summary():
+    return _build_summary(
+        await Product.objects.aaggregate(**_totals()),
+        await LowStockEntry.objects.acount(),
+        await Category.objects.acount(),
+        [row async for row in _distribution()],
+    )
+
+def get_summary():
+    summary = cache.get(DASHBOARD_CACHE_KEY)
+    if summary is None:
+        summary = compute_summary()
+        cache.set(DASHBOARD_CACHE_KEY, summary, DASHBOARD_CACHE_TIMEOUT)
+    return summary
+
+async def aget_summary():
+    summary = await cache.aget(DASHBOARD_CACHE_KEY)
+    if summary is None:
+        summary = await acompute_summary()
+        await cache.aset(DASHBOARD_CACHE_KEY, summary, DASHBOARD_CACHE_TIMEOUT)
+    return summary
+
+def invalidate_summary():
+    cache.delete(DASHBOARD_CACHE_KEY)
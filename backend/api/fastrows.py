@@ -0,0 +1,195 @@
+import json
+from itertools import islice
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, fields, relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from .metrics import time_serialization
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used without it
+    orjson = None
+
+# Serializer fields whose to_representation hands values of these columns back unchanged
+PASSTHROUGH_FIELDS = (fields.IntegerField, fields.CharField, fields.ChoiceField, fields.BooleanField)
+PASSTHROUGH_COLUMNS = (models.IntegerField, models.CharField, models.TextField, models.BooleanField)
+
+_encoder = JSONEncoder()
+_plans = {}
+
+def dumps(data):
+    """JSON bytes identical to DRF's compact JSONRenderer output, via orjson when installed."""
+    if orjson is None:
+        text = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+        output = text.encode()
+    else:
+        # Dates and datetimes go through DRF's encoder for its "Z" suffix
+        output = orjson.dumps(data, default=_encoder.default,
+                              option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+    # Same escaping as JSONRenderer, keeping the output a JavaScript subset
+    return output.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+def _decimal_converter(field):
+    # Column values already carry exactly decimal_places digits, so plain
+    # formatting matches DRF's quantize-then-format without a context copy
+    plain = (
+        getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        and field.decimal_places is not None
+        and not field.localize and not field.normalize_output
+    )
+    if not plain:
+        return field.to_representation
+    spec = f'.{field.decimal_places}f'
+    return lambda value: format(value, spec)
+
+def _datetime_converter(field):
+    # DRF looks up the active timezone for every value; resolve it once per
+    # batch instead (see FastRows._serialize). Other formats go through DRF.
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if not settings.USE_TZ or hasattr(field, 'timezone') or (output_format or '').lower() != ISO_8601:
+        return field.to_representation
+
+    def bind(tz):
+        def convert(value):
+            if value.utcoffset() is None:
+                return field.to_representation(value)
+            text = value.astimezone(tz).isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return convert
+    bind.needs_timezone = True
+    return bind
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+class FastRows:
+    """Reproduces a ModelSerializer's read output from ``values_list()`` rows.
+
+    Handles concrete model fields, primary-key relations, read-only dotted
+    sources across foreign keys (``category.name``, omitted like DRF does
+    when the key is null) and nested ``many=True`` serializers over a
+    reverse foreign key. Anything else raises ImproperlyConfigured, so a
+    serializer change cannot silently diverge from this path.
+
+    ``model`` reads from a table with the serializer model's field names
+    instead, such as the invoice archive.
+    """
+    def __init__(self, serializer, model=None):
+        self.model = model or serializer.Meta.model
+        # The primary key comes first: nested rows and cursor pagination key on it
+        self.columns = [self.model._meta.pk.name]
+        self.foreign_key = None  # Column linking nested rows to their parent
+        # (name, column index, convert, guard column indexes, nested FastRows, nested foreign key)
+        self.plan = []
+        for name, field in serializer.fields.items():
+            if not field.write_only:
+                self.plan.append(self.compile(name, field))
+
+    @classmethod
+    def for_serializer(cls, serializer, model=None):
+        key = (type(serializer), tuple(serializer.fields), model)
+        plan = _plans.get(key)
+        if plan is None:
+            plan = _plans[key] = cls(serializer, model)
+        return plan
+
+    def column(self, lookup):
+        if lookup not in self.columns:
+            self.columns.append(lookup)
+        return self.columns.index(lookup)
+
+    def compile(self, name, field):
+        try:
+            return self._compile(name, field)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"{name}: '{field.source}' is not a model field")
+
+    def _compile(self, name, field):
+        path = field.source.split('.')
+        if isinstance(field, serializers.ListSerializer):
+            relation = self.model._meta.get_field(field.source)
+            remote = relation.remote_field
+            child = FastRows(field.child, relation.related_model)
+            child.foreign_key = child.column(remote.attname)
+            return (name, None, None, (), child, remote.attname)
+
+        # Every hop but the last must be a foreign key; a null one drops the field
+        model, guards = self.model, []
+        for depth, attr in enumerate(path[:-1]):
+            relation = model._meta.get_field(attr)
+            if not relation.many_to_one:
+                raise ImproperlyConfigured(f"{name}: '{field.source}' does not follow foreign keys")
+            guards.append(self.column('__'.join(path[:depth + 1])))
+            model = relation.related_model
+        model_field = model._meta.get_field(path[-1])
+        if not model_field.concrete or model_field.many_to_many:
+            raise ImproperlyConfigured(f"{name}: '{field.source}' is not a column")
+        lookup = '__'.join(path)
+
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            convert = None
+        elif isinstance(field, (relations.RelatedField, relations.ManyRelatedField, serializers.BaseSerializer)):
+            raise ImproperlyConfigured(f"{name}: {type(field).__name__} is not supported")
+        elif isinstance(field, PASSTHROUGH_FIELDS) and isinstance(model_field, PASSTHROUGH_COLUMNS):
+            convert = None
+        elif isinstance(field, fields.DecimalField) and isinstance(model_field, models.DecimalField):
+            convert = _decimal_converter(field)
+        elif isinstance(field, fields.DateTimeField) and isinstance(model_field, models.DateTimeField):
+            convert = _datetime_converter(field)
+        else:
+            convert = field.to_representation
+        return (name, self.column(lookup), convert, tuple(guards), None, None)
+
+    def values(self, queryset, named=False):
+        return queryset.prefetch_related(None).values_list(*self.columns, named=named)
+
+    def serialize(self, rows):
+        """Output dicts for ``rows`` from ``values()``, with nested rows fetched in one query."""
+        return time_serialization(self._serialize, rows)
+
+    def _serialize(self, rows):
+        rows = list(rows)
+        nested = {
+            name: child.grouped(foreign_key, [row[0] for row in rows])
+            for name, _, _, _, child, foreign_key in self.plan if child is not None
+        }
+        tz = timezone.get_current_timezone()
+        plan = [
+            (name, index, convert(tz) if getattr(convert, 'needs_timezone', False) else convert, guards, child)
+            for name, index, convert, guards, child, _ in self.plan
+        ]
+        results = []
+        for row in rows:
+            output = {}
+            for name, index, convert, guards, child in plan:
+                if child is not None:
+                    output[name] = nested[name].get(row[0], [])
+                    continue
+                if guards and any(row[guard] is None for guard in guards):
+                    continue
+                value = row[index]
+                output[name] = value if value is None or convert is None else convert(value)
+            results.append(output)
+        return results
+
+    def grouped(self, foreign_key, parent_ids):
+        # One pass over the children of every parent in the page
+        rows = list(self.values(self.model.objects.filter(**{f'{foreign_key}__in': parent_ids}).order_by('pk')))
+        groups = {}
+        for row, output in zip(rows, self._serialize(rows)):
+            groups.setdefault(row[self.foreign_key], []).append(output)
+        return groups
+
+    def iter_serialized(self, queryset, chunk_size):
+        """Stream output dicts for ``queryset``, ``chunk_size`` rows per query."""
+        rows = self.values(queryset).iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            yield from self.serialize(chunk)
@@ -0,0 +1,49 @@
+from datetime import date, datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import filters, serializers
+from .models import Invoice
+
+def parse_day(value, param):
+    try:
+        # Raises ValueError for well-formed but impossible dates (2020-02-30)
+        day = parse_date(value) if value else None
+    except ValueError:
+        day = None
+    # The day after is the exclusive upper bound, so the last date cannot be used
+    if value and (day is None or day == date.max):
+        raise serializers.ValidationError({param: 'Expected a date in YYYY-MM-DD format.'})
+    return day
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def filter_invoices(queryset, params):
+    """Filter invoices by ``invoice_type``, ``customer``/``supplier`` id and an
+    inclusive ``date_from``/``date_to`` range, read from the mapping ``params``.
+
+    Dates become datetime bounds on ``transaction_date`` (rather than a
+    ``__date`` lookup) so the column's index stays usable.
+    """
+    invoice_type = params.get('invoice_type')
+    if invoice_type:
+        if invoice_type not in dict(Invoice.INVOICE_TYPES):
+            raise serializers.ValidationError({'invoice_type': 'Expected PURCHASE or SALE.'})
+        queryset = queryset.filter(invoice_type=invoice_type)
+    for party in ('customer', 'supplier'):
+        party_id = params.get(party)
+        if party_id:
+            if not party_id.isdigit():
+                raise serializers.ValidationError({party: 'Expected an id.'})
+            queryset = queryset.filter(**{f'{party}_id': int(party_id)})
+    date_from = parse_day(params.get('date_from'), 'date_from')
+    if date_from:
+        queryset = queryset.filter(transaction_date__gte=_start_of(date_from))
+    date_to = parse_day(params.get('date_to'), 'date_to')
+    if date_to:
+        queryset = queryset.filter(transaction_date__lt=_start_of(date_to + timedelta(days=1)))
+    return queryset
+
+class InvoiceFilterBackend(filters.BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        return filter_invoices(queryset, request.query_params)
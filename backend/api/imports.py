@@ -0,0 +1,143 @@
+import csv
+import io
+from functools import partial
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import DecimalValidator
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from .dashboard import invalidate_summary
+from .ledger import record_adjustments
+from .alerts import sync_low_stock
+from .broadcast import publish_stock_levels
+from .versioning import bump_versions
+from .models import Category, Supplier, Product
+
+IMPORT_BATCH_SIZE = 1000
+REQUIRED_COLUMNS = ('sku', 'name', 'price')
+# Columns copied onto existing rows when a SKU already exists
+UPDATABLE_COLUMNS = ('name', 'description', 'price', 'stock_quantity', 'category', 'supplier')
+# The columns' limits; SQLite would store longer values, PostgreSQL would fail the batch
+PRICE_VALIDATOR = DecimalValidator(Product._meta.get_field('price').max_digits, Product._meta.get_field('price').decimal_places)
+MAX_LENGTHS = {column: Product._meta.get_field(column).max_length for column in ('sku', 'name')}
+
+def _name_map(model):
+    return {name.strip().lower(): pk for pk, name in model.objects.values_list('id', 'name')}
+
+class ProductCatalogImport:
+    """Upserts products from a CSV stream keyed on ``sku``, one batch at a time.
+
+    Category and supplier columns hold names, resolved through lookup maps
+    built once up front. Only columns present in the header are written.
+    """
+    def __init__(self, fileobj, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+        self.reader = csv.DictReader(io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline=''))
+        self.batch_size = batch_size
+        # Called with no arguments after each committed batch (job progress)
+        self.on_batch = on_batch
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = []
+
+    def run(self):
+        columns = {name.strip().lower() for name in (self.reader.fieldnames or [])}
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ValidationError({'file': f"Missing required columns: {', '.join(missing)}"})
+        self.update_fields = [name for name in UPDATABLE_COLUMNS if name in columns] + ['updated_at']
+        self.categories = _name_map(Category)
+        self.suppliers = _name_map(Supplier)
+
+        batch = {}
+        for row in self.reader:
+            row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+            try:
+                product = self.build_product(row)
+            except ValueError as exc:
+                self.rejected.append({'line': self.reader.line_num, 'sku': row.get('sku', ''), 'reason': str(exc)})
+                continue
+            # A repeated SKU in one upsert statement is an error on some
+            # backends, so flush first and let the later row win as an update.
+            if product.sku in batch or len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = {}
+            batch[product.sku] = product
+        self.flush(batch)
+        return {'inserted': self.inserted, 'updated': self.updated, 'rejected': self.rejected}
+
+    def build_product(self, row):
+        if not row.get('sku'):
+            raise ValueError('sku is required')
+        if not row.get('name'):
+            raise ValueError('name is required')
+        for column, max_length in MAX_LENGTHS.items():
+            if len(row[column]) > max_length:
+                raise ValueError(f'{column} is longer than {max_length} characters')
+        try:
+            price = Decimal(row['price'])
+        except InvalidOperation:
+            raise ValueError(f"invalid price '{row['price']}'")
+        # is_finite first: NaN cannot be compared and Infinity has no exponent
+        if not price.is_finite() or price < 0:
+            raise ValueError(f"invalid price '{row['price']}'")
+        try:
+            PRICE_VALIDATOR(price)
+        except DjangoValidationError:
+            raise ValueError(f"invalid price '{row['price']}'")
+        try:
+            stock_quantity = int(row.get('stock_quantity') or 0)
+        except ValueError:
+            raise ValueError(f"invalid stock_quantity '{row['stock_quantity']}'")
+        return Product(
+            sku=row['sku'],
+            name=row['name'],
+            description=row.get('description', ''),
+            price=price,
+            stock_quantity=stock_quantity,
+            category_id=self.resolve(self.categories, row.get('category'), 'category'),
+            supplier_id=self.resolve(self.suppliers, row.get('supplier'), 'supplier'),
+        )
+
+    def resolve(self, lookup, name, label):
+        if not name:
+            return None
+        try:
+            return lookup[name.lower()]
+        except KeyError:
+            raise ValueError(f"unknown {label} '{name}'")
+
+    def flush(self, batch):
+        if not batch:
+            return
+        with transaction.atomic():
+            existing = dict(Product.objects.select_for_update().filter(sku__in=batch).values_list('sku', 'stock_quantity'))
+            Product.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=self.update_fields,
+            )
+            if 'stock_quantity' in self.update_fields or len(existing) < len(batch):
+                self.record_stock_changes(batch, existing)
+            # bulk_create bypasses post_save, so invalidate explicitly
+            transaction.on_commit(invalidate_summary)
+            bump_versions(Product)
+        self.updated += len(existing)
+        self.inserted += len(batch) - len(existing)
+        if self.on_batch:
+            self.on_batch()
+
+    def record_stock_changes(self, batch, existing):
+        # New SKUs open with their quantity; updated SKUs only if stock was imported
+        ids = dict(Product.objects.filter(sku__in=batch).values_list('sku', 'id'))
+        deltas = {}
+        for sku, product in batch.items():
+            if sku not in existing:
+                deltas[ids[sku]] = product.stock_quantity
+            elif 'stock_quantity' in self.update_fields:
+                deltas[ids[sku]] = product.stock_quantity - existing[sku]
+        record_adjustments(deltas)
+        sync_low_stock(deltas)
+        changed = sorted(product_id for product_id, delta in deltas.items() if delta)
+        if changed:
+            transaction.on_commit(partial(publish_stock_levels, changed))
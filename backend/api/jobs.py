@@ -0,0 +1,217 @@
+import heapq
+import io
+import logging
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+from operator import itemgetter
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, INVOICE_CSV_FIELDS, export_lines, invoice_csv_rows
+from .fastrows import FastRows
+from .filters import filter_invoices
+from .imports import ProductCatalogImport
+from .models import ArchivedInvoice, ArchivedInvoiceItem, Invoice, InvoiceItem, Job, Product
+from .permissions import IsAdmin, IsEditor, IsViewer
+from .reports import rebuild_rollups
+from .serializers import InvoiceSerializer, ProductSerializer
+
+# Jobs are rows in api_job. Any number of run_worker processes claim them
+# with a compare-and-set UPDATE, so each job runs once per attempt; a
+# handler that fails after committing some work may see it again on retry.
+
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+# A running job whose worker has not checked in for this long is presumed lost
+LEASE_SECONDS = 300
+# Failures that a retry cannot fix
+PERMANENT_ERRORS = (ValidationError, CommandError)
+INVOICE_FILTER_PARAMS = ('invoice_type', 'customer', 'supplier', 'date_from', 'date_to')
+
+logger = logging.getLogger('api.jobs')
+
+# handler(job, progress) returns the JSON result; clean(params) returns the
+# params to store, raising ValidationError; permission gates enqueueing.
+JobType = namedtuple('JobType', 'handler clean permission needs_upload')
+JOB_TYPES = {}
+
+def job_type(name, clean, permission, needs_upload=False):
+    def register(handler):
+        JOB_TYPES[name] = JobType(handler, clean, permission, needs_upload)
+        return handler
+    return register
+
+def job_file_path(name):
+    return Path(settings.JOB_FILES_DIR) / name
+
+def _no_params(params):
+    return {}
+
+def _export_params(params):
+    export_format = params.get('export_format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise ValidationError({'export_format': f"Expected one of: {', '.join(EXPORT_FORMATS)}."})
+    return {'export_format': export_format}
+
+def _invoice_export_params(params):
+    filters = {name: str(params[name]) for name in INVOICE_FILTER_PARAMS if params.get(name) not in (None, '')}
+    filter_invoices(Invoice.objects.none(), filters)  # Raises on bad values
+    include_archived = params.get('include_archived') in (True, '1', 'true')
+    return {**_export_params(params), **filters, 'include_archived': include_archived}
+
+def _write_export(job, name, rows, total, fieldnames, progress):
+    """Write an export file for ``job``, reporting progress per chunk of rows."""
+    export_format = job.params['export_format']
+    filename = f'job-{job.pk}-{name}.{export_format}'
+    path = job_file_path(filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+
+    def counted():
+        nonlocal written
+        for row in rows:
+            yield row
+            written += 1
+            if written % EXPORT_CHUNK_SIZE == 0:
+                progress(written, total)
+
+    with open(path, 'w', encoding='utf-8', newline='') as out:
+        out.writelines(export_lines(counted(), fieldnames, export_format))
+    return {'file': filename, 'rows': written, 'bytes': path.stat().st_size}
+
+@job_type('export_products', _export_params, IsViewer)
+def export_products(job, progress):
+    products = Product.objects.order_by('id')
+    serializer = ProductSerializer()
+    rows = FastRows.for_serializer(serializer).iter_serialized(products, EXPORT_CHUNK_SIZE)
+    return _write_export(job, 'products', rows, products.count(), list(serializer.fields), progress)
+
+@job_type('export_invoices', _invoice_export_params, IsViewer)
+def export_invoices(job, progress):
+    models = [(Invoice, InvoiceItem)]
+    if job.params.get('include_archived'):
+        models.append((ArchivedInvoice, ArchivedInvoiceItem))
+    streams, total = [], 0
+    for invoice_model, item_model in models:
+        invoices = filter_invoices(invoice_model.objects.order_by('id'), job.params)
+        if job.params['export_format'] == 'ndjson':
+            rows = FastRows.for_serializer(InvoiceSerializer(), invoice_model)
+            streams.append(rows.iter_serialized(invoices, EXPORT_CHUNK_SIZE))
+            total += invoices.count()
+        else:
+            streams.append(invoice_csv_rows(invoices))
+            total += item_model.objects.filter(invoice__in=invoices.values('pk')).count()
+    key = itemgetter('id' if job.params['export_format'] == 'ndjson' else 'invoice_id')
+    return _write_export(job, 'invoices', heapq.merge(*streams, key=key), total, INVOICE_CSV_FIELDS, progress)
+
+@job_type('import_products', _no_params, IsEditor, needs_upload=True)
+def import_products(job, progress):
+    path = job_file_path(job.params['upload'])
+    size = path.stat().st_size
+    with open(path, 'rb') as upload:
+        result = ProductCatalogImport(upload, on_batch=lambda: progress(upload.tell(), size)).run()
+    path.unlink()
+    return result
+
+@job_type('rebuild_rollups', _no_params, IsEditor)
+def rebuild_rollups_job(job, progress):
+    with transaction.atomic():
+        product_rows, party_rows = rebuild_rollups()
+    return {'product_rows': product_rows, 'party_rows': party_rows}
+
+@job_type('backfill_stock_ledger', lambda params: {'reset': bool(params.get('reset'))}, IsAdmin)
+def backfill_stock_ledger(job, progress):
+    out = io.StringIO()
+    call_command('backfill_stock_ledger', reset=job.params['reset'], stdout=out)
+    return {'output': out.getvalue().strip()}
+
+def save_upload(upload):
+    """Copy an uploaded file into JOB_FILES_DIR for a worker; returns its name there."""
+    name = f'upload-{uuid.uuid4().hex}.csv'
+    path = job_file_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as out:
+        for chunk in upload.chunks():
+            out.write(chunk)
+    return name
+
+def enqueue(job_type, params=None, user_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    return Job.objects.create(job_type=job_type, params=params or {}, created_by_id=user_id, max_attempts=max_attempts)
+
+def report_progress(job_id, done, total):
+    # 100 is left for completion
+    percent = min(done * 100 // total, 99) if total else 0
+    try:
+        # Progress also proves the job is alive, so it renews the lease
+        Job.objects.filter(pk=job_id, status='RUNNING').update(progress=percent, heartbeat_at=timezone.now())
+    except DatabaseError:
+        # SQLite refuses writes from a connection whose open read cursor (an
+        # export's iterator) predates another process's commit. Progress is
+        # advisory, so skip this update rather than fail the job.
+        logger.debug("Progress update for job %s skipped", job_id, exc_info=True)
+
+def claim_job(worker, candidates=10):
+    """Mark the next due job RUNNING for ``worker`` and return it, or None.
+
+    The UPDATE only matches while the row is still QUEUED, so when workers
+    race for the same job exactly one of them gets a row count of 1.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status='QUEUED', run_after__lte=now).order_by('run_after', 'id')
+    for job_id in due.values_list('id', flat=True)[:candidates]:
+        claimed = Job.objects.filter(pk=job_id, status='QUEUED').update(
+            status='RUNNING', worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, progress=0,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+def heartbeat(job_ids):
+    Job.objects.filter(pk__in=job_ids, status='RUNNING').update(heartbeat_at=timezone.now())
+
+def requeue_stale():
+    """Hand jobs of workers that stopped checking in back to the queue (or fail them)."""
+    stale = Job.objects.filter(status='RUNNING', heartbeat_at__lt=timezone.now() - timedelta(seconds=LEASE_SECONDS))
+    for job_id in stale.values_list('id', flat=True):
+        fail_job(job_id, 'Worker stopped responding')
+
+def fail_job(job_id, error, permanent=False):
+    """Record a failed attempt: back to the queue with exponential backoff, or FAILED when out of attempts."""
+    job = Job.objects.get(pk=job_id)
+    now = timezone.now()
+    # Only touch the attempt that failed, not a later claim of the same job
+    rows = Job.objects.filter(pk=job_id, status='RUNNING', attempts=job.attempts)
+    if permanent or job.attempts >= job.max_attempts:
+        return rows.update(status='FAILED', error=error, finished_at=now, worker='')
+    delay = min(RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), RETRY_MAX_SECONDS)
+    return rows.update(status='QUEUED', error=error, run_after=now + timedelta(seconds=delay), worker='')
+
+def run_job(job_id):
+    """Run a claimed job to completion and record the outcome; returns the new status.
+
+    Called in a worker pool process, so it is importable and takes an id.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_id)
+        try:
+            result = JOB_TYPES[job.job_type].handler(job, lambda done, total: report_progress(job_id, done, total))
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed on attempt %s", job_id, job.job_type, job.attempts)
+            permanent = isinstance(exc, PERMANENT_ERRORS) or job.job_type not in JOB_TYPES
+            fail_job(job_id, f'{type(exc).__name__}: {exc}', permanent=permanent)
+        else:
+            Job.objects.filter(pk=job_id, status='RUNNING').update(
+                status='SUCCEEDED', progress=100, result=result, error='', finished_at=timezone.now(), worker='',
+            )
+        return Job.objects.values_list('status', flat=True).get(pk=job_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from .models import Product, StockMovement, StockSnapshot
+
+# Snapshots stop this far behind "now" so invoices still in flight, whose
+# transaction_date is already set but not yet committed, are never skipped.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+def record_invoice_movements(invoice, quantities):
+    """Write one signed movement per product for a posted invoice."""
+    sign = -1 if invoice.invoice_type == 'SALE' else 1
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=product_id,
+            invoice=invoice,
+            movement_type=invoice.invoice_type,
+            quantity=sign * qty,
+            occurred_at=invoice.transaction_date,
+        )
+        for product_id, qty in quantities.items()
+    ])
+
+def record_adjustments(deltas, occurred_at=None):
+    """Record direct stock edits (``{product_id: delta}``) that bypass invoices."""
+    occurred_at = occurred_at or timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, movement_type='ADJUSTMENT', quantity=delta, occurred_at=occurred_at)
+        for product_id, delta in deltas.items() if delta
+    ])
+
+def stock_at(product_id, when):
+    """Return ``(stock, snapshot)`` for a product as of ``when``.
+
+    Reads the latest snapshot at or before ``when`` and only the movements
+    recorded after it, so the cost is bounded by the snapshot interval.
+    """
+    snapshot = (
+        StockSnapshot.objects.filter(product_id=product_id, taken_at__lte=when)
+        .order_by('-taken_at').first()
+    )
+    movements = StockMovement.objects.filter(product_id=product_id, occurred_at__lte=when)
+    base = 0
+    if snapshot is not None:
+        base = snapshot.stock_quantity
+        movements = movements.filter(occurred_at__gt=snapshot.taken_at)
+    return base + (movements.aggregate(total=Sum('quantity'))['total'] or 0), snapshot
+
+def take_snapshots(taken_at=None):
+    """Roll every product with movements since its last snapshot forward to ``taken_at``.
+
+    New snapshots are derived from the ledger itself rather than from
+    ``Product.stock_quantity`` so they agree with it at exactly ``taken_at``.
+    """
+    taken_at = taken_at or timezone.now() - SNAPSHOT_LAG
+    latest = StockSnapshot.objects.filter(product=OuterRef('product_id'), taken_at__lte=taken_at).order_by('-taken_at')
+    deltas = (
+        StockMovement.objects.filter(occurred_at__lte=taken_at)
+        .annotate(since=Subquery(latest.values('taken_at')[:1]))
+        .filter(Q(since__isnull=True) | Q(occurred_at__gt=F('since')))
+        .values('product_id')
+        .annotate(delta=Sum('quantity'))
+        .order_by()
+    )
+    deltas = {row['product_id']: row['delta'] for row in deltas}
+    if not deltas:
+        return 0
+
+    latest_for_product = StockSnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=taken_at).order_by('-taken_at')
+    previous = dict(
+        Product.objects.filter(pk__in=deltas)
+        .annotate(last_quantity=Subquery(latest_for_product.values('stock_quantity')[:1]))
+        .values_list('pk', 'last_quantity')
+    )
+    with transaction.atomic():
+        StockSnapshot.objects.bulk_create([
+            StockSnapshot(product_id=product_id, taken_at=taken_at,
+                          stock_quantity=(previous.get(product_id) or 0) + delta)
+            for product_id, delta in deltas.items()
+        ], ignore_conflicts=True)
+    return len(deltas)
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min, Sum
+from api.ledger import take_snapshots
+from api.models import ArchivedInvoiceItem, InvoiceItem, Product, StockMovement, StockSnapshot
+
+BATCH_SIZE = 5000
+
+class Command(BaseCommand):
+    help = "Build the stock movement ledger from existing invoices, plus an opening balance per product."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Delete existing movements and snapshots first.')
+
+    def handle(self, *args, **options):
+        if StockMovement.objects.exists() and not options['reset']:
+            raise CommandError("Ledger already has movements; pass --reset to rebuild it.")
+
+        with transaction.atomic():
+            if options['reset']:
+                StockSnapshot.objects.all().delete()
+                StockMovement.objects.all().delete()
+
+            # Archived invoices (closed periods) still moved stock, but have no
+            # hot row left to link their movements to
+            batch = []
+            for item_model, linked in ((ArchivedInvoiceItem, False), (InvoiceItem, True)):
+                items = (
+                    item_model.objects.order_by('id')
+                    .values_list('product_id', 'quantity', 'invoice_id', 'invoice__invoice_type', 'invoice__transaction_date')
+                    .iterator(chunk_size=BATCH_SIZE)
+                )
+                for product_id, qty, invoice_id, invoice_type, occurred_at in items:
+                    batch.append(StockMovement(
+                        product_id=product_id,
+                        invoice_id=invoice_id if linked else None,
+                        movement_type=invoice_type,
+                        quantity=-qty if invoice_type == 'SALE' else qty,
+                        occurred_at=occurred_at,
+                    ))
+                    if len(batch) >= BATCH_SIZE:
+                        StockMovement.objects.bulk_create(batch)
+                        batch = []
+            StockMovement.objects.bulk_create(batch)
+
+            # Whatever invoices do not explain (initial stock, manual edits)
+            # becomes an opening adjustment dated before the first invoice.
+            products = Product.objects.annotate(
+                invoiced=Sum('stock_movements__quantity'),
+                first_movement=Min('stock_movements__occurred_at'),
+            ).values_list('id', 'stock_quantity', 'invoiced', 'created_at', 'first_movement')
+            openings = [
+                StockMovement(
+                    product_id=product_id,
+                    movement_type='ADJUSTMENT',
+                    quantity=stock - (invoiced or 0),
+                    occurred_at=min(created_at, first_movement or created_at),
+                )
+                for product_id, stock, invoiced, created_at, first_movement in products.iterator(chunk_size=BATCH_SIZE)
+                if stock != (invoiced or 0)
+            ]
+            StockMovement.objects.bulk_create(openings, batch_size=BATCH_SIZE)
+
+        snapshotted = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ledger has {StockMovement.objects.count()} movements; snapshotted {snapshotted} products"
+        ))
@@ -0,0 +1,128 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.utils import timezone
+from api.benchmarking import compare_to_baseline, latency_report
+from api.models import Customer, User
+from api.token_serializers import MyTokenObtainPairSerializer
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'bench_baseline.json'
+
+def endpoints():
+    """The read paths the frontend hits most, keyed by a stable name."""
+    customer_id = Customer.objects.order_by('id').values_list('id', flat=True).first()
+    month_ago = (timezone.localdate() - timedelta(days=30)).isoformat()
+    paths = {
+        'products_list': '/api/products/',
+        'products_search': '/api/products/?search=drill',
+        'products_low_stock': '/api/products/low_stock/',
+        'invoices_list': '/api/invoices/',
+        'invoices_sales_last_30d': f'/api/invoices/?invoice_type=SALE&date_from={month_ago}',
+        'categories_list': '/api/categories/',
+        'dashboard_summary': '/api/dashboard/summary/',
+        'reports_by_product': '/api/reports/?group_by=product',
+    }
+    if customer_id:
+        paths['invoices_by_customer'] = f'/api/invoices/?customer={customer_id}'
+    return paths
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main API endpoints with concurrent clients and report throughput and "
+        "p50/p95/p99 latency as JSON, optionally compared with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--only', help='Comma-separated endpoint names to run.')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000. '
+                                          'Defaults to the in-process test client.')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' not found")
+        auth = f'Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}'
+
+        paths = endpoints()
+        if options['only']:
+            names = [name.strip() for name in options['only'].split(',')]
+            unknown = set(names) - set(paths)
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            paths = {name: paths[name] for name in names}
+
+        # The in-process client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            results = {name: self.run(path, auth, options) for name, path in paths.items()}
+
+        report = {
+            'target': options['url'] or 'test-client',
+            'vendor': connection.vendor,
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        baseline_path = Path(options['baseline'])
+        if baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text())
+            report['baseline_change_pct'] = compare_to_baseline(results, baseline.get('results', {}))
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps({k: v for k, v in report.items() if k != 'baseline_change_pct'}, indent=2))
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, path, auth, options):
+        base = (options['url'] or '').rstrip('/')
+
+        def fetch(client):
+            if client is None:
+                request = urllib.request.Request(base + path, headers={'Authorization': auth})
+                try:
+                    with urllib.request.urlopen(request, timeout=60) as response:
+                        response.read()
+                        return response.status
+                except urllib.error.HTTPError as exc:
+                    return exc.code
+            response = client.get(path)
+            # Drain streamed bodies so their queries are timed too
+            b''.join(response.streaming_content) if response.streaming else response.content
+            return response.status_code
+
+        def worker(count):
+            client = None if base else Client(headers={'Authorization': auth})
+            latencies, errors = [], 0
+            try:
+                for _ in range(count):
+                    began = time.perf_counter()
+                    if fetch(client) == 200:
+                        latencies.append(time.perf_counter() - began)
+                    else:
+                        errors += 1
+            finally:
+                connections.close_all()
+            return latencies, errors
+
+        concurrency = options['concurrency']
+        counts = [options['requests'] // concurrency + (i < options['requests'] % concurrency) for i in range(concurrency)]
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(worker, counts))
+        elapsed = time.perf_counter() - began
+        return latency_report(
+            [value for latencies, _ in outcomes for value in latencies],
+            sum(errors for _, errors in outcomes),
+            elapsed,
+            percentiles=(50, 95, 99),
+        )
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.conf import settings
+from django.test import AsyncClient, Client, override_settings
+from api.benchmarking import latency_report
+from api.models import User
+from api.token_serializers import MyTokenObtainPairSerializer
+
+class Command(BaseCommand):
+    help = (
+        "Compare read latency of the sync DRF endpoints under WSGI with the native "
+        "async endpoints under ASGI, at the same concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--resource', default='products')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' not found")
+        auth = f'Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}'
+        resource = options['resource']
+
+        # The in-process clients send Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            results = {
+                'wsgi_sync': self.run_wsgi(f'/api/{resource}/', auth, options),
+                'asgi_sync': asyncio.run(self.run_asgi(f'/api/{resource}/', auth, options)),
+                'asgi_async': asyncio.run(self.run_asgi(f'/api/async/{resource}/', auth, options)),
+            }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_wsgi(self, url, auth, options):
+        def worker(count):
+            client = Client(headers={'Authorization': auth})
+            latencies, errors = [], 0
+            try:
+                for _ in range(count):
+                    began = time.perf_counter()
+                    if client.get(url).status_code == 200:
+                        latencies.append(time.perf_counter() - began)
+                    else:
+                        errors += 1
+            finally:
+                connections.close_all()
+            return latencies, errors
+
+        per_worker = max(options['requests'] // options['concurrency'], 1)
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(worker, [per_worker] * options['concurrency']))
+        elapsed = time.perf_counter() - began
+        return latency_report([value for result in results for value in result[0]], sum(r[1] for r in results), elapsed)
+
+    async def run_asgi(self, url, auth, options):
+        client = AsyncClient()
+        gate = asyncio.Semaphore(options['concurrency'])
+        latencies, errors = [], 0
+
+        async def one():
+            nonlocal errors
+            async with gate:
+                began = time.perf_counter()
+                response = await client.get(url, headers={'Authorization': auth})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - began)
+                else:
+                    errors += 1
+
+        total = max(options['requests'] // options['concurrency'], 1) * options['concurrency']
+        began = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return latency_report(latencies, errors, time.perf_counter() - began)
@@ -0,0 +1,41 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from api.authentication import ClaimsJWTAuthentication
+from api.models import User
+from api.token_serializers import MyTokenObtainPairSerializer
+
+class Command(BaseCommand):
+    help = "Compare per-request cost of the stock JWT backend against the claims fast path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' not found")
+        token = str(MyTokenObtainPairSerializer.get_token(user).access_token)
+        django_request = RequestFactory().get('/api/categories/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        results = {}
+        for name, backend in (('jwt', JWTAuthentication()), ('claims', ClaimsJWTAuthentication())):
+            backend.authenticate(Request(django_request))  # warm caches
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                for _ in range(options['requests']):
+                    backend.authenticate(Request(django_request))
+                elapsed = time.perf_counter() - start
+            results[name] = {
+                'requests': options['requests'],
+                'queries_per_request': len(ctx.captured_queries) / options['requests'],
+                'mean_us': round(elapsed / options['requests'] * 1e6, 1),
+            }
+        self.stdout.write(json.dumps(results, indent=2))
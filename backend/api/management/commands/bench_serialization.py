@@ -0,0 +1,76 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from api.fastrows import FastRows, dumps, orjson
+from api.serializers import InvoiceSerializer, ProductSerializer
+from api.views import InvoiceViewSet, ProductViewSet
+
+PER_ROWS = 10000
+RESOURCES = {
+    'products': (ProductViewSet.queryset, ProductSerializer),
+    'invoices': (InvoiceViewSet.queryset, InvoiceSerializer),
+}
+
+def _measure(fetch, serialize, render):
+    began = time.perf_counter()
+    rows = fetch()
+    fetched = time.perf_counter()
+    data = serialize(rows)
+    serialized = time.perf_counter()
+    render(data)
+    finished = time.perf_counter()
+    return {
+        'fetch_ms': (fetched - began) * 1000,
+        'serialize_ms': (serialized - fetched) * 1000,
+        'render_ms': (finished - serialized) * 1000,
+        'total_ms': (finished - began) * 1000,
+    }
+
+class Command(BaseCommand):
+    help = (
+        "Time fetching, serializing and rendering list rows through the DRF serializers "
+        "(model instances) and through the values_list() path, in ms per 10k rows. Seed data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=PER_ROWS, help='Rows fetched per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the median is reported.')
+        parser.add_argument('--only', choices=sorted(RESOURCES))
+
+    def handle(self, *args, **options):
+        names = [options['only']] if options['only'] else list(RESOURCES)
+        results = {}
+        for name in names:
+            queryset, serializer_class = RESOURCES[name]
+            queryset = queryset.order_by('id')[:options['rows']]
+            rows = queryset.count()
+            if not rows:
+                raise CommandError(f"No {name} to serialize; run seed_data first.")
+            fast = FastRows.for_serializer(serializer_class())
+            # The fast path fetches nested items inside serialize; DRF prefetches them in fetch
+            paths = {
+                'drf': lambda: _measure(
+                    lambda: list(queryset.all()), lambda rows: serializer_class(rows, many=True).data,
+                    JSONRenderer().render,
+                ),
+                'fast': lambda: _measure(lambda: list(fast.values(queryset)), fast.serialize, dumps),
+            }
+            results[name] = {'rows': rows}
+            for path, run in paths.items():
+                run()  # Warm-up
+                runs = [run() for _ in range(options['repeat'])]
+                results[name][path] = {
+                    metric: round(statistics.median(r[metric] for r in runs) * PER_ROWS / rows, 1)
+                    for metric in runs[0]
+                }
+            results[name]['speedup'] = round(results[name]['drf']['total_ms'] / results[name]['fast']['total_ms'], 1)
+
+        self.stdout.write(json.dumps({
+            'vendor': connection.vendor,
+            'encoder': 'orjson' if orjson else 'json',
+            'unit': f'ms per {PER_ROWS} rows',
+            'results': results,
+        }, indent=2))
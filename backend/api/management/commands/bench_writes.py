@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from api.benchmarking import percentile
+from api.models import Customer, Invoice, Product, User
+from api.serializers import InvoiceSerializer
+
+class Command(BaseCommand):
+    help = (
+        "Post sale invoices concurrently against the configured database and report "
+        "throughput and lock errors. Run once per DB_PROFILE to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--invoices', type=int, default=200, help='Invoices per thread.')
+        parser.add_argument('--items', type=int, default=3, help='Lines per invoice.')
+
+    def handle(self, *args, **options):
+        tag = f'BENCH-{time.time_ns()}'
+        user = User.objects.create_user(tag, role='EDITOR')
+        customer = Customer.objects.create(name=tag)
+        products = [
+            Product.objects.create(name=f'{tag}-{i}', sku=f'{tag}-{i}', price=Decimal('1.00'), stock_quantity=10**9)
+            for i in range(options['items'])
+        ]
+        payload = {
+            'invoice_type': 'SALE',
+            'customer': customer.id,
+            'items': [{'product': p.id, 'quantity': 1, 'unit_price': '1.00'} for p in products],
+        }
+        start = threading.Barrier(options['threads'])
+
+        def worker(_):
+            latencies, lock_errors, other_errors = [], 0, 0
+            try:
+                start.wait()
+                for _ in range(options['invoices']):
+                    began = time.perf_counter()
+                    try:
+                        serializer = InvoiceSerializer(data=payload)
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save(user_id=user.id)
+                        latencies.append(time.perf_counter() - began)
+                    except OperationalError as exc:
+                        if 'locked' in str(exc) or 'busy' in str(exc):
+                            lock_errors += 1
+                        else:
+                            other_errors += 1
+            finally:
+                connections.close_all()
+            return latencies, lock_errors, other_errors
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            results = list(pool.map(worker, range(options['threads'])))
+        elapsed = time.perf_counter() - began
+
+        latencies = [value for result in results for value in result[0]]
+        report = {
+            'profile': settings.DB_PROFILE,
+            'vendor': connection.vendor,
+            'threads': options['threads'],
+            'attempted': options['threads'] * options['invoices'],
+            'succeeded': len(latencies),
+            'lock_errors': sum(result[1] for result in results),
+            'other_errors': sum(result[2] for result in results),
+            'seconds': round(elapsed, 3),
+            'invoices_per_sec': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        }
+
+        Invoice.objects.filter(customer=customer).delete()
+        for product in products:
+            product.delete()
+        customer.delete()
+        user.delete()
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,35 @@
+from datetime import datetime, time
+from time import perf_counter
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from api.archive import ARCHIVE_CHUNK_SIZE, archive_invoices
+from api.models import Invoice
+
+class Command(BaseCommand):
+    help = (
+        "Close the periods before --before: move their invoices and items into the archive "
+        "tables in chunked transactions, keeping per-month summary rows. Reads of archived "
+        "invoices need ?include_archived=1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='YYYY-MM-DD; invoices dated earlier are archived.')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE, help='Invoices per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            day = parse_date(options['before'])
+        except ValueError:  # Well-formed but impossible, e.g. 2024-02-30
+            day = None
+        if day is None:
+            raise CommandError("--before expects a date in YYYY-MM-DD format.")
+        if day > timezone.localdate():
+            raise CommandError("Cannot close a period that has not ended yet.")
+        cutoff = timezone.make_aware(datetime.combine(day, time.min))
+
+        started = perf_counter()
+        moved = archive_invoices(Invoice.objects.filter(transaction_date__lt=cutoff), max(options['chunk_size'], 1))
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} invoices dated before {day} in {perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from api.sync import TOMBSTONE_RETENTION, prune_tombstones
+
+class Command(BaseCommand):
+    help = (
+        f"Delete change-feed tombstones older than {TOMBSTONE_RETENTION.days} days; cursors that old "
+        "are refused anyway. Run periodically (e.g. nightly)."
+    )
+
+    def handle(self, *args, **options):
+        count = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {count} tombstones"))
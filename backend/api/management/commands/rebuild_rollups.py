@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.reports import rebuild_rollups
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales/purchase rollups from invoice history."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            product_rows, party_rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups: {product_rows} product-day rows, {party_rows} party-day rows"
+        ))
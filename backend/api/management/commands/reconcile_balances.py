@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.aging import reconcile_balances
+from api.models import Customer, Supplier
+
+SHOWN_DRIFT = 20
+
+class Command(BaseCommand):
+    help = (
+        "Recompute customer and supplier balances and aging buckets from invoices, report any "
+        "drift from the stored values and store the fresh ones aged as of today. Run daily so "
+        "buckets follow invoices as they fall overdue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift, writing nothing; exits non-zero when there is some.')
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for model in (Customer, Supplier):
+            drift = reconcile_balances(model, fix=not options['check'])
+            parties = {entry.party_id for entry in drift}
+            drifted += len(parties)
+            style = self.style.WARNING if drift else self.style.SUCCESS
+            self.stdout.write(style(f"{model._meta.verbose_name_plural.capitalize()}: {len(parties)} with drift"))
+            for entry in drift[:SHOWN_DRIFT]:
+                self.stdout.write(f"  {model._meta.verbose_name} #{entry.party_id} {entry.field}: stored {entry.stored}, expected {entry.expected}")
+            if len(drift) > SHOWN_DRIFT:
+                self.stdout.write(f"  ... and {len(drift) - SHOWN_DRIFT} more")
+        if options['check'] and drifted:
+            raise CommandError(f"{drifted} balances drifted; run reconcile_balances to repair them.")
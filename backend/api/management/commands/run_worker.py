@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+from api.jobs import claim_job, fail_job, heartbeat, requeue_stale, run_job
+
+class Command(BaseCommand):
+    help = (
+        "Claim queued jobs from the database and run them in a pool of processes, "
+        "retrying failures with backoff. Start as many workers as needed; with more "
+        "than one process set DJANGO_CACHE_DIR so cache invalidation reaches the web workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2,
+                            help='Pool size; 0 runs jobs one at a time in this process.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between queue checks when idle.')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due instead of waiting for more.')
+        parser.add_argument('--worker-id', default=f'{socket.gethostname()}:{os.getpid()}')
+
+    def handle(self, *args, **options):
+        self.worker = options['worker_id']
+        self.poll = options['poll_interval']
+        self.burst = options['burst']
+        if options['processes'] < 1:
+            self.run_inline()
+        else:
+            self.run_pool(options['processes'])
+
+    def log(self, job_id, status):
+        style = self.style.SUCCESS if status == 'SUCCEEDED' else self.style.WARNING
+        self.stdout.write(style(f"Job {job_id}: {status}"))
+
+    def run_inline(self):
+        while True:
+            requeue_stale()
+            job = claim_job(self.worker)
+            if job is None:
+                if self.burst:
+                    return
+                time.sleep(self.poll)
+                continue
+            # Nothing else refreshes the lease while the job runs in this thread
+            stop = threading.Event()
+            keeper = threading.Thread(target=self.keep_lease, args=(job.pk, stop), daemon=True)
+            keeper.start()
+            try:
+                self.log(job.pk, run_job(job.pk))
+            finally:
+                stop.set()
+                keeper.join()
+
+    def keep_lease(self, job_id, stop):
+        try:
+            while not stop.wait(self.poll):
+                try:
+                    heartbeat([job_id])
+                except DatabaseError:
+                    # The job may hold SQLite's write lock; try again next tick
+                    pass
+        finally:
+            connections.close_all()
+
+    def new_pool(self, size):
+        # Fresh interpreters rather than forks: children must not share this
+        # process's database connections
+        return ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=django.setup)
+
+    def run_pool(self, size):
+        pool = self.new_pool(size)
+        running = {}  # future -> job id
+        connections.close_all()
+        try:
+            while True:
+                requeue_stale()
+                while len(running) < size and (job := claim_job(self.worker)):
+                    running[pool.submit(run_job, job.pk)] = job.pk
+                if not running:
+                    if self.burst:
+                        return
+                    time.sleep(self.poll)
+                    continue
+                done, _ = wait(running, timeout=self.poll, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        self.log(job_id, future.result())
+                    except Exception as exc:
+                        # The job's process died before it could record anything
+                        fail_job(job_id, f'{type(exc).__name__}: {exc}')
+                        self.log(job_id, 'worker process failed')
+                        if isinstance(exc, BrokenProcessPool):
+                            pool.shutdown(cancel_futures=True)
+                            pool = self.new_pool(size)
+                # Keeps the leases of jobs still running from expiring
+                heartbeat(running.values())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
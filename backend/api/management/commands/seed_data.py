@@ -0,0 +1,191 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from api.aging import BALANCE_FIELDS, reconcile_balances
+from api.alerts import rebuild_low_stock
+from api.bulk import adapt_datetime, insert_rows
+from api.dashboard import invalidate_summary
+from api.models import (
+    Category, Supplier, Customer, Product, Invoice, InvoiceItem, ArchivedInvoice, ArchivedInvoiceItem,
+    LowStockEntry, StockAlert, StockMovement, StockSnapshot, DailyPartyRollup, DailyProductRollup, PeriodSummary,
+)
+from api.reports import rebuild_rollups
+from api.versioning import bump_versions
+
+TAX_RATE = Decimal('0.13')
+CENT = Decimal('0.01')
+ADJECTIVES = ('Steel', 'Cordless', 'Compact', 'Heavy Duty', 'Precision', 'Galvanized', 'Folding', 'Insulated')
+NOUNS = ('Hammer', 'Drill', 'Wrench', 'Screwdriver', 'Saw', 'Pliers', 'Clamp', 'Ladder', 'Tape', 'Chisel')
+# Balances start empty and are filled in by reconcile_balances once invoices exist
+PARTY_COLUMNS = ['id', 'name', 'email', 'phone', 'address', 'created_at', 'updated_at', *BALANCE_FIELDS]
+PRODUCT_COLUMNS = [
+    'id', 'name', 'sku', 'description', 'price', 'stock_quantity', 'reorder_level',
+    'category_id', 'supplier_id', 'created_at', 'updated_at',
+]
+INVOICE_COLUMNS = [
+    'id', 'invoice_type', 'supplier_id', 'customer_id', 'transaction_date', 'due_date',
+    'total_amount', 'tax_amount', 'net_amount', 'user_id', 'note', 'updated_at',
+]
+ITEM_COLUMNS = ['id', 'invoice_id', 'product_id', 'quantity', 'unit_price', 'subtotal']
+
+def _new_ids(model, count, archive=None):
+    # Archived rows keep their ids, so new ones must clear those too
+    models = (model, archive) if archive else (model,)
+    start = max(m.objects.aggregate(top=Max('id'))['top'] or 0 for m in models) + 1
+    return range(start, start + count)
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate categories, suppliers, customers, products and invoices with items. "
+        "The same --seed and counts produce the same rows, with dates relative to today."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--suppliers', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=2000)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--invoices', type=int, default=50000)
+        parser.add_argument('--max-items', type=int, default=5, help='Lines per invoice are 1..max-items.')
+        parser.add_argument('--days', type=int, default=365, help='Spread invoices over this many days up to today.')
+        parser.add_argument('--reset', action='store_true', help='Delete existing catalog, parties and invoices (archived too) first.')
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 and options['invoices']:
+            raise CommandError("Invoices need at least one product.")
+        self.rng = random.Random(options['seed'])
+        self.tag = f"S{options['seed']}"
+        started = time.perf_counter()
+
+        # Rows go in as plain tuples with explicit ids: no model instances,
+        # signals or per-row id round trips, which is what makes millions fast.
+        if connection.vendor == 'sqlite':
+            # A bigger page cache keeps index inserts off disk as tables grow (~256 MB)
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+        with transaction.atomic():
+            if options['reset']:
+                for model in (DailyProductRollup, DailyPartyRollup, PeriodSummary, StockAlert, LowStockEntry,
+                              StockSnapshot, StockMovement, ArchivedInvoiceItem, ArchivedInvoice, InvoiceItem, Invoice,
+                              Product, Customer, Supplier, Category):
+                    model.objects.all().delete()
+            counts = self.seed_rows(options)
+            seeded = time.perf_counter()
+            rebuild_rollups()
+            rebuild_low_stock()
+            for party in (Customer, Supplier):
+                reconcile_balances(party)
+            self.reset_sequences()
+            transaction.on_commit(invalidate_summary)
+            bump_versions(Category, Supplier, Customer, Product, Invoice)
+
+        finished = time.perf_counter()
+        summary = ', '.join(f"{count} {label}" for label, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary} in {seeded - started:.1f}s; "
+            f"rollups, low-stock set and balances rebuilt in {finished - seeded:.1f}s"
+        ))
+        if counts['invoices']:
+            self.stdout.write("Run backfill_stock_ledger --reset to rebuild stock history for the new invoices.")
+
+    def seed_rows(self, options):
+        rng = self.rng
+        now = timezone.now()
+        start_of_range = now - timedelta(days=options['days'])
+        created_at = adapt_datetime(start_of_range)
+        updated_at = adapt_datetime(now)
+        unaged = (0,) * (len(BALANCE_FIELDS) - 1) + (connection.ops.adapt_datefield_value(timezone.localdate(now)),)
+
+        category_ids = _new_ids(Category, options['categories'])
+        insert_rows(Category, ['id', 'name', 'description', 'created_at', 'updated_at'], (
+            (pk, f'Category {pk}', '', created_at, updated_at) for pk in category_ids
+        ))
+        supplier_ids = _new_ids(Supplier, options['suppliers'])
+        insert_rows(Supplier, PARTY_COLUMNS, (
+            (pk, f'Supplier {pk}', f'supplier{pk}@example.com', f'555-{pk:07d}', '', created_at, updated_at, *unaged)
+            for pk in supplier_ids
+        ))
+        customer_ids = _new_ids(Customer, options['customers'])
+        insert_rows(Customer, PARTY_COLUMNS, (
+            (pk, f'Customer {pk}', f'customer{pk}@example.com', f'555-{pk:07d}', '', created_at, updated_at, *unaged)
+            for pk in customer_ids
+        ))
+
+        product_ids = _new_ids(Product, options['products'])
+        prices = {}
+
+        def products():
+            for pk in product_ids:
+                prices[pk] = price = Decimal(rng.randrange(100, 100000)) / 100
+                yield (
+                    pk, f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {pk}', f'{self.tag}-{pk:08d}', '',
+                    price, rng.randrange(0, 500), rng.choice((5, 10, 20, 50)),
+                    rng.choice(category_ids) if category_ids and rng.random() > 0.05 else None,
+                    rng.choice(supplier_ids) if supplier_ids else None,
+                    created_at, updated_at,
+                )
+        insert_rows(Product, PRODUCT_COLUMNS, products())
+
+        self.seed_invoices(options, product_ids, prices, customer_ids, supplier_ids, start_of_range)
+        return {
+            'categories': len(category_ids), 'suppliers': len(supplier_ids), 'customers': len(customer_ids),
+            'products': len(product_ids), 'invoices': options['invoices'],
+        }
+
+    def seed_invoices(self, options, product_ids, prices, customer_ids, supplier_ids, start_of_range):
+        rng = self.rng
+        invoice_ids = _new_ids(Invoice, options['invoices'], ArchivedInvoice)
+        # Dates rise with ids, as for real postings, so date indexes grow at the end
+        step = options['days'] * 86400 / max(len(invoice_ids), 1)
+        item_id = _new_ids(InvoiceItem, 1, ArchivedInvoiceItem)[0]
+        items = []
+
+        def invoices():
+            nonlocal item_id
+            for position, invoice_id in enumerate(invoice_ids):
+                is_sale = rng.random() < 0.7
+                net = Decimal(0)
+                for _ in range(rng.randint(1, options['max_items'])):
+                    product_id = rng.choice(product_ids)
+                    quantity = rng.randint(1, 20)
+                    # Purchases are booked at cost, roughly 70% of the selling price
+                    unit_price = prices[product_id] if is_sale else (prices[product_id] * 7 / 10).quantize(CENT)
+                    subtotal = unit_price * quantity
+                    items.append((item_id, invoice_id, product_id, quantity, unit_price, subtotal))
+                    item_id += 1
+                    net += subtotal
+                tax = (net * TAX_RATE).quantize(CENT) if rng.random() < 0.5 else Decimal(0)
+                # Posted once and never edited, so last updated when dated
+                transaction_date = adapt_datetime(start_of_range + timedelta(seconds=(position + rng.random()) * step))
+                yield (
+                    invoice_id,
+                    'SALE' if is_sale else 'PURCHASE',
+                    rng.choice(supplier_ids) if not is_sale and supplier_ids else None,
+                    rng.choice(customer_ids) if is_sale and customer_ids else None,
+                    transaction_date, None, net + tax, tax, net, None, '', transaction_date,
+                )
+
+        # Items are flushed as they accumulate so memory stays flat; some land
+        # before their invoice's batch, which the deferred FK checks allow
+        def chunked_invoices():
+            for row in invoices():
+                yield row
+                if len(items) >= 10000:
+                    insert_rows(InvoiceItem, ITEM_COLUMNS, items)
+                    items.clear()
+        insert_rows(Invoice, INVOICE_COLUMNS, chunked_invoices())
+        insert_rows(InvoiceItem, ITEM_COLUMNS, items)
+
+    def reset_sequences(self):
+        # Rows were inserted with explicit ids; move PostgreSQL sequences past them
+        statements = connection.ops.sequence_reset_sql(no_style(), [Category, Supplier, Customer, Product, Invoice, InvoiceItem])
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.ledger import take_snapshots
+
+class Command(BaseCommand):
+    help = "Roll per-product stock snapshots forward from the movement ledger. Run periodically (e.g. nightly)."
+
+    def handle(self, *args, **options):
+        count = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted {count} products"))
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .authentication import ClaimsJWTAuthentication
+from .permissions import IsAdmin
+
+# Per-request instrumentation. The middleware opens a RequestStats for each
+# request; a wrapper installed on every DB connection and a serializer mixin
+# add to it. Context variables follow the request into sync_to_async
+# threads, so async views are measured too. Histograms are per process.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Only frames from these modules go into the slow-query stack excerpt
+STACK_MODULES = ('api/views.py', 'api/serializers.py')
+
+slow_query_logger = logging.getLogger('api.slow_queries')
+_current = ContextVar('request_stats', default=None)
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # labels -> [bucket counts..., count, sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.series.items()):
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series[-2]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-1]:.6f}')
+        return lines
+
+_lock = threading.Lock()
+HISTOGRAMS = {
+    'total': Histogram('ims_request_duration_seconds', 'Total request time.', LATENCY_BUCKETS),
+    'db': Histogram('ims_request_db_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS),
+    'serializer': Histogram('ims_request_serializer_seconds', 'Time spent in serializers per request.', LATENCY_BUCKETS),
+    'queries': Histogram('ims_request_db_queries', 'Database queries per request.', QUERY_COUNT_BUCKETS),
+}
+
+def _stack_excerpt():
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.replace('\\', '/').endswith(STACK_MODULES)
+    ]
+    return ''.join(traceback.format_list(frames[-3:]))
+
+def query_timer(execute, sql, params, many, context):
+    """Connection execute wrapper: counts and times queries for the current request."""
+    stats = _current.get()
+    threshold = getattr(settings, 'SLOW_QUERY_MS', None)
+    if stats is None and threshold is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - began
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if threshold is not None and elapsed * 1000 >= threshold:
+            slow_query_logger.warning(
+                "Slow query (%.1f ms): %s\n%s", elapsed * 1000, sql, _stack_excerpt() or '  (no api frame)\n',
+            )
+
+def install_query_timer(connection):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+class TimedSerializerMixin:
+    """Adds time spent serializing or validating to the current request's stats.
+
+    Only the outermost call is timed, so nested and per-item calls of a
+    ``many=True`` list are not counted twice.
+    """
+    def to_representation(self, instance):
+        return time_serialization(super().to_representation, instance)
+
+    def to_internal_value(self, data):
+        return time_serialization(super().to_internal_value, data)
+
+def time_serialization(method, value):
+    """Call ``method(value)``, adding its time to the request's serializer time."""
+    stats = _current.get()
+    if stats is None or stats.serializer_depth:
+        return method(value)
+    stats.serializer_depth += 1
+    began = time.perf_counter()
+    try:
+        return method(value)
+    finally:
+        stats.serializer_time += time.perf_counter() - began
+        stats.serializer_depth -= 1
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved', ''
+    func = match.func
+    view = getattr(func, 'cls', None)
+    actions = getattr(func, 'actions', None) or {}
+    return (view.__name__ if view else func.__name__), actions.get(request.method.lower(), '')
+
+def _finish(request, response, stats, began):
+    total = time.perf_counter() - began
+    response['Server-Timing'] = (
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+        f'ser;dur={stats.serializer_time * 1000:.1f}, total;dur={total * 1000:.1f}'
+    )
+    view, action = _endpoint(request)
+    labels = (('view', view), ('action', action), ('method', request.method))
+    with _lock:
+        HISTOGRAMS['total'].observe(labels, total)
+        HISTOGRAMS['db'].observe(labels, stats.db_time)
+        HISTOGRAMS['serializer'].observe(labels, stats.serializer_time)
+        HISTOGRAMS['queries'].observe(labels, stats.queries)
+    return response
+
+class RequestMetricsMiddleware:
+    """Times each request and reports it via ``Server-Timing`` and /api/metrics/."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, began = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, stats, began)
+
+    async def __acall__(self, request):
+        stats, began = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, stats, began)
+
+def render_metrics():
+    with _lock:
+        lines = [line for histogram in HISTOGRAMS.values() for line in histogram.render()]
+    return '\n'.join(lines) + '\n'
+
+def _admin_denial(request):
+    """401 or 403 unless ``request`` carries an admin's access token, else None."""
+    drf_request = Request(request)
+    try:
+        result = ClaimsJWTAuthentication().authenticate(drf_request)
+    except (AuthenticationFailed, InvalidToken):
+        result = None
+    if result is None:
+        return 401
+    drf_request.user, drf_request.auth = result
+    return None if IsAdmin().has_permission(drf_request, None) else 403
+
+def metrics_view(request):
+    """Prometheus text exposition; needs ``Bearer <METRICS_TOKEN>`` when that
+    is set, and an admin's access token otherwise."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse(status=401)
+    elif denial := _admin_denial(request):
+        return HttpResponse(status=denial)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,67 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:10
+
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table over api_product using the trigram
+# tokenizer, kept in sync by triggers so bulk_create()/update() are covered.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_product_fts USING fts5(
+        name, sku, content='api_product', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER api_product_fts_ai AFTER INSERT ON api_product BEGIN
+        INSERT INTO api_product_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER api_product_fts_ad AFTER DELETE ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER api_product_fts_au AFTER UPDATE OF name, sku ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+        INSERT INTO api_product_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku);
+    END
+    """,
+    "INSERT INTO api_product_fts(api_product_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS api_product_fts_au",
+    "DROP TRIGGER IF EXISTS api_product_fts_ad",
+    "DROP TRIGGER IF EXISTS api_product_fts_ai",
+    "DROP TABLE IF EXISTS api_product_fts",
+]
+
+# PostgreSQL: trigram GIN indexes answer both similarity (%) and ILIKE prefix queries.
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS api_product_name_trgm ON api_product USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS api_product_sku_trgm ON api_product USING gin (sku gin_trgm_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS api_product_sku_trgm",
+    "DROP INDEX IF EXISTS api_product_name_trgm",
+]
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
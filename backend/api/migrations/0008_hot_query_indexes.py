@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['invoice_type', 'transaction_date'], name='api_invoice_invoice_ec791e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['transaction_date'], name='api_invoice_transac_d8e1a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['customer', 'transaction_date'], name='api_invoice_custome_0f1012_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['supplier', 'transaction_date'], name='api_invoice_supplie_8e2803_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock_quantity'], name='api_product_stock_q_a9e59c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name'], name='api_product_name_73c704_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPartyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('invoice_type', models.CharField(choices=[('PURCHASE', 'Purchase (Stock In)'), ('SALE', 'Sale (Stock Out)')], max_length=10)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.customer')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.supplier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'invoice_type'], name='api_dailypa_day_18a3b6_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('invoice_type', models.CharField(choices=[('PURCHASE', 'Purchase (Stock In)'), ('SALE', 'Sale (Stock Out)')], max_length=10)),
+                ('quantity', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'invoice_type', 'product'], name='api_dailypr_day_dca1a6_idx')],
+            },
+        ),
+    ]
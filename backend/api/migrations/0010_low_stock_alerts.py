@@ -0,0 +1,70 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:12
+
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+# Adding a column makes SQLite rebuild api_product, which drops the search
+# triggers from 0005; recreate them and reindex.
+search_index = importlib.import_module('api.migrations.0005_product_search_index')
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in search_index.SQLITE_REVERSE[:3] + search_index.SQLITE_FORWARD[1:]:
+        schema_editor.execute(statement)
+
+
+def seed_low_stock(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    LowStockEntry = apps.get_model('api', 'LowStockEntry')
+    now = timezone.now()
+    low = Product.objects.filter(stock_quantity__lt=F('reorder_level')).values_list('id', flat=True)
+    LowStockEntry.objects.bulk_create(
+        (LowStockEntry(product_id=product_id, since=now) for product_id in low.iterator(chunk_size=5000)),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockEntry',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='low_stock_entry', serialize=False, to='api.product')),
+                ('since', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('LOW', 'Fell below reorder level'), ('CLEARED', 'Back at or above reorder level')], max_length=10)),
+                ('stock_quantity', models.IntegerField()),
+                ('reorder_level', models.PositiveIntegerField()),
+                ('occurred_at', models.DateTimeField()),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_alerts', to='api.invoice')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'occurred_at'], name='api_stockal_product_072919_idx')],
+            },
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(seed_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedInvoice',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('invoice_type', models.CharField(choices=[('PURCHASE', 'Purchase (Stock In)'), ('SALE', 'Sale (Stock Out)')], max_length=10)),
+                ('transaction_date', models.DateTimeField()),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('note', models.TextField(blank=True)),
+                ('archived_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_invoices', to='api.customer')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_invoices', to='api.supplier')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedInvoiceItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.archivedinvoice')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('invoice_type', models.CharField(choices=[('PURCHASE', 'Purchase (Stock In)'), ('SALE', 'Sale (Stock Out)')], max_length=10)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('item_count', models.IntegerField(default=0)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'invoice_type'), name='unique_period_summary')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedinvoice',
+            index=models.Index(fields=['transaction_date'], name='api_archive_transac_442400_idx'),
+        ),
+    ]
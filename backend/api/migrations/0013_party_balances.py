@@ -0,0 +1,114 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:07
+
+from collections import defaultdict
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def seed_balances(apps, schema_editor):
+    # Same bucketing as api.aging, as of today, over hot and archived invoices
+    today = django.utils.timezone.localdate()
+    buckets = ((0, 'aging_current'), (30, 'aging_1_30'), (60, 'aging_31_60'), (90, 'aging_61_90'))
+    fields = ['balance', *(field for _, field in buckets), 'aging_over_90', 'aged_on']
+    for model_name, invoice_type, party_field in (('Customer', 'SALE', 'customer_id'), ('Supplier', 'PURCHASE', 'supplier_id')):
+        totals = defaultdict(lambda: dict.fromkeys(fields[:-1], 0))
+        for invoice_model in ('Invoice', 'ArchivedInvoice'):
+            rows = (
+                apps.get_model('api', invoice_model).objects.filter(invoice_type=invoice_type, **{f'{party_field}__isnull': False})
+                .values_list(party_field, 'due_date').annotate(amount=Sum('total_amount')).order_by()
+            )
+            for party_id, due_date, amount in rows.iterator(chunk_size=5000):
+                overdue = (today - due_date).days if due_date else 0
+                field = next((field for last, field in buckets if overdue <= last), 'aging_over_90')
+                totals[party_id]['balance'] += amount
+                totals[party_id][field] += amount
+        Party = apps.get_model('api', model_name)
+        parties = [party for party in Party.objects.iterator(chunk_size=5000) if party.pk in totals]
+        for party in parties:
+            for field, value in totals[party.pk].items():
+                setattr(party, field, value)
+            party.aged_on = today
+        Party.objects.bulk_update(parties, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_invoice_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='aged_on',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='aging_1_30',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='aging_31_60',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='aging_61_90',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='aging_current',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='aging_over_90',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='aged_on',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='aging_1_30',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='aging_31_60',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='aging_61_90',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='aging_current',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='aging_over_90',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(seed_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:29
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rollups(apps, schema_editor):
+    # Concurrent first postings could leave several rows per key; fold them into one
+    rollups = (
+        ('DailyProductRollup', ('day', 'invoice_type', 'product'), ('quantity', 'amount')),
+        ('DailyPartyRollup', ('day', 'invoice_type', 'customer', 'supplier'),
+         ('invoice_count', 'net_amount', 'tax_amount', 'total_amount')),
+    )
+    for model_name, key, totals in rollups:
+        model = apps.get_model('api', model_name)
+        duplicates = (
+            model.objects.values(*key)
+            .annotate(rows=Count('id'), keep=Min('id'), **{f'sum_{field}': Sum(field) for field in totals})
+            .filter(rows__gt=1).order_by()
+        )
+        for row in duplicates:
+            model.objects.filter(pk=row['keep']).update(**{field: row[f'sum_{field}'] for field in totals})
+            model.objects.filter(**{field: row[field] for field in key}).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_change_feeds'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rollups, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='dailyproductrollup',
+            name='api_dailypr_day_dca1a6_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='dailypartyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'invoice_type', 'customer', 'supplier'), name='unique_daily_party_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypartyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('supplier__isnull', True)), fields=('day', 'invoice_type', 'customer'), name='unique_daily_customer_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypartyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('customer__isnull', True)), fields=('day', 'invoice_type', 'supplier'), name='unique_daily_supplier_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypartyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('customer__isnull', True), ('supplier__isnull', True)), fields=('day', 'invoice_type'), name='unique_daily_walk_in_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'invoice_type', 'product'), name='unique_daily_product_rollup'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 class User(AbstractUser):
     ROLES = (
@@ -8,43 +9,73 @@ class User(AbstractUser):
         ('VIEWER', 'Viewer'),
     )
     role = models.CharField(max_length=10, choices=ROLES, default='VIEWER')
+    # Bumped whenever claims embedded in issued tokens (role) become stale
+    token_version = models.PositiveIntegerField(default=0)
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [models.Index(fields=['updated_at'])] # ?updated_since= change feeds
+
+class AgedBalance(models.Model):
+    # Invoiced amounts owed (customers) or owing (suppliers), split by days
+    # overdue as of aged_on. Kept up to date by invoice posting and the
+    # reconcile_balances command (api/aging.py); never written by clients.
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    aging_current = models.DecimalField(max_digits=14, decimal_places=2, default=0) # Not yet due, or no due date
+    aging_1_30 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    aging_31_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    aging_61_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    aging_over_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    aged_on = models.DateField(default=timezone.localdate)
 
-class Supplier(models.Model):
+    class Meta:
+        abstract = True
+
+class Supplier(AgedBalance):
     name = models.CharField(max_length=255)
     email = models.EmailField(blank=True)
     phone = models.CharField(max_length=20, blank=True)
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
-class Customer(models.Model):
+    class Meta:
+        indexes = [models.Index(fields=['updated_at'])]
+
+class Customer(AgedBalance):
     name = models.CharField(max_length=255)
     email = models.EmailField(blank=True)
     phone = models.CharField(max_length=20, blank=True)
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [models.Index(fields=['updated_at'])]
+
+DEFAULT_REORDER_LEVEL = 10
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     sku = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2) # Selling Price
     stock_quantity = models.IntegerField(default=0)
+    reorder_level = models.PositiveIntegerField(default=DEFAULT_REORDER_LEVEL) # Low stock below this
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='products')
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, related_name='products')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -53,6 +84,13 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock_quantity']), # Low-stock thresholds
+            models.Index(fields=['name']),
+            models.Index(fields=['updated_at']),
+        ]
+
 class Invoice(models.Model):
     INVOICE_TYPES = (
         ('PURCHASE', 'Purchase (Stock In)'),
@@ -70,10 +108,20 @@ class Invoice(models.Model):
     
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     note = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.invoice_type} - {self.id}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['invoice_type', 'transaction_date']),
+            models.Index(fields=['transaction_date']),
+            models.Index(fields=['customer', 'transaction_date']),
+            models.Index(fields=['supplier', 'transaction_date']),
+            models.Index(fields=['updated_at']),
+        ]
+
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -85,5 +133,217 @@ class InvoiceItem(models.Model):
         self.subtotal = self.unit_price * self.quantity
         super().save(*args, **kwargs)
 
+# Invoices of closed periods, moved out of the hot tables by api/archive.py.
+# Rows keep their original ids and mirror Invoice/InvoiceItem column for column.
+
+class ArchivedInvoice(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    invoice_type = models.CharField(max_length=10, choices=Invoice.INVOICE_TYPES)
+    supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_invoices')
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_invoices')
+    transaction_date = models.DateTimeField()
+    due_date = models.DateField(null=True, blank=True)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    note = models.TextField(blank=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.invoice_type} - {self.id} (archived)"
+
+    class Meta:
+        indexes = [models.Index(fields=['transaction_date'])]
+
+class ArchivedInvoiceItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    invoice = models.ForeignKey(ArchivedInvoice, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.IntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+
+class PeriodSummary(models.Model):
+    # Totals of the invoices archived for each month, left behind when a period is closed
+    period = models.DateField() # First day of the month
+    invoice_type = models.CharField(max_length=10, choices=Invoice.INVOICE_TYPES)
+    invoice_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['period', 'invoice_type'], name='unique_period_summary')]
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} {self.invoice_type}: {self.invoice_count} invoices"
+
 # Deprecated but kept for migration safety if needed, or we can just delete it.
 # Choosing to delete 'Transaction' model code as we are replacing it.
+
+class StockMovement(models.Model):
+    MOVEMENT_TYPES = (
+        ('PURCHASE', 'Purchase'),
+        ('SALE', 'Sale'),
+        ('ADJUSTMENT', 'Adjustment'),
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    movement_type = models.CharField(max_length=10, choices=MOVEMENT_TYPES)
+    quantity = models.IntegerField() # Signed: positive adds stock, negative removes it
+    occurred_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'occurred_at'])]
+
+    def __str__(self):
+        return f"{self.movement_type} {self.quantity:+d} - {self.product_id}"
+
+class StockSnapshot(models.Model):
+    # Stock level including every movement with occurred_at <= taken_at
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField()
+    stock_quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['product', 'taken_at'], name='unique_product_snapshot')]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.stock_quantity}"
+
+class LowStockEntry(models.Model):
+    # Membership of the low-stock set (stock_quantity < reorder_level),
+    # kept in step with stock writes by api/alerts.py
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='low_stock_entry')
+    since = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product_id} low since {self.since:%Y-%m-%d %H:%M}"
+
+class StockAlert(models.Model):
+    # One row per crossing of a product's reorder level
+    ALERT_TYPES = (
+        ('LOW', 'Fell below reorder level'),
+        ('CLEARED', 'Back at or above reorder level'),
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alerts')
+    alert_type = models.CharField(max_length=10, choices=ALERT_TYPES)
+    stock_quantity = models.IntegerField()
+    reorder_level = models.PositiveIntegerField()
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_alerts')
+    occurred_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'occurred_at'])]
+
+    def __str__(self):
+        return f"{self.alert_type} {self.product_id} at {self.stock_quantity}"
+
+class Tombstone(models.Model):
+    # A deleted row of a table served with ?updated_since= change feeds
+    # (api/sync.py), written by post_delete and by archival
+    label = models.CharField(max_length=100) # Model label, e.g. api.product
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['label', 'deleted_at'])]
+
+    def __str__(self):
+        return f"{self.label} #{self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+class ModelVersion(models.Model):
+    # Per-table change counter bumped after every committed write; backs
+    # ETag/Last-Modified on the list and detail endpoints.
+    label = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
+
+# Daily rollups maintained by invoice posting (api/reports.py) and rebuilt by
+# the rebuild_rollups command. Rows are incremented in place; each key has one
+# row, so a concurrent first posting for it adds to the row the other created.
+
+class DailyProductRollup(models.Model):
+    day = models.DateField()
+    invoice_type = models.CharField(max_length=10, choices=Invoice.INVOICE_TYPES)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0) # Sum of line subtotals
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'invoice_type', 'product'], name='unique_daily_product_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.invoice_type} {self.product_id}: {self.quantity}"
+
+class DailyPartyRollup(models.Model):
+    day = models.DateField()
+    invoice_type = models.CharField(max_length=10, choices=Invoice.INVOICE_TYPES)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    invoice_count = models.IntegerField(default=0)
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['day', 'invoice_type'])]
+        # NULLs never collide in a unique index, so each combination of
+        # missing parties gets its own partial constraint
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'invoice_type', 'customer', 'supplier'], name='unique_daily_party_rollup'),
+            models.UniqueConstraint(
+                fields=['day', 'invoice_type', 'customer'], condition=models.Q(supplier__isnull=True),
+                name='unique_daily_customer_rollup',
+            ),
+            models.UniqueConstraint(
+                fields=['day', 'invoice_type', 'supplier'], condition=models.Q(customer__isnull=True),
+                name='unique_daily_supplier_rollup',
+            ),
+            models.UniqueConstraint(
+                fields=['day', 'invoice_type'], condition=models.Q(customer__isnull=True, supplier__isnull=True),
+                name='unique_daily_walk_in_rollup',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.invoice_type}: {self.invoice_count} invoices"
+
+class Job(models.Model):
+    # Background work queued through /api/jobs/ and run by the run_worker
+    # command; handlers and claiming live in api/jobs.py
+    STATUSES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    )
+    job_type = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='QUEUED')
+    progress = models.PositiveSmallIntegerField(default=0) # Percent
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now) # Pushed back between retries
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.job_type} #{self.id} {self.status}"
@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+class IdCursorPagination(CursorPagination):
+    # Primary keys are unique and increase with creation time, so keying the
+    # cursor on '-id' gives newest-first pages that stay stable under inserts.
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
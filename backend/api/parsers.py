@@ -0,0 +1,25 @@
+import json
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+class NDJSONParser(BaseParser):
+    """Parses newline-delimited JSON lazily, one document per line.
+
+    Malformed lines are yielded as ``ParseError`` instances so bulk callers
+    can report them per record instead of rejecting the whole upload.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        return self._iter_documents(stream, encoding)
+
+    def _iter_documents(self, stream, encoding):
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode(encoding))
+            except (UnicodeDecodeError, ValueError) as exc:
+                yield ParseError(f'NDJSON parse error - {exc}')
@@ -0,0 +1,184 @@
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from .bulk import insert_from_query
+from .models import ArchivedInvoice, ArchivedInvoiceItem, DailyPartyRollup, DailyProductRollup, Invoice, InvoiceItem
+
+REPORT_DIMENSIONS = ('day', 'month', 'product', 'category', 'customer', 'supplier')
+DEFAULT_REPORT_DAYS = 30
+# Invoice fields that decide which rollup rows it is counted in, and with what
+INVOICE_ROLLUP_FIELDS = (
+    'transaction_date', 'invoice_type', 'customer_id', 'supplier_id', 'net_amount', 'tax_amount', 'total_amount',
+)
+PARTY_ROLLUP_FIELDS = ('invoice_count', 'net_amount', 'tax_amount', 'total_amount')
+
+def increment(model, key, **deltas):
+    # ``key`` is unique: when a concurrent first posting creates the row
+    # between our UPDATE and INSERT, add to that row instead
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        model.objects.filter(**key).update(**updates)
+
+def record_invoice_rollups(invoice, items_data, reverse=False):
+    """Add a posted invoice to the day's rollups, or take it off again with
+    ``reverse``; call inside its transaction."""
+    sign = -1 if reverse else 1
+    day = timezone.localdate(invoice.transaction_date)
+    lines = {}
+    for item in items_data:
+        quantity, amount = lines.get(item['product'].pk, (0, 0))
+        lines[item['product'].pk] = (quantity + item['quantity'], amount + item['unit_price'] * item['quantity'])
+
+    # Same product order as the stock updates, so lock order stays fixed
+    for product_id in sorted(lines):
+        quantity, amount = lines[product_id]
+        increment(
+            DailyProductRollup,
+            {'day': day, 'invoice_type': invoice.invoice_type, 'product_id': product_id},
+            quantity=sign * quantity, amount=sign * amount,
+        )
+    party_key = {'day': day, 'invoice_type': invoice.invoice_type,
+                 'customer_id': invoice.customer_id, 'supplier_id': invoice.supplier_id}
+    increment(
+        DailyPartyRollup, party_key, invoice_count=sign,
+        net_amount=sign * invoice.net_amount, tax_amount=sign * invoice.tax_amount,
+        total_amount=sign * invoice.total_amount,
+    )
+    if reverse:
+        # Drop keys with nothing left in them, as a rebuild would not have them
+        DailyProductRollup.objects.filter(
+            day=day, invoice_type=invoice.invoice_type, product_id__in=lines, quantity=0, amount=0,
+        ).delete()
+        DailyPartyRollup.objects.filter(**party_key, invoice_count=0).delete()
+
+def saved_items(invoice):
+    """A saved invoice's lines in the shape record_invoice_rollups takes."""
+    return [
+        {'product': item.product, 'quantity': item.quantity, 'unit_price': item.unit_price}
+        for item in invoice.items.select_related('product')
+    ]
+
+def move_invoice_rollups(before, invoice):
+    """Re-count an edited invoice (``before`` is a copy of it as it was) under
+    the day, type and parties it has now; call inside its transaction."""
+    if any(getattr(before, field) != getattr(invoice, field) for field in INVOICE_ROLLUP_FIELDS):
+        items = saved_items(invoice)
+        record_invoice_rollups(before, items, reverse=True)
+        record_invoice_rollups(invoice, items)
+
+def merge_party_rollups(party_field, party_id):
+    """Fold the rollup rows of the customer or supplier (``party_field``) being
+    deleted into the rows its invoices fall under once on_delete nulls it;
+    call before the delete."""
+    rows = list(DailyPartyRollup.objects.filter(**{party_field: party_id}))
+    DailyPartyRollup.objects.filter(pk__in=[row.pk for row in rows]).delete()
+    for row in rows:
+        key = {'day': row.day, 'invoice_type': row.invoice_type,
+               'customer_id': row.customer_id, 'supplier_id': row.supplier_id}
+        key[f'{party_field}_id'] = None
+        increment(DailyPartyRollup, key, **{field: getattr(row, field) for field in PARTY_ROLLUP_FIELDS})
+
+def _invoice_days(model):
+    return set(model.objects.annotate(day=TruncDate('transaction_date')).values_list('day', flat=True).distinct())
+
+def rebuild_rollups():
+    """Recompute every rollup row from invoice history; call inside a transaction."""
+    DailyProductRollup.objects.all().delete()
+    DailyPartyRollup.objects.all().delete()
+
+    # Aggregated and inserted by the database in one statement per table,
+    # for the archive of closed periods and then the hot tables. A day split
+    # between the two (invoices archived from the admin) would repeat keys,
+    # so the hot rows of such days are added to the archived ones instead.
+    shared_days = _invoice_days(ArchivedInvoice) & _invoice_days(Invoice)
+    for invoice_model, item_model, merged_days in (
+        (ArchivedInvoice, ArchivedInvoiceItem, set()), (Invoice, InvoiceItem, shared_days),
+    ):
+        product_rows = (
+            item_model.objects.annotate(day=TruncDate('invoice__transaction_date'))
+            .values('day', 'invoice__invoice_type', 'product_id')
+            .annotate(total_quantity=Sum('quantity'), total_amount=Sum('subtotal'))
+            .order_by()
+        )
+        party_rows = (
+            invoice_model.objects.annotate(day=TruncDate('transaction_date'))
+            .values('day', 'invoice_type', 'customer_id', 'supplier_id')
+            .annotate(
+                count=Count('id'), net=Sum('net_amount'), tax=Sum('tax_amount'), total=Sum('total_amount'),
+            )
+            .order_by()
+        )
+        insert_from_query(DailyProductRollup, ['day', 'invoice_type', 'product_id', 'quantity', 'amount'],
+                          product_rows.exclude(day__in=merged_days))
+        insert_from_query(DailyPartyRollup, [
+            'day', 'invoice_type', 'customer_id', 'supplier_id',
+            'invoice_count', 'net_amount', 'tax_amount', 'total_amount',
+        ], party_rows.exclude(day__in=merged_days))
+        for row in product_rows.filter(day__in=merged_days):
+            increment(
+                DailyProductRollup,
+                {'day': row['day'], 'invoice_type': row['invoice__invoice_type'], 'product_id': row['product_id']},
+                quantity=row['total_quantity'], amount=row['total_amount'],
+            )
+        for row in party_rows.filter(day__in=merged_days):
+            increment(
+                DailyPartyRollup,
+                {'day': row['day'], 'invoice_type': row['invoice_type'],
+                 'customer_id': row['customer_id'], 'supplier_id': row['supplier_id']},
+                invoice_count=row['count'], net_amount=row['net'], tax_amount=row['tax'], total_amount=row['total'],
+            )
+    return DailyProductRollup.objects.count(), DailyPartyRollup.objects.count()
+
+def _line_totals(rows, key, name):
+    return rows.values('invoice_type', key=key, name=name).annotate(
+        quantity=Sum('quantity'), amount=Sum('amount'),
+    ).order_by('invoice_type', '-amount')
+
+def _invoice_totals(rows, key, name=None):
+    group = {'key': key} if name is None else {'key': key, 'name': name}
+    return rows.values('invoice_type', **group).annotate(
+        invoice_count=Sum('invoice_count'), net_amount=Sum('net_amount'),
+        tax_amount=Sum('tax_amount'), total_amount=Sum('total_amount'),
+    )
+
+def build_report(group_by, date_from, date_to, invoice_type=None):
+    """Totals per ``group_by`` value over the inclusive day range, split by invoice type.
+
+    Reads only rollup rows, so cost grows with the days (and products or
+    parties) in range rather than with invoice history.
+    """
+    filters = {'day__gte': date_from, 'day__lte': date_to}
+    if invoice_type:
+        filters['invoice_type'] = invoice_type
+    products = DailyProductRollup.objects.filter(**filters)
+    parties = DailyPartyRollup.objects.filter(**filters)
+
+    if group_by == 'product':
+        rows = _line_totals(products, F('product_id'), F('product__name'))
+    elif group_by == 'category':
+        rows = _line_totals(products, F('product__category_id'), F('product__category__name'))
+    elif group_by in ('customer', 'supplier'):
+        rows = _invoice_totals(
+            parties.filter(**{f'{group_by}__isnull': False}), F(f'{group_by}_id'), F(f'{group_by}__name'),
+        ).order_by('invoice_type', '-total_amount')
+    elif group_by == 'month':
+        rows = _invoice_totals(parties, TruncMonth('day')).order_by('key', 'invoice_type')
+    else:
+        rows = _invoice_totals(parties, F('day')).order_by('key', 'invoice_type')
+
+    results = []
+    for row in rows:
+        if group_by == 'category' and row['key'] is None:
+            row['name'] = 'Uncategorized'
+        for field in ('amount', 'net_amount', 'tax_amount', 'total_amount'):
+            if field in row:
+                row[field] = str(row[field].quantize(Decimal('0.01')))
+        results.append(row)
+    return results
@@ -0,0 +1,81 @@
+from django.db import connection
+from .models import Product
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Share of the query's trigrams a name or SKU must contain, as with
+# pg_trgm's word_similarity_threshold
+WORD_SIMILARITY_THRESHOLD = 0.6
+# FTS candidates fetched per requested result before similarity filtering
+CANDIDATE_FACTOR = 5
+
+def _trigrams(term):
+    term = term.lower()
+    return sorted({term[i:i + 3] for i in range(len(term) - 2)})
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+def _word_similarity(query_grams, text):
+    grams = set(_trigrams(text))
+    return sum(1 for gram in query_grams if gram in grams) / len(query_grams)
+
+def _sqlite_ids(term, limit):
+    with connection.cursor() as cursor:
+        if len(term) < 3:
+            # Too short for a trigram; prefix-match the plain columns instead
+            cursor.execute(
+                "SELECT id FROM api_product WHERE name LIKE %s ESCAPE '\\' OR sku LIKE %s ESCAPE '\\' "
+                "ORDER BY name LIMIT %s",
+                [_like_prefix(term)] * 2 + [limit],
+            )
+        else:
+            # OR-ing the query's trigrams lets near misses (typos) match too;
+            # bm25 pulls a bounded candidate set that is then filtered and
+            # ordered by the share of query trigrams each row contains.
+            grams = _trigrams(term)
+            cursor.execute(
+                "SELECT rowid, name, sku FROM api_product_fts WHERE api_product_fts MATCH %s "
+                "ORDER BY bm25(api_product_fts, 2.0, 1.0) LIMIT %s",
+                [' OR '.join(_fts_phrase(gram) for gram in grams), limit * CANDIDATE_FACTOR],
+            )
+            scored = []
+            for position, (pk, name, sku) in enumerate(cursor.fetchall()):
+                score = max(_word_similarity(grams, name), _word_similarity(grams, sku))
+                if score >= WORD_SIMILARITY_THRESHOLD:
+                    scored.append((-score, position, pk))
+            return [pk for _, _, pk in sorted(scored)[:limit]]
+        return [row[0] for row in cursor.fetchall()]
+
+def _postgresql_ids(term, limit):
+    with connection.cursor() as cursor:
+        # <% is word similarity, which the trigram GIN indexes can answer
+        cursor.execute(
+            "SELECT id FROM api_product "
+            "WHERE %s <%% name OR %s <%% sku OR name ILIKE %s OR sku ILIKE %s "
+            "ORDER BY GREATEST(word_similarity(%s, name), word_similarity(%s, sku)) DESC, name LIMIT %s",
+            [term, term, _like_prefix(term), _like_prefix(term), term, term, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+def _like_prefix(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def search_products(term, limit=SEARCH_LIMIT, queryset=None):
+    """Return up to ``limit`` products matching ``term``, best match first.
+
+    Uses the FTS5 trigram table on SQLite and pg_trgm on PostgreSQL; other
+    backends fall back to an unindexed prefix match.
+    """
+    term = term.strip()
+    if not term:
+        return []
+    queryset = queryset if queryset is not None else Product.objects.all()
+    if connection.vendor == 'sqlite':
+        ids = _sqlite_ids(term, limit)
+    elif connection.vendor == 'postgresql':
+        ids = _postgresql_ids(term, limit)
+    else:
+        return list(queryset.filter(name__istartswith=term)[:limit])
+    products = queryset.in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
@@ -1,8 +1,37 @@
+from functools import partial
 from rest_framework import serializers
-from .models import User, Category, Supplier, Customer, Product, Invoice, InvoiceItem
+from .models import User, Category, Supplier, Customer, Product, Invoice, InvoiceItem, Job
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .ledger import record_adjustments, record_invoice_movements
+from .versioning import bump_versions
+from .reports import record_invoice_rollups
+from .aging import BALANCE_FIELDS, record_invoice_balance
+from .alerts import sync_low_stock
+from .broadcast import publish_stock_levels
+from .metrics import TimedSerializerMixin
+from .authentication import revoke_claims
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Limits output to the comma-separated ``?fields=`` of a read request.
+
+    ``id`` is always kept: cursor pages and the merges of hot and archived
+    invoices are ordered on it.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        allowed = {'id', *(name.strip() for name in requested.split(',') if name.strip())}
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     class Meta:
         model = User
@@ -11,29 +40,73 @@ class UserSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
-class CategorySerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        previous_role = instance.role
+        user = super().update(instance, validated_data)
+        if user.role != previous_role:
+            revoke_claims(user)
+        return user
+
+def is_plain_id(value):
+    """An int or a string of digits; bool is an int subclass but not an id."""
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, str) and value.isdigit())
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves ids from ``context['preloaded'][Model]`` when a bulk caller has
+    fetched them up front, falling back to a per-value query otherwise."""
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(self.queryset.model)
+        # Only plain ids; bools and the like get the parent's type errors
+        if preloaded is not None and is_plain_id(data) and int(data) in preloaded:
+            return preloaded[int(data)]
+        if isinstance(data, float) and not data.is_integer():
+            # The pk lookup would truncate 1.5 to 1
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        return super().to_internal_value(data)
+
+class CategorySerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
+        read_only_fields = BALANCE_FIELDS
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = '__all__'
+        read_only_fields = BALANCE_FIELDS
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     class Meta:
         model = Product
         fields = '__all__'
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            product = super().create(validated_data)
+            record_adjustments({product.pk: product.stock_quantity})
+        return product
+
+    def update(self, instance, validated_data):
+        previous_stock = instance.stock_quantity
+        with transaction.atomic():
+            product = super().update(instance, validated_data)
+            record_adjustments({product.pk: product.stock_quantity - previous_stock})
+            if product.stock_quantity != previous_stock:
+                transaction.on_commit(partial(publish_stock_levels, [product.pk]))
+        return product
+
 class InvoiceItemSerializer(serializers.ModelSerializer):
+    product = PreloadedPrimaryKeyRelatedField(queryset=Product.objects.all())
     product_name = serializers.CharField(source='product.name', read_only=True)
     
     class Meta:
@@ -41,8 +114,10 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
         fields = ('id', 'product', 'product_name', 'quantity', 'unit_price', 'subtotal')
         read_only_fields = ('subtotal',)
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     items = InvoiceItemSerializer(many=True)
+    supplier = PreloadedPrimaryKeyRelatedField(queryset=Supplier.objects.all(), required=False, allow_null=True)
+    customer = PreloadedPrimaryKeyRelatedField(queryset=Customer.objects.all(), required=False, allow_null=True)
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     customer_name = serializers.CharField(source='customer.name', read_only=True)
     user_username = serializers.CharField(source='user.username', read_only=True)
@@ -76,19 +151,51 @@ class InvoiceSerializer(serializers.ModelSerializer):
                 total_amount=total_amount
             )
 
-            for item_data in items_data:
-                InvoiceItem.objects.create(invoice=invoice, **item_data)
-                
-                # Stock Logic
-                product = item_data['product']
-                qty = item_data['quantity']
-                
-                if invoice.invoice_type == 'PURCHASE':
-                    product.stock_quantity += qty
-                elif invoice.invoice_type == 'SALE':
-                    if product.stock_quantity < qty:
-                        raise serializers.ValidationError(f"Insufficient stock for {product.name}")
-                    product.stock_quantity -= qty
-                product.save()
+            InvoiceItem.objects.bulk_create([
+                # bulk_create skips InvoiceItem.save(), so fill subtotal here
+                InvoiceItem(invoice=invoice, subtotal=item['unit_price'] * item['quantity'], **item)
+                for item in items_data
+            ])
+            self.apply_stock_changes(invoice, items_data)
+            record_invoice_rollups(invoice, items_data)
+            record_invoice_balance(invoice)
 
         return invoice
+
+    def apply_stock_changes(self, invoice, items_data):
+        # Net quantity per product so repeated lines become one UPDATE
+        quantities = {}
+        products = {}
+        for item in items_data:
+            product = item['product']
+            quantities[product.pk] = quantities.get(product.pk, 0) + item['quantity']
+            products[product.pk] = product
+
+        now = timezone.now()
+        # Fixed lock order keeps concurrent invoices from deadlocking
+        for product_id in sorted(quantities):
+            qty = quantities[product_id]
+            rows = Product.objects.filter(pk=product_id)
+            if invoice.invoice_type == 'SALE':
+                # Check and decrement in one statement; no lost updates
+                rows = rows.filter(stock_quantity__gte=qty)
+                delta = -qty
+            else:
+                delta = qty
+            if not rows.update(stock_quantity=F('stock_quantity') + delta, updated_at=now):
+                raise serializers.ValidationError(f"Insufficient stock for {products[product_id].name}")
+
+        record_invoice_movements(invoice, quantities)
+        sync_low_stock(quantities, invoice=invoice)
+        # The conditional updates above bypass post_save
+        bump_versions(Product)
+        transaction.on_commit(partial(publish_stock_levels, sorted(quantities)))
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'job_type', 'params', 'status', 'progress', 'result', 'error', 'attempts', 'max_attempts',
+            'run_after', 'created_by', 'created_at', 'started_at', 'finished_at',
+        )
+        read_only_fields = fields
@@ -0,0 +1,70 @@
+from functools import partial
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .alerts import sync_low_stock
+from .authentication import forget_auth_state
+from .dashboard import invalidate_summary
+from .metrics import install_query_timer
+from .reports import merge_party_rollups
+from .sync import record_tombstones, touch_dependents
+from .models import User, Category, Supplier, Customer, Product, Invoice
+from .versioning import bump_versions
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Invoice)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_dashboard_summary(sender, **kwargs):
+    # Drop the snapshot once the write is visible to other connections,
+    # otherwise a concurrent reader could re-cache pre-commit numbers.
+    transaction.on_commit(invalidate_summary)
+
+@receiver([post_save, post_delete], sender=User)
+def drop_cached_auth_state(sender, instance, **kwargs):
+    # Deactivated and deleted users are refused from the next request rather
+    # than once the cached is_active expires; after commit, as above.
+    transaction.on_commit(partial(forget_auth_state, instance.pk))
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Supplier)
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Invoice)
+def bump_model_version(sender, **kwargs):
+    bump_versions(sender)
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Invoice)
+def record_tombstone(sender, instance, **kwargs):
+    # So ?updated_since= feeds can tell clients to drop the row
+    record_tombstones(sender, [instance.pk])
+
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Supplier)
+@receiver(pre_delete, sender=Customer)
+@receiver(pre_delete, sender=Product)
+def touch_delete_dependents(sender, instance, **kwargs):
+    # Before the delete, while the rows still point at the instance
+    touch_dependents(sender, instance.pk)
+
+@receiver(pre_delete, sender=Customer)
+@receiver(pre_delete, sender=Supplier)
+def merge_deleted_party_rollups(sender, instance, **kwargs):
+    # SET_NULL would otherwise move the rows onto keys that may already exist
+    merge_party_rollups(sender._meta.model_name, instance.pk)
+
+@receiver(post_save, sender=Product)
+def sync_product_low_stock(sender, instance, **kwargs):
+    # Direct saves (forms, admin, shell); invoice posts and imports update
+    # stock in bulk and sync the rows they touched themselves.
+    sync_low_stock([instance.pk])
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    install_query_timer(connection)
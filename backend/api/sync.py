@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from rest_framework import serializers
+from .models import Category, Customer, Invoice, Product, Supplier, Tombstone, User
+
+# ?updated_since= cursors are microseconds since the epoch. A new cursor
+# stops this far behind "now" so rows written by transactions still in
+# flight, whose updated_at is already set but not yet committed, are sent
+# on the next sync rather than skipped; rows near the cursor may repeat.
+SYNC_LAG = timedelta(minutes=1)
+# Older cursors cannot be served (their tombstones may be pruned); clients resync from 0
+TOMBSTONE_RETENTION = timedelta(days=30)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Deleted model -> (synced model, lookup to the deleted row) for rows whose
+# output a delete changes through on_delete. Django applies SET_NULL and
+# cascades with bulk statements that leave auto_now alone.
+DELETE_DEPENDENTS = {
+    Category: ((Product, 'category'),),
+    Supplier: ((Product, 'supplier'), (Invoice, 'supplier')),
+    Customer: ((Invoice, 'customer'),),
+    Product: ((Invoice, 'items__product'),),
+    User: ((Invoice, 'user'),),
+}
+
+def encode_cursor(when):
+    return str((when - EPOCH) // timedelta(microseconds=1))
+
+def decode_cursor(value):
+    if not value.isdigit():
+        raise serializers.ValidationError({'updated_since': 'Expected a cursor from a previous sync, or 0.'})
+    return EPOCH + timedelta(microseconds=int(value))
+
+def encode_position(updated_at, pk):
+    """Where a change feed page ended, as ``<cursor>.<id>``."""
+    return f'{encode_cursor(updated_at)}.{pk}'
+
+def decode_position(value):
+    cursor, _, pk = value.partition('.')
+    if not (cursor.isdigit() and pk.isdigit()):
+        raise serializers.ValidationError({'after': 'Expected the position from a previous page.'})
+    return decode_cursor(cursor), int(pk)
+
+def record_tombstones(model, ids, deleted_at=None):
+    deleted_at = deleted_at or timezone.now()
+    Tombstone.objects.bulk_create(
+        Tombstone(label=model._meta.label_lower, object_id=object_id, deleted_at=deleted_at) for object_id in ids
+    )
+
+def touch_dependents(model, pk):
+    """Bump updated_at on synced rows that deleting ``model`` row ``pk`` will change; call before the delete."""
+    now = timezone.now()
+    for dependent, lookup in DELETE_DEPENDENTS.get(model, ()):
+        dependent.objects.filter(**{lookup: pk}).update(updated_at=now)
+
+def deleted_since(model, since):
+    tombstones = Tombstone.objects.filter(label=model._meta.label_lower, deleted_at__gte=since)
+    return list(tombstones.order_by('object_id').values_list('object_id', flat=True).distinct())
+
+def prune_tombstones(before=None):
+    before = before or timezone.now() - TOMBSTONE_RETENTION
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=before).delete()
+    return deleted
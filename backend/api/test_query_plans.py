@@ -0,0 +1,80 @@
+import re
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from .models import DEFAULT_REORDER_LEVEL, Invoice, Product
+
+# Anything but a bounded index search: "SCAN t" and "SCAN t USING [COVERING]
+# INDEX i" (a walk of the whole index) on SQLite, "Seq Scan on t" on PostgreSQL.
+FULL_SCAN = re.compile(r'\bSCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?|Seq Scan on (\w+)()')
+
+def index_name(model, fields):
+    return next(index.name for index in model._meta.indexes if index.fields == fields)
+
+class QueryPlanTests(TestCase):
+    """Hot invoice and product queries must be answered from an index.
+
+    Tables are empty here, so PostgreSQL is told to avoid sequential scans
+    whenever an index can serve; SQLite plans from the schema alone.
+    """
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        self.until = timezone.now()
+        self.since = self.until - timedelta(days=30)
+
+    def assertIndexed(self, plan, ordered_walks=()):
+        """Fail on any full scan except a walk of an index named in ``ordered_walks``,
+        for queries that read rows in index order and stop at a LIMIT."""
+        scans = [
+            match.group(0) for match in FULL_SCAN.finditer(plan)
+            if not (match.group(2) and match.group(2) in ordered_walks)
+        ]
+        self.assertEqual(scans, [], f'Full scan in plan:\n{plan}')
+
+    def assertQuerysetIndexed(self, queryset, ordered_walks=()):
+        self.assertIndexed(queryset.explain(), ordered_walks)
+
+    def test_invoices_by_type_and_date_range(self):
+        self.assertQuerysetIndexed(Invoice.objects.filter(
+            invoice_type='SALE', transaction_date__gte=self.since, transaction_date__lt=self.until,
+        ).order_by('-id')[:100])
+
+    def test_invoices_by_date_range(self):
+        self.assertQuerysetIndexed(Invoice.objects.filter(
+            transaction_date__gte=self.since, transaction_date__lt=self.until,
+        ).order_by('-id')[:100])
+
+    def test_invoices_by_party_and_date(self):
+        for party in ('customer_id', 'supplier_id'):
+            with self.subTest(party=party):
+                self.assertQuerysetIndexed(Invoice.objects.filter(
+                    **{party: 1}, transaction_date__gte=self.since,
+                ).order_by('-id')[:100])
+
+    def test_low_stock_products(self):
+        low_stock = Product.objects.filter(stock_quantity__lt=DEFAULT_REORDER_LEVEL)
+        self.assertQuerysetIndexed(low_stock.values('id'))
+        self.assertQuerysetIndexed(low_stock.order_by('stock_quantity')[:100])
+
+    def test_products_by_name(self):
+        self.assertQuerysetIndexed(Product.objects.filter(name='Widget'))
+        # An ordered walk that stops after the first 100 entries
+        self.assertQuerysetIndexed(Product.objects.order_by('name')[:100], [index_name(Product, ['name'])])
+
+    def test_short_search_walks_name_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite-only search path')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM api_product WHERE name LIKE %s ESCAPE '\\' "
+                "OR sku LIKE %s ESCAPE '\\' ORDER BY name LIMIT %s",
+                ['ab%', 'ab%', 20],
+            )
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        # Walks names in order until LIMIT matches; no search can serve a
+        # case-insensitive prefix on either of two columns
+        self.assertIndexed(plan, [index_name(Product, ['name'])])
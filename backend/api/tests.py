@@ -1,3 +1,1558 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import tempfile
+import threading
+import time
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet, Sum
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from .aging import reconcile_balances
+from .broadcast import SUBSCRIBER_BUFFER, Broadcaster, LocalBackend, get_broadcaster
+from .fastrows import FastJSONRenderer, FastRows
+from .imports import ProductCatalogImport
+from .jobs import JOB_TYPES, JobType, claim_job, report_progress, requeue_stale, run_job
+from .ledger import take_snapshots
+from .archive import archive_invoices
+from .reports import increment, record_invoice_rollups
+from .sync import TOMBSTONE_RETENTION, decode_cursor, encode_cursor
+from .serializers import ProductSerializer
+from .token_serializers import MyTokenObtainPairSerializer
+from .models import (
+    User, Category, Supplier, Customer, Product, Invoice, InvoiceItem, StockMovement,
+    DailyPartyRollup, DailyProductRollup, LowStockEntry, StockAlert, Job,
+    ArchivedInvoice, ArchivedInvoiceItem, PeriodSummary, Tombstone,
+)
 
-# Create your tests here.
+
+class QueryCountTests(APITestCase):
+    """List and detail endpoints must not issue per-row queries.
+
+    Counts include one lookup of the ETag change counters, except for the
+    reference-data endpoints whose counters live in the cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('admin', password='pw', role='ADMIN')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name='Tools')
+        self.supplier = Supplier.objects.create(name='Acme')
+        self.customer = Customer.objects.create(name='Bob')
+
+    def make_products(self, count):
+        start = Product.objects.count()
+        return Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}', sku=f'SKU-{i}', price=Decimal('5.00'), stock_quantity=100,
+                category=self.category, supplier=self.supplier,
+            )
+            for i in range(start, start + count)
+        ])
+
+    def make_invoices(self, count, items_per_invoice=3):
+        products = self.make_products(items_per_invoice)
+        for _ in range(count):
+            invoice = Invoice.objects.create(
+                invoice_type='SALE', customer=self.customer, supplier=self.supplier, user=self.user
+            )
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(invoice=invoice, product=product, quantity=1,
+                            unit_price=product.price, subtotal=product.price)
+                for product in products
+            ])
+        return invoice
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url, grow):
+        grow()
+        baseline = self.count_queries(url)
+        grow()
+        grow()
+        self.assertEqual(self.count_queries(url), baseline)
+
+    def test_product_list(self):
+        self.assertConstantQueries('/api/products/', lambda: self.make_products(5))
+        with self.assertNumQueries(2):
+            self.client.get('/api/products/')
+
+    def test_product_detail(self):
+        product = self.make_products(1)[0]
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/products/{product.id}/')
+
+    def test_invoice_list(self):
+        self.assertConstantQueries('/api/invoices/', lambda: self.make_invoices(5))
+        with self.assertNumQueries(3):
+            self.client.get('/api/invoices/')
+
+    def test_invoice_detail(self):
+        invoice = self.make_invoices(1, items_per_invoice=10)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/invoices/{invoice.id}/')
+        self.assertEqual(len(response.data['items']), 10)
+
+    def test_party_lists(self):
+        for url in ('/api/categories/', '/api/suppliers/', '/api/customers/'):
+            with self.subTest(url=url), self.assertNumQueries(2):
+                self.client.get(url)
+
+
+class ListPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('viewer', password='pw', role='VIEWER'))
+        self.products = [
+            Product.objects.create(name=f'Product {i}', sku=f'SKU-{i}', price=Decimal('5.00'), stock_quantity=i)
+            for i in range(5)
+        ]
+
+    def walk(self, url, during=None):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+            if during:
+                during()
+        return ids
+
+    def test_cursor_pages_are_newest_first_and_stable_under_inserts(self):
+        response = self.client.get('/api/products/', {'page_size': 2})
+        self.assertEqual([row['id'] for row in response.data['results']], [p.id for p in self.products[:-3:-1]])
+        self.assertIsNone(response.data['previous'])
+
+        # New rows land in front of the cursor, so the walk neither repeats nor skips
+        added = []
+        def insert():
+            added.append(Product.objects.create(name='New', sku=f'NEW-{len(added)}', price=Decimal('1.00')))
+        ids = self.walk('/api/products/?page_size=2', during=insert)
+        self.assertEqual(ids, [p.id for p in reversed(self.products)])
+        self.assertEqual(len(added), 3)
+
+        response = self.client.get('/api/products/')
+        self.assertEqual((len(response.data['results']), response.data['next']), (8, None))
+
+    def test_fields_trims_rows(self):
+        for fast_reads in (True, False):
+            with self.subTest(fast_reads=fast_reads), override_settings(FAST_READS=fast_reads):
+                response = self.client.get('/api/products/', {'fields': 'name, price,unknown', 'page_size': 2})
+                self.assertEqual([set(row) for row in response.data['results']], [{'id', 'name', 'price'}] * 2)
+                self.assertEqual(self.walk(response.data['next']), [p.id for p in reversed(self.products[:3])])
+                detail = self.client.get(f'/api/products/{self.products[0].id}/', {'fields': 'sku'})
+                self.assertEqual(detail.data, {'id': self.products[0].id, 'sku': 'SKU-0'})
+        # Writes answer with every field
+        editor = User.objects.create_user('editor', password='pw', role='EDITOR')
+        self.client.force_authenticate(editor)
+        response = self.client.patch(f'/api/products/{self.products[0].id}/?fields=sku', {'name': 'Renamed'}, format='json')
+        self.assertIn('price', response.data)
+
+
+class InvoiceStockTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(name='Bob')
+        self.product = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=5)
+
+    def post_invoice(self, invoice_type, *lines):
+        return self.client.post('/api/invoices/', {
+            'invoice_type': invoice_type,
+            'customer': self.customer.id,
+            'items': [{'product': p.id, 'quantity': q, 'unit_price': '2.00'} for p, q in lines],
+        }, format='json')
+
+    def test_sale_and_purchase_adjust_stock(self):
+        self.assertEqual(self.post_invoice('SALE', (self.product, 2), (self.product, 1)).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+        self.assertEqual(self.post_invoice('PURCHASE', (self.product, 10)).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 12)
+        self.assertEqual(InvoiceItem.objects.get(quantity=10).subtotal, Decimal('20.00'))
+
+    def test_insufficient_stock_rolls_back(self):
+        other = Product.objects.create(name='Gadget', sku='G-1', price=Decimal('1.00'), stock_quantity=50)
+        response = self.post_invoice('SALE', (other, 5), (self.product, 6))
+        self.assertEqual(response.status_code, 400)
+        other.refresh_from_db()
+        self.assertEqual(other.stock_quantity, 50)
+        self.assertFalse(Invoice.objects.exists())
+
+
+class ConcurrentSaleTests(TransactionTestCase):
+    """Parallel sales of one SKU must never oversell or lose an update."""
+
+    def test_parallel_sales(self):
+        user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        customer = Customer.objects.create(name='Bob')
+        product = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=10)
+        payload = {
+            'invoice_type': 'SALE',
+            'customer': customer.id,
+            'items': [{'product': product.id, 'quantity': 1, 'unit_price': '2.00'}],
+        }
+        start = threading.Barrier(8)
+
+        def post_when_unlocked(client):
+            # The in-memory test database allows one writer at a time and
+            # reports contention as an error instead of waiting, so retry.
+            while True:
+                try:
+                    return client.post('/api/invoices/', payload, format='json').status_code
+                except OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    time.sleep(0.005)
+
+        def sell(attempts):
+            client = APIClient()
+            client.force_authenticate(user)
+            codes = []
+            try:
+                start.wait()
+                for _ in range(attempts):
+                    codes.append(post_when_unlocked(client))
+            finally:
+                connections.close_all()
+            return codes
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = [code for result in pool.map(sell, [3] * 8) for code in result]
+
+        # A retried request may already have committed, so check the ledger
+        # invariants from the database rather than from response codes.
+        product.refresh_from_db()
+        self.assertLessEqual(set(codes), {201, 400})
+        self.assertEqual(product.stock_quantity, 0)
+        self.assertEqual(Invoice.objects.count(), 10)
+        self.assertEqual(InvoiceItem.objects.aggregate(sold=Sum('quantity'))['sold'], 10)
+
+
+class BulkInvoiceTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pos', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(name='Walk-in')
+        self.product = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=3)
+
+    def sale(self, quantity):
+        return {
+            'invoice_type': 'SALE',
+            'customer': self.customer.id,
+            'items': [{'product': self.product.id, 'quantity': quantity, 'unit_price': '2.00'}],
+        }
+
+    def test_json_array_reports_each_invoice(self):
+        payload = [self.sale(1), {'invoice_type': 'SALE', 'items': [{'product': 999, 'quantity': 1, 'unit_price': '1'}]},
+                   self.sale(5), self.sale(2)]
+        response = self.client.post('/api/invoices/bulk/?chunk_size=2', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+        results = response.data['results']
+        self.assertEqual([r['index'] for r in results], [0, 1, 2, 3])
+        self.assertIn('id', results[0])
+        self.assertIn('items', results[1]['errors'])
+        self.assertIn('Insufficient stock', str(results[2]['errors']))
+        self.assertIn('id', results[3])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+    def test_ndjson_stream(self):
+        body = '\n'.join([json.dumps(self.sale(1)), '{not json', json.dumps(self.sale(1)), ''])
+        response = self.client.post('/api/invoices/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertIn('parse error', response.data['results'][1]['errors'][0])
+
+    def test_related_rows_loaded_once_per_chunk(self):
+        payload = [self.sale(1) for _ in range(3)]
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/api/invoices/bulk/', payload, format='json')
+        # Full-row loads only; the low-stock sync re-reads just the stock
+        # columns of rows each invoice updated
+        product_lookups = [q for q in ctx.captured_queries
+                           if q['sql'].startswith('SELECT') and 'FROM "api_product"' in q['sql']
+                           and '"api_product"."name"' in q['sql']]
+        self.assertEqual(len(product_lookups), 1)
+
+    def test_rejects_bodies_that_are_not_invoice_lists(self):
+        for body in ('{"invoice_type": "SALE"}', '5', 'null', '"SALE"'):
+            response = self.client.post('/api/invoices/bulk/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.post('/api/invoices/bulk/', [5, None], format='json')
+        self.assertEqual((response.status_code, response.data['failed']), (200, 2))
+
+    def test_database_errors_fail_only_their_invoice(self):
+        calls = []
+        def flaky_rollups(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise OperationalError('database is locked')
+            return record_invoice_rollups(*args)
+        with mock.patch('api.serializers.record_invoice_rollups', flaky_rollups), self.assertLogs('api.bulk', 'ERROR'):
+            response = self.client.post('/api/invoices/bulk/?chunk_size=2', [self.sale(1)] * 3, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertIn('Database error', response.data['results'][1]['errors'][0])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 1)
+
+    def test_ids_must_be_integers(self):
+        bad_ids = [True, self.product.id + 0.5]
+        payload = [{**self.sale(1), 'items': [{'product': value, 'quantity': 1, 'unit_price': '2.00'}]} for value in bad_ids]
+        payload.append({**self.sale(1), 'customer': True})
+        response = self.client.post('/api/invoices/bulk/', payload, format='json')
+        self.assertEqual((response.data['created'], response.data['failed']), (0, 3))
+        self.assertIn('Incorrect type', str(response.data['results'][0]['errors']))
+        self.assertIn('Incorrect type', str(response.data['results'][2]['errors']))
+        # As the single-invoice endpoint answers
+        response = self.client.post('/api/invoices/', payload[1], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_viewer_cannot_bulk_post(self):
+        viewer = User.objects.create_user('viewer', password='pw', role='VIEWER')
+        self.client.force_authenticate(viewer)
+        response = self.client.post('/api/invoices/bulk/', [self.sale(1)], format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('accounts', password='pw', role='VIEWER')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(name='Bob')
+        self.product = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=50)
+        for invoice_type in ('SALE', 'PURCHASE', 'SALE'):
+            invoice = Invoice.objects.create(invoice_type=invoice_type, customer=self.customer, user=self.user)
+            InvoiceItem.objects.create(invoice=invoice, product=self.product, quantity=2, unit_price=Decimal('2.00'))
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_invoice_csv_one_row_per_item(self):
+        body = self.read(self.client.get('/api/invoices/export/?invoice_type=SALE'))
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['customer_name'], 'Bob')
+        self.assertEqual(rows[0]['subtotal'], '4.00')
+
+    def test_invoice_ndjson_matches_serializer(self):
+        body = self.read(self.client.get('/api/invoices/export/?export_format=ndjson'))
+        invoices = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(invoices), 3)
+        self.assertEqual(invoices[0]['items'][0]['product_name'], 'Widget')
+
+        # ?fields= trims the rows but keeps the id the streams are merged on
+        body = self.read(self.client.get('/api/invoices/export/?export_format=ndjson&fields=invoice_type'))
+        invoices = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([set(invoice) for invoice in invoices], [{'id', 'invoice_type'}] * 3)
+
+    def test_invoice_date_range(self):
+        Invoice.objects.filter(invoice_type='PURCHASE').update(transaction_date='2020-01-15T12:00:00Z')
+        body = self.read(self.client.get('/api/invoices/export/?export_format=ndjson&date_from=2020-01-15&date_to=2020-01-15'))
+        self.assertEqual([json.loads(line)['invoice_type'] for line in body.splitlines()], ['PURCHASE'])
+        self.assertEqual(self.client.get('/api/invoices/export/?date_from=soon').status_code, 400)
+        for day in ('2020-13-45', '2020-02-30', '9999-12-31'):
+            self.assertEqual(self.client.get(f'/api/invoices/export/?date_from={day}').status_code, 400)
+            self.assertEqual(self.client.get(f'/api/invoices/?date_to={day}').status_code, 400)
+
+    def test_product_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.read(self.client.get('/api/products/export/')))))
+        self.assertEqual(rows[0]['sku'], 'W-1')
+        self.assertIn('category_name', rows[0])
+
+
+class ProductImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        Category.objects.create(name='Tools')
+        Supplier.objects.create(name='Acme')
+        self.existing = Product.objects.create(
+            name='Old name', sku='W-1', description='keep me', price=Decimal('1.00'), stock_quantity=7
+        )
+
+    def upload(self, text):
+        upload = SimpleUploadedFile('catalog.csv', text.encode(), content_type='text/csv')
+        return self.client.post('/api/products/import/', {'file': upload}, format='multipart')
+
+    def test_upsert_on_sku(self):
+        response = self.upload(
+            'sku,name,price,category,supplier\n'
+            'W-1,Widget,2.50,tools,Acme\n'
+            'G-1,Gadget,3.00,,\n'
+            'B-1,Broken,abc,,\n'
+            'X-1,Mystery,1.00,Nope,\n'
+            'G-1,Gadget v2,3.25,Tools,\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['inserted'], response.data['updated']), (1, 2))
+        self.assertEqual([r['line'] for r in response.data['rejected']], [4, 5])
+        self.assertIn('unknown category', response.data['rejected'][1]['reason'])
+
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.price), ('Widget', Decimal('2.50')))
+        # Columns missing from the file are left alone on update
+        self.assertEqual((self.existing.description, self.existing.stock_quantity), ('keep me', 7))
+        self.assertEqual(self.existing.category.name, 'Tools')
+        self.assertEqual(Product.objects.get(sku='G-1').name, 'Gadget v2')
+
+    def test_rejects_prices_the_column_cannot_hold(self):
+        response = self.upload(
+            'sku,name,price\n'
+            'N-1,Nan,NaN\n'
+            'I-1,Inf,Infinity\n'
+            'L-1,Long,123456789012345.00\n'
+            'F-1,Fine,12345678.99\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['line'] for r in response.data['rejected']], [2, 3, 4])
+        self.assertEqual(response.data['inserted'], 1)
+
+    def test_rejects_text_longer_than_its_column(self):
+        response = self.upload(
+            'sku,name,price\n'
+            f'{"S" * 101},Long sku,1.00\n'
+            f'N-1,{"n" * 256},1.00\n'
+            f'{"S" * 100},{"n" * 255},1.00\n'
+        )
+        self.assertEqual([r['line'] for r in response.data['rejected']], [2, 3])
+        self.assertIn('name is longer than 255', response.data['rejected'][1]['reason'])
+        self.assertEqual(response.data['inserted'], 1)
+
+    def test_missing_columns(self):
+        response = self.upload('sku,name\nW-2,Thing\n')
+        self.assertEqual(response.status_code, 400)
+
+
+class StockLedgerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/products/', {
+            'name': 'Widget', 'sku': 'W-1', 'price': '2.00', 'stock_quantity': 5,
+        }, format='json')
+        self.product = Product.objects.get(pk=response.data['id'])
+
+    def post_invoice(self, invoice_type, quantity, when):
+        response = self.client.post('/api/invoices/', {
+            'invoice_type': invoice_type,
+            'items': [{'product': self.product.id, 'quantity': quantity, 'unit_price': '2.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        # transaction_date is auto_now_add, so move the invoice and its movement into the past
+        Invoice.objects.filter(pk=response.data['id']).update(transaction_date=when)
+        StockMovement.objects.filter(invoice_id=response.data['id']).update(occurred_at=when)
+
+    def stock_on(self, day):
+        response = self.client.get(f'/api/products/{self.product.id}/stock_at/?at={day}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['stock_quantity']
+
+    def test_invoices_and_edits_write_movements(self):
+        StockMovement.objects.update(occurred_at='2020-01-01T00:00:00Z')
+        self.post_invoice('PURCHASE', 10, '2020-01-02T10:00:00Z')
+        self.post_invoice('SALE', 4, '2020-01-03T10:00:00Z')
+        self.client.patch(f'/api/products/{self.product.id}/', {'stock_quantity': 20}, format='json')
+        self.assertEqual(
+            list(StockMovement.objects.order_by('id').values_list('movement_type', 'quantity')),
+            [('ADJUSTMENT', 5), ('PURCHASE', 10), ('SALE', -4), ('ADJUSTMENT', 9)],
+        )
+        self.assertEqual(self.stock_on('2020-01-01'), 5)
+        self.assertEqual(self.stock_on('2020-01-02'), 15)
+        self.assertEqual(self.stock_on('2020-01-03'), 11)
+        self.assertEqual(self.client.get(f'/api/products/{self.product.id}/stock_at/').data['stock_quantity'], 20)
+        for at in ('2020-13-45', '2020-01-01T25:00:00', 'soon'):
+            self.assertEqual(self.client.get(f'/api/products/{self.product.id}/stock_at/?at={at}').status_code, 400)
+
+    def test_snapshots_bound_the_replay(self):
+        self.post_invoice('PURCHASE', 10, '2020-01-02T10:00:00Z')
+        StockMovement.objects.filter(movement_type='ADJUSTMENT').update(occurred_at='2020-01-01T00:00:00Z')
+        self.assertEqual(take_snapshots(parse_datetime('2020-01-05T00:00:00Z')), 1)
+        self.post_invoice('SALE', 3, '2020-01-06T10:00:00Z')
+        # Rewriting history before the snapshot shows it is trusted, not replayed
+        StockMovement.objects.filter(movement_type='PURCHASE').update(quantity=1000)
+        self.assertEqual(self.stock_on('2020-01-05'), 15)
+        self.assertEqual(self.stock_on('2020-01-06'), 12)
+
+    def test_backfill_command(self):
+        self.post_invoice('PURCHASE', 10, '2020-01-02T10:00:00Z')
+        self.post_invoice('SALE', 4, '2020-01-03T10:00:00Z')
+        Product.objects.filter(pk=self.product.pk).update(created_at='2020-01-01T00:00:00Z')
+        call_command('backfill_stock_ledger', '--reset', stdout=io.StringIO())
+        self.assertEqual(StockMovement.objects.filter(movement_type='ADJUSTMENT').get().quantity, 5)
+        self.assertEqual(self.stock_on('2020-01-02'), 15)
+        self.assertEqual(self.stock_on('2020-01-04'), 11)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('viewer', password='pw'))
+        for name, sku in [('Cordless Drill', 'DR-100'), ('Drill Bit Set', 'BIT-7'),
+                          ('Hammer', 'HM-1'), ('Screwdriver', 'SD-2')]:
+            Product.objects.create(name=name, sku=sku, price=Decimal('1.00'))
+
+    def search(self, term, **params):
+        response = self.client.get('/api/products/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [p['name'] for p in response.data['results']]
+
+    def test_prefix_and_substring(self):
+        self.assertEqual(set(self.search('dril')), {'Cordless Drill', 'Drill Bit Set'})
+        self.assertEqual(self.search('bit-')[0], 'Drill Bit Set')
+        self.assertEqual(self.search('ha'), ['Hammer'])
+
+    def test_fuzzy_ranks_closest_first(self):
+        self.assertEqual(self.search('screwdrivr')[0], 'Screwdriver')
+        self.assertEqual(self.search('hamer')[0], 'Hammer')
+
+    def test_index_follows_writes(self):
+        product = Product.objects.get(sku='HM-1')
+        product.name = 'Mallet'
+        product.save()
+        Product.objects.filter(sku='SD-2').update(name='Torx Driver')
+        self.assertEqual(self.search('mallet'), ['Mallet'])
+        self.assertEqual(self.search('torx'), ['Torx Driver'])
+        self.assertEqual(self.search('screwdriver'), [])
+        product.delete()
+        self.assertEqual(self.search('mallet'), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.search('dr', limit=1)), 1)
+
+    def test_search_route(self):
+        response = self.client.get('/api/products/search/', {'search': 'dril'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['name'] for p in response.data['results']], self.search('dril'))
+        self.assertEqual(self.client.get('/api/products/search/', {'search': ' '}).status_code, 400)
+
+
+class ConditionalGetTests(TransactionTestCase):
+    # Versions are bumped on commit, so run outside a wrapping transaction
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('viewer', password='pw'))
+        self.category = Category.objects.create(name='Tools')
+        self.product = Product.objects.create(name='Widget', sku='W-1', price=Decimal('1.00'), category=self.category)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_list_is_not_modified_without_serializing(self):
+        first = self.client.get('/api/products/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(1):
+            second = self.revalidate('/api/products/', first)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_writes_change_the_etag(self):
+        url = f'/api/products/{self.product.id}/'
+        first = self.client.get(url)
+        self.category.name = 'Hand tools'
+        self.category.save()
+        second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['category_name'], 'Hand tools')
+        self.assertEqual(self.revalidate(url, second).status_code, 304)
+
+    def test_stock_change_from_invoice_changes_the_etag(self):
+        first = self.client.get('/api/products/')
+        self.client.force_authenticate(User.objects.create_user('clerk', password='pw', role='EDITOR'))
+        self.client.post('/api/invoices/', {
+            'invoice_type': 'PURCHASE',
+            'items': [{'product': self.product.id, 'quantity': 3, 'unit_price': '1.00'}],
+        }, format='json')
+        self.assertEqual(self.revalidate('/api/products/', first).status_code, 200)
+
+    def test_query_string_is_part_of_the_etag(self):
+        first = self.client.get('/api/products/')
+        self.assertEqual(self.revalidate('/api/products/?fields=id,name', first).status_code, 200)
+
+
+@override_settings(RESPONSE_CACHE=True)
+class ResponseCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='pw', role='ADMIN'))
+        self.supplier = Supplier.objects.create(name='Acme')
+
+    def test_repeat_reads_skip_the_database(self):
+        self.assertEqual(self.client.get('/api/suppliers/')['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/suppliers/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['name'], 'Acme')
+        self.client.get(f'/api/suppliers/{self.supplier.id}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f'/api/suppliers/{self.supplier.id}/')['X-Cache'], 'HIT')
+
+    def test_writes_are_visible_to_the_next_read(self):
+        self.client.get('/api/suppliers/')
+        self.client.get(f'/api/suppliers/{self.supplier.id}/')
+        self.client.patch(f'/api/suppliers/{self.supplier.id}/', {'name': 'Acme Ltd'}, format='json')
+        self.assertEqual(self.client.get(f'/api/suppliers/{self.supplier.id}/').data['name'], 'Acme Ltd')
+        self.client.delete(f'/api/suppliers/{self.supplier.id}/')
+        self.assertEqual(self.client.get('/api/suppliers/').data['results'], [])
+
+    @override_settings(RESPONSE_CACHE=False)
+    def test_per_process_cache_serves_from_the_database(self):
+        self.client.get('/api/suppliers/')
+        response = self.client.get('/api/suppliers/')
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response.data['results'][0]['name'], 'Acme')
+
+    def test_stats(self):
+        self.client.get('/api/customers/')
+        self.client.get('/api/customers/')
+        stats = self.client.get('/api/cache/stats/').data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('boss', password='pw', role='ADMIN')
+        self.clerk = User.objects.create_user('clerk', password='pw', role='VIEWER')
+
+    def token_for(self, user):
+        return str(MyTokenObtainPairSerializer.get_token(user).access_token)
+
+    @override_settings(RESPONSE_CACHE=True)
+    def test_valid_token_needs_no_user_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token_for(self.clerk)}')
+        self.client.get('/api/suppliers/')  # warms the auth state and response caches
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/suppliers/').status_code, 200)
+
+    def test_role_change_takes_effect_for_existing_tokens(self):
+        clerk_token = self.token_for(self.clerk)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {clerk_token}')
+        self.assertEqual(self.client.post('/api/suppliers/', {'name': 'Acme'}).status_code, 403)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token_for(self.admin)}')
+        self.client.patch(f'/api/users/{self.clerk.id}/update_role/', {'role': 'EDITOR'})
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {clerk_token}')
+        self.assertEqual(self.client.post('/api/suppliers/', {'name': 'Acme'}).status_code, 201)
+        invoice = self.client.post('/api/invoices/', {'invoice_type': 'PURCHASE', 'items': []}, format='json')
+        self.assertEqual(invoice.data['user_username'], 'clerk')
+
+    def test_deactivated_and_deleted_users_are_rejected_at_once(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token_for(self.clerk)}')
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)  # caches is_active
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clerk.is_active = False
+            self.clerk.save()
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token_for(self.admin)}')
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.delete()
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+
+
+class AsyncReadTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', password='pw', role='VIEWER')
+        self.auth = f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}'
+        category = Category.objects.create(name='Tools')
+        self.products = [
+            Product.objects.create(name=f'Item {i}', sku=f'A{i}', price=Decimal('2.00'), stock_quantity=i, category=category)
+            for i in range(5)
+        ]
+
+    async def test_list_matches_sync_serializer_and_pages_by_id(self):
+        first = await self.async_client.get('/api/async/products/?page_size=3', headers={'Authorization': self.auth})
+        self.assertEqual(first.status_code, 200)
+        body = first.json()
+        self.assertEqual([row['sku'] for row in body['results']], ['A4', 'A3', 'A2'])
+        self.assertEqual(body['results'][0]['category_name'], 'Tools')
+
+        second = await self.async_client.get(body['next'], headers={'Authorization': self.auth})
+        body = second.json()
+        self.assertEqual([row['sku'] for row in body['results']], ['A1', 'A0'])
+        self.assertIsNone(body['next'])
+
+    async def test_detail_and_dashboard(self):
+        product = self.products[0]
+        response = await self.async_client.get(f'/api/async/products/{product.id}/', headers={'Authorization': self.auth})
+        self.assertEqual(response.json()['name'], 'Item 0')
+        missing = await self.async_client.get('/api/async/products/999999/', headers={'Authorization': self.auth})
+        self.assertEqual(missing.status_code, 404)
+
+        summary = await self.async_client.get('/api/async/dashboard/summary/', headers={'Authorization': self.auth})
+        self.assertEqual(summary.json()['products_count'], 5)
+        self.assertEqual(summary.json()['low_stock_count'], 5)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/async/invoices/')
+        self.assertEqual(response.status_code, 401)
+
+
+class DashboardSummaryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('clerk', password='pw', role='EDITOR'))
+        tools = Category.objects.create(name='Tools')
+        self.widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=10, category=tools)
+
+    def summary(self):
+        response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_summary_is_cached_until_a_write_commits(self):
+        self.assertEqual(self.summary(), {
+            'products_count': 1, 'total_value': '20.00', 'low_stock_count': 0, 'categories_count': 1,
+            'category_distribution': [{'name': 'Tools', 'count': 1}],
+        })
+        with self.assertNumQueries(0):
+            self.summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/invoices/', {
+                'invoice_type': 'SALE', 'items': [{'product': self.widget.id, 'quantity': 3, 'unit_price': '2.00'}],
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        summary = self.summary()
+        self.assertEqual((summary['total_value'], summary['low_stock_count']), ('14.00', 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/products/', {'name': 'Gadget', 'sku': 'G-1', 'price': '1.00', 'stock_quantity': 50})
+        summary = self.summary()
+        self.assertEqual((summary['products_count'], summary['total_value']), (2, '64.00'))
+        self.assertEqual(summary['category_distribution'], [{'name': 'Uncategorized', 'count': 1}, {'name': 'Tools', 'count': 1}])
+
+
+class ReportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(name='Bob')
+        self.supplier = Supplier.objects.create(name='Acme')
+        tools = Category.objects.create(name='Tools')
+        self.widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=50, category=tools)
+        self.gadget = Product.objects.create(name='Gadget', sku='G-1', price=Decimal('1.00'), stock_quantity=50)
+
+    def post_invoice(self, invoice_type, *lines, **party):
+        response = self.client.post('/api/invoices/', {
+            'invoice_type': invoice_type, **party,
+            'items': [{'product': p.id, 'quantity': q, 'unit_price': '2.00'} for p, q in lines],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def report(self, group_by, **params):
+        response = self.client.get('/api/reports/', {'group_by': group_by, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def post_history(self):
+        self.post_invoice('SALE', (self.widget, 2), (self.widget, 1), (self.gadget, 4), customer=self.customer.id)
+        self.post_invoice('SALE', (self.widget, 5), customer=self.customer.id, include_tax=True)
+        self.post_invoice('PURCHASE', (self.gadget, 10), supplier=self.supplier.id)
+
+    def test_reports_answer_from_rollups(self):
+        self.post_history()
+        products = {(row['invoice_type'], row['name']): row for row in self.report('product')}
+        self.assertEqual(products[('SALE', 'Widget')]['quantity'], 8)
+        self.assertEqual(products[('SALE', 'Widget')]['amount'], '16.00')
+        self.assertEqual(products[('PURCHASE', 'Gadget')]['quantity'], 10)
+
+        categories = {row['name']: row for row in self.report('category', invoice_type='SALE')}
+        self.assertEqual(categories['Uncategorized']['quantity'], 4)
+
+        [customer] = self.report('customer')
+        self.assertEqual((customer['name'], customer['invoice_count']), ('Bob', 2))
+        self.assertEqual(customer['tax_amount'], '1.30')
+        [supplier] = self.report('supplier')
+        self.assertEqual(supplier['total_amount'], '20.00')
+
+        days = self.report('day', invoice_type='SALE')
+        self.assertEqual([(row['invoice_count'], row['net_amount']) for row in days], [(2, '24.00')])
+        self.assertEqual(len(self.report('month')), 2)  # one row per invoice type
+
+        with self.assertNumQueries(1):
+            self.client.get('/api/reports/', {'group_by': 'product'})
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.post_history()
+        before = {group_by: self.report(group_by) for group_by in ('product', 'customer', 'day')}
+        DailyProductRollup.objects.update(quantity=0)
+        DailyPartyRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual({group_by: self.report(group_by) for group_by in before}, before)
+
+    def rollup_rows(self):
+        return (
+            sorted(DailyProductRollup.objects.values_list('day', 'invoice_type', 'product', 'quantity', 'amount')),
+            sorted(DailyPartyRollup.objects.values_list(
+                'day', 'invoice_type', 'customer', 'supplier', 'invoice_count', 'net_amount', 'total_amount',
+            ), key=str),
+        )
+
+    def test_edits_and_deletes_move_rollups(self):
+        self.post_history()
+        other = Customer.objects.create(name='Carol')
+        first, second, purchase = Invoice.objects.order_by('id')
+        response = self.client.patch(f'/api/invoices/{first.id}/', {'customer': other.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['name']: row['invoice_count'] for row in self.report('customer')}, {'Bob': 1, 'Carol': 1})
+
+        self.client.force_authenticate(User.objects.create_user('boss', password='pw', role='ADMIN'))
+        self.assertEqual(self.client.delete(f'/api/invoices/{second.id}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/api/invoices/{purchase.id}/').status_code, 204)
+        products = {row['name']: row['quantity'] for row in self.report('product')}
+        self.assertEqual(products, {'Widget': 3, 'Gadget': 4})
+        self.assertEqual(self.report('supplier'), [])
+
+        incremental = self.rollup_rows()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_concurrent_first_postings_share_one_row(self):
+        self.post_invoice('SALE', (self.widget, 1))  # Walk-in: no customer or supplier
+        key = {'day': timezone.localdate(), 'invoice_type': 'SALE', 'customer_id': None, 'supplier_id': None}
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyPartyRollup.objects.create(**key)
+
+        # The UPDATE misses as if the other posting had not committed yet
+        update = QuerySet.update
+        missed = []
+        def racing_update(queryset, **kwargs):
+            if not missed:
+                missed.append(True)
+                return 0
+            return update(queryset, **kwargs)
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            increment(DailyPartyRollup, key, invoice_count=1, net_amount=Decimal('2.00'))
+        [row] = DailyPartyRollup.objects.filter(customer=None, supplier=None)
+        self.assertEqual((row.invoice_count, row.net_amount), (2, Decimal('4.00')))
+
+    def test_deleting_a_party_merges_its_rows_into_walk_ins(self):
+        self.post_invoice('SALE', (self.widget, 1), customer=self.customer.id)
+        self.post_invoice('SALE', (self.widget, 2))
+        self.post_invoice('PURCHASE', (self.gadget, 3), supplier=self.supplier.id)
+        self.customer.delete()
+        self.supplier.delete()
+        [sales] = DailyPartyRollup.objects.filter(invoice_type='SALE')
+        self.assertEqual((sales.customer_id, sales.invoice_count, sales.net_amount), (None, 2, Decimal('6.00')))
+        before = list(DailyPartyRollup.objects.order_by('invoice_type').values('invoice_type', 'customer', 'supplier', 'invoice_count'))
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        after = list(DailyPartyRollup.objects.order_by('invoice_type').values('invoice_type', 'customer', 'supplier', 'invoice_count'))
+        self.assertEqual(after, before)
+
+    def test_rejects_unknown_dimension(self):
+        response = self.client.get('/api/reports/', {'group_by': 'colour'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/reports/', {'group_by': 'day', 'date_from': '2020-13-45'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LowStockTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(name='Bob')
+        self.widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=8, reorder_level=5)
+
+    def post_invoice(self, invoice_type, quantity):
+        response = self.client.post('/api/invoices/', {
+            'invoice_type': invoice_type,
+            'customer': self.customer.id,
+            'items': [{'product': self.widget.id, 'quantity': quantity, 'unit_price': '2.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_only_crossings_raise_alerts(self):
+        self.post_invoice('SALE', 2)  # 6, still at or above 5
+        self.assertFalse(StockAlert.objects.exists())
+        invoice_id = self.post_invoice('SALE', 3)  # 3
+        self.post_invoice('SALE', 1)  # 2, already low
+        alert = StockAlert.objects.get()
+        self.assertEqual((alert.alert_type, alert.stock_quantity, alert.invoice_id), ('LOW', 3, invoice_id))
+        self.assertTrue(LowStockEntry.objects.filter(product=self.widget).exists())
+
+        self.post_invoice('PURCHASE', 10)
+        self.assertEqual(list(StockAlert.objects.order_by('id').values_list('alert_type', flat=True)), ['LOW', 'CLEARED'])
+        self.assertFalse(LowStockEntry.objects.exists())
+
+    def test_reorder_level_edit_updates_set(self):
+        self.client.patch(f'/api/products/{self.widget.id}/', {'reorder_level': 20}, format='json')
+        response = self.client.get('/api/products/low_stock/')
+        self.assertEqual([row['sku'] for row in response.data['results']], ['W-1'])
+
+    def test_endpoint_reads_only_the_set(self):
+        Product.objects.bulk_create([
+            Product(name=f'Bulk {i}', sku=f'B-{i}', price=Decimal('1.00'), stock_quantity=100) for i in range(50)
+        ])
+        self.post_invoice('SALE', 6)
+        with self.assertNumQueries(2):  # change counters + the set
+            response = self.client.get('/api/products/low_stock/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['stock_quantity'], 2)
+        self.assertIn('low_stock_since', response.data['results'][0])
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=5)
+
+    def test_server_timing_and_histograms(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/products/')
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing)
+        self.assertRegex(timing, r'ser;dur=[\d.]+, total;dur=[\d.]+')
+
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        editor = f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}'
+        self.assertEqual(self.client.get('/api/metrics/', headers={'Authorization': editor}).status_code, 403)
+        admin = User.objects.create_user('admin', password='pw', role='ADMIN')
+        auth = f'Bearer {MyTokenObtainPairSerializer.get_token(admin).access_token}'
+        metrics = self.client.get('/api/metrics/', headers={'Authorization': auth}).content.decode()
+        self.assertIn('# TYPE ims_request_duration_seconds histogram', metrics)
+        self.assertRegex(
+            metrics, r'ims_request_db_queries_count\{view="ProductViewSet",action="list",method="GET"\} [1-9]'
+        )
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_query_log_names_the_api_frame(self):
+        with self.assertLogs('api.slow_queries', 'WARNING') as logs:
+            self.client.get('/api/products/')
+        self.assertTrue(any('api_product' in line and 'api/views.py' in line for line in logs.output))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        response = self.client.get('/api/metrics/', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+
+class SeedAndBenchCommandTests(TransactionTestCase):
+    def seed(self, seed):
+        call_command('seed_data', '--reset', '--seed', str(seed), '--categories', '3', '--suppliers', '4',
+                     '--customers', '5', '--products', '30', '--invoices', '40', stdout=io.StringIO())
+        return (
+            list(Product.objects.order_by('id').values_list('sku', 'price', 'stock_quantity', 'category_id')),
+            list(Invoice.objects.order_by('id').values_list('invoice_type', 'customer_id', 'total_amount')),
+        )
+
+    def test_seed_is_deterministic_and_consistent(self):
+        first = self.seed(7)
+        self.assertEqual(len(first[0]), 30)
+        self.assertEqual(self.seed(7), first)
+        self.assertNotEqual(self.seed(8), first)
+
+        invoice = Invoice.objects.prefetch_related('items').first()
+        self.assertEqual(invoice.net_amount, sum(item.subtotal for item in invoice.items.all()))
+        self.assertEqual(
+            DailyPartyRollup.objects.aggregate(total=Sum('invoice_count'))['total'], Invoice.objects.count()
+        )
+        self.assertEqual(
+            LowStockEntry.objects.count(),
+            sum(1 for p in Product.objects.all() if p.stock_quantity < p.reorder_level),
+        )
+
+    def test_bench_api_reports_percentiles_and_baseline(self):
+        User.objects.create_user('admin', password='pw', role='ADMIN')
+        baseline = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'baseline.json'
+        args = ['bench_api', '--only', 'categories_list,dashboard_summary', '--requests', '4',
+                '--concurrency', '2', '--baseline', str(baseline)]
+        call_command(*args, '--save-baseline', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command(*args, stdout=out)
+        report = json.loads(out.getvalue())
+        result = report['results']['dashboard_summary']
+        self.assertEqual((result['requests'], result['errors']), (4, 0))
+        self.assertTrue({'p50_ms', 'p95_ms', 'p99_ms', 'req_per_sec'} <= set(result))
+        self.assertIn('p99_ms', report['baseline_change_pct']['categories_list'])
+
+
+class JobQueueTests(APITestCase):
+    def setUp(self):
+        self.files = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(JOB_FILES_DIR=self.files))
+        self.viewer = User.objects.create_user('viewer', password='pw', role='VIEWER')
+        self.editor = User.objects.create_user('editor', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.viewer)
+        Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=50)
+
+    def work(self):
+        call_command('run_worker', '--processes', '0', '--burst', stdout=io.StringIO())
+
+    def test_export_runs_in_worker_and_downloads(self):
+        response = self.client.post('/api/jobs/', {'job_type': 'export_products', 'params': {}}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'QUEUED')
+        job_url = response['Location']
+
+        self.work()
+        job = self.client.get(job_url).data
+        self.assertEqual((job['status'], job['progress'], job['result']['rows']), ('SUCCEEDED', 100, 1))
+        download = self.client.get(f'{job_url}download/')
+        rows = list(csv.DictReader(io.StringIO(b''.join(download.streaming_content).decode())))
+        self.assertEqual(rows[0]['sku'], 'W-1')
+
+    def test_background_import(self):
+        self.client.force_authenticate(self.editor)
+        upload = SimpleUploadedFile('catalog.csv', b'sku,name,price\nG-1,Gadget,3.00\n', content_type='text/csv')
+        response = self.client.post('/api/products/import/?background=1', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Product.objects.filter(sku='G-1').exists())
+
+        self.work()
+        self.assertEqual(Job.objects.get().result['inserted'], 1)
+        self.assertTrue(Product.objects.filter(sku='G-1').exists())
+        self.assertEqual(list(Path(self.files).iterdir()), [])  # Upload removed once imported
+
+    def test_enqueue_validation_and_visibility(self):
+        post = lambda body: self.client.post('/api/jobs/', body, format='json')
+        self.assertEqual(post({'job_type': 'rebuild_rollups'}).status_code, 403)
+        self.assertEqual(post({'job_type': 'nope'}).status_code, 400)
+        self.assertEqual(post({'job_type': 'export_invoices', 'params': {'date_from': 'soon'}}).status_code, 400)
+
+        self.client.force_authenticate(self.editor)
+        job_id = post({'job_type': 'rebuild_rollups'}).data['id']
+        self.client.force_authenticate(self.viewer)
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/').data['results'], [])
+
+    def test_failures_back_off_then_fail(self):
+        def flaky(job, progress):
+            raise RuntimeError('disk full')
+
+        self.enterContext(mock.patch.dict(JOB_TYPES, {'flaky': JobType(flaky, dict, None, False)}))
+        job = Job.objects.create(job_type='flaky', max_attempts=2)
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.assertEqual(run_job(claim_job('test').pk), 'QUEUED')
+        job.refresh_from_db()
+        self.assertEqual((job.attempts, job.error), (1, 'RuntimeError: disk full'))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(claim_job('test'))  # Not due yet
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.assertEqual(run_job(claim_job('test').pk), 'FAILED')
+
+    def test_claims_are_exclusive_and_stale_jobs_requeued(self):
+        Job.objects.create(job_type='rebuild_rollups')
+        self.assertEqual(claim_job('a').worker, 'a')
+        self.assertIsNone(claim_job('b'))
+
+        Job.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        requeue_stale()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.error), ('QUEUED', 1, 'Worker stopped responding'))
+        Job.objects.update(run_after=timezone.now())
+        self.assertEqual(claim_job('b').attempts, 2)
+
+    def test_running_jobs_keep_their_lease(self):
+        Job.objects.create(job_type='rebuild_rollups')
+        job = claim_job('a')
+        Job.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        report_progress(job.pk, 1, 2)
+        requeue_stale()
+        self.assertEqual(Job.objects.get().status, 'RUNNING')
+
+    def test_inline_worker_renews_the_lease_of_slow_jobs(self):
+        def slow(job, progress):
+            time.sleep(0.3)  # Reports no progress
+            return {}
+
+        self.enterContext(mock.patch.dict(JOB_TYPES, {'slow': JobType(slow, dict, None, False)}))
+        Job.objects.create(job_type='slow')
+        with mock.patch('api.management.commands.run_worker.heartbeat') as heartbeat:
+            call_command('run_worker', '--processes', '0', '--burst', '--poll-interval', '0.05', stdout=io.StringIO())
+        self.assertEqual(Job.objects.get().status, 'SUCCEEDED')
+        self.assertGreater(heartbeat.call_count, 1)
+
+
+class FastReadTests(APITestCase):
+    """The values_list() read path must render exactly what the serializers do."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('viewer', password='pw', role='VIEWER')
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Tools \u2028 & more')
+        supplier = Supplier.objects.create(name='Acme', email='sales@acme.test')
+        customer = Customer.objects.create(name='Bob')
+        widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.50'), stock_quantity=50,
+                                        category=category, supplier=supplier)
+        loose = Product.objects.create(name='Loose', sku='L-1', price=Decimal('0.10'), stock_quantity=3)
+        sale = Invoice.objects.create(invoice_type='SALE', customer=customer, user=self.user, due_date='2026-01-31',
+                                      tax_amount=Decimal('0.65'), net_amount=Decimal('5.00'), total_amount=Decimal('5.65'))
+        InvoiceItem.objects.create(invoice=sale, product=widget, quantity=2, unit_price=Decimal('2.50'))
+        InvoiceItem.objects.create(invoice=sale, product=loose, quantity=1, unit_price=Decimal('0.10'))
+        Invoice.objects.create(invoice_type='PURCHASE', supplier=supplier)  # No user, customer or items
+
+    def both(self, path):
+        fast = self.client.get(path)
+        with override_settings(FAST_READS=False):
+            cache.clear()
+            slow = self.client.get(path)
+        self.assertEqual((fast.status_code, slow.status_code), (200, 200))
+        return fast, slow
+
+    def test_lists_match_serializers(self):
+        for path in ('/api/products/', '/api/invoices/', '/api/categories/', '/api/suppliers/',
+                     '/api/customers/', '/api/products/?fields=id,category_name,price',
+                     '/api/invoices/?fields=items,customer_name&invoice_type=SALE', '/api/products/?page_size=1'):
+            with self.subTest(path=path):
+                fast, slow = self.both(path)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_ndjson_exports_match_serializers(self):
+        for path in ('/api/invoices/export/?export_format=ndjson', '/api/products/export/?export_format=ndjson'):
+            with self.subTest(path=path):
+                fast, slow = self.both(path)
+                self.assertEqual(b''.join(fast.streaming_content), b''.join(slow.streaming_content))
+
+    def test_null_relations_drop_name_fields(self):
+        loose = next(row for row in self.client.get('/api/products/').data['results'] if row['sku'] == 'L-1')
+        self.assertNotIn('category_name', loose)
+        self.assertIsNone(loose['category'])
+
+    def test_unsupported_fields_are_rejected(self):
+        class Annotated(ProductSerializer):
+            margin = serializers.SerializerMethodField()
+
+            def get_margin(self, product):
+                return 0
+
+        with self.assertRaises(ImproperlyConfigured):
+            FastRows(Annotated())
+
+    def test_renderer_matches_drf(self):
+        data = {'when': timezone.now(), 'amount': Decimal('1.50'), 'text': 'caf\u00e9 \u2029', 1: [None, True]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('boss', password='pw', role='ADMIN')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(name='Bob')
+        self.widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=50)
+        self.gadget = Product.objects.create(name='Gadget', sku='G-1', price=Decimal('1.00'), stock_quantity=50)
+        now = timezone.now()
+        self.cutoff = (now - timedelta(days=100)).date()
+        # Two invoices in an old month, one in the next, one still open
+        self.old = [
+            self.post_invoice('SALE', (self.widget, 2), (self.gadget, 1), customer=self.customer.id, include_tax=True),
+            self.post_invoice('SALE', (self.widget, 1)),
+            self.post_invoice('PURCHASE', (self.gadget, 5)),
+        ]
+        self.open = self.post_invoice('SALE', (self.gadget, 3))
+        old_month = (now - timedelta(days=400)).replace(day=10)
+        Invoice.objects.filter(pk__in=self.old[:2]).update(transaction_date=old_month)
+        Invoice.objects.filter(pk=self.old[2]).update(transaction_date=old_month + timedelta(days=31))
+        StockMovement.objects.filter(invoice_id__in=self.old).update(occurred_at=old_month)
+        call_command('rebuild_rollups', stdout=io.StringIO())
+
+    def post_invoice(self, invoice_type, *lines, **extra):
+        response = self.client.post('/api/invoices/', {
+            'invoice_type': invoice_type, **extra,
+            'items': [{'product': p.id, 'quantity': q, 'unit_price': '2.00'} for p, q in lines],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def close(self, **options):
+        call_command('close_period', before=str(self.cutoff), stdout=io.StringIO(), **options)
+        cache.clear()
+
+    def walk(self, path):
+        ids, url = [], path
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_close_period_moves_old_invoices_and_keeps_summaries(self):
+        movements = StockMovement.objects.count()
+        self.close(chunk_size=2)
+
+        self.assertEqual(list(Invoice.objects.values_list('id', flat=True)), [self.open])
+        self.assertEqual(sorted(ArchivedInvoice.objects.values_list('id', flat=True)), self.old)
+        self.assertFalse(InvoiceItem.objects.filter(invoice_id__in=self.old).exists())
+        self.assertEqual(ArchivedInvoiceItem.objects.count(), 4)
+        # The ledger keeps the movements, unlinked from the moved invoices
+        self.assertEqual(StockMovement.objects.count(), movements)
+        self.assertEqual(StockMovement.objects.filter(invoice__isnull=True).count(), 4)
+
+        summaries = {
+            (row.invoice_type, row.invoice_count, row.item_count, row.total_amount)
+            for row in PeriodSummary.objects.all()
+        }
+        self.assertEqual(summaries, {('SALE', 2, 3, Decimal('8.78')), ('PURCHASE', 1, 1, Decimal('10.00'))})
+        self.assertEqual(len({row.period.day for row in PeriodSummary.objects.all()}), 1)
+
+        self.close()  # Nothing left to move
+        self.assertEqual(PeriodSummary.objects.get(invoice_type='PURCHASE').invoice_count, 1)
+
+    def test_reads_skip_the_archive_unless_asked(self):
+        self.close()
+        self.assertEqual(self.walk('/api/invoices/'), [self.open])
+        self.assertEqual(self.walk('/api/invoices/?include_archived=1&page_size=1'), [self.open, *reversed(self.old)])
+        self.assertEqual(self.walk('/api/invoices/?include_archived=1&invoice_type=PURCHASE'), [self.old[2]])
+        response = self.client.get('/api/invoices/?include_archived=1&page_size=2&fields=invoice_type')
+        self.assertEqual([set(row) for row in response.data['results']], [{'id', 'invoice_type'}] * 2)
+        self.assertEqual(self.walk('/api/invoices/?include_archived=1&page_size=2&fields=invoice_type'),
+                         [self.open, *reversed(self.old)])
+
+        self.assertEqual(self.client.get(f'/api/invoices/{self.old[0]}/').status_code, 404)
+        response = self.client.get(f'/api/invoices/{self.old[0]}/?include_archived=1')
+        self.assertEqual((response.status_code, len(response.data['items'])), (200, 2))
+        # Writes never reach archived rows
+        response = self.client.patch(f'/api/invoices/{self.old[0]}/?include_archived=1', {'note': 'x'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get('/api/invoices/export/?include_archived=1')
+        body = b''.join(response.streaming_content)
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([int(row['invoice_id']) for row in rows], [*self.old[:1] * 2, *self.old[1:], self.open])
+
+        # Background exports take the same flag
+        self.enterContext(override_settings(JOB_FILES_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.assertEqual(self.client.get('/api/invoices/export/?include_archived=1&background=1').status_code, 202)
+        call_command('run_worker', '--processes', '0', '--burst', stdout=io.StringIO())
+        download = self.client.get(f'/api/jobs/{Job.objects.get().pk}/download/')
+        self.assertEqual(b''.join(download.streaming_content), body)
+
+    def test_archived_invoices_render_as_before(self):
+        paths = ('/api/invoices/?page_size=2', '/api/invoices/export/?export_format=ndjson')
+        for fast_reads in (True, False):
+            with self.subTest(fast_reads=fast_reads), override_settings(FAST_READS=fast_reads):
+                with transaction.atomic():
+                    before = [self.read(path) for path in paths]
+                    self.close()
+                    after = [self.read(path + ('&' if '?' in path else '?') + 'include_archived=1') for path in paths]
+                    transaction.set_rollback(True)
+                self.assertEqual(after, before)
+
+    def read(self, path):
+        response = self.client.get(path)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return [response.data['results'], self.client.get(response.data['next']).data['results']]
+
+    def test_rebuilds_cover_archived_history(self):
+        report = self.client.get('/api/reports/', {'group_by': 'product'}).data['results']
+        ledger = sorted(StockMovement.objects.values_list('product_id', 'quantity'))
+        self.close()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(self.client.get('/api/reports/', {'group_by': 'product'}).data['results'], report)
+        call_command('backfill_stock_ledger', reset=True, stdout=io.StringIO())
+        self.assertEqual(sorted(StockMovement.objects.exclude(movement_type='ADJUSTMENT')
+                                .values_list('product_id', 'quantity')), ledger)
+
+    def test_rebuild_merges_days_split_by_partial_archiving(self):
+        report = self.client.get('/api/reports/', {'group_by': 'product'}).data['results']
+        archive_invoices(Invoice.objects.filter(pk=self.old[0]))  # Its day-mate stays open
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        cache.clear()
+        self.assertEqual(self.client.get('/api/reports/', {'group_by': 'product'}).data['results'], report)
+
+    def test_rejects_open_periods(self):
+        with self.assertRaises(CommandError):
+            call_command('close_period', before=str(timezone.localdate() + timedelta(days=1)))
+        for before in ('2024-02-30', 'last month'):
+            with self.subTest(before=before), self.assertRaisesMessage(CommandError, 'YYYY-MM-DD'):
+                call_command('close_period', before=before)
+
+
+class BalanceTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(name='Bob')
+        self.supplier = Supplier.objects.create(name='Acme')
+        self.widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=100)
+        self.today = timezone.localdate()
+
+    def post_invoice(self, invoice_type, quantity, due_in=None, **party):
+        due_date = str(self.today + timedelta(days=due_in)) if due_in is not None else None
+        response = self.client.post('/api/invoices/', {
+            'invoice_type': invoice_type, 'due_date': due_date, **party,
+            'items': [{'product': self.widget.id, 'quantity': quantity, 'unit_price': '1.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def buckets(self, party):
+        party.refresh_from_db()
+        return [party.balance, party.aging_current, party.aging_1_30, party.aging_31_60,
+                party.aging_61_90, party.aging_over_90]
+
+    def post_history(self):
+        self.post_invoice('SALE', 1, customer=self.customer.id)
+        self.post_invoice('SALE', 2, due_in=10, customer=self.customer.id)
+        self.post_invoice('SALE', 4, due_in=-45, customer=self.customer.id)
+        self.post_invoice('SALE', 8, due_in=-100, customer=self.customer.id)
+        self.post_invoice('SALE', 16)  # Walk-in sale, no customer
+        self.post_invoice('PURCHASE', 32, due_in=-1, supplier=self.supplier.id)
+
+    def test_posting_updates_balances_and_buckets(self):
+        self.post_history()
+        self.assertEqual(self.buckets(self.customer), [15, 3, 0, 4, 0, 8])
+        self.assertEqual(self.buckets(self.supplier), [32, 0, 32, 0, 0, 0])
+
+        # Clients cannot write the maintained fields
+        self.client.patch(f'/api/customers/{self.customer.id}/', {'balance': '0.00'}, format='json')
+        self.assertEqual(self.buckets(self.customer)[0], 15)
+
+    def test_edits_and_deletes_move_balances(self):
+        self.post_history()
+        other = Customer.objects.create(name='Carol')
+        invoice = Invoice.objects.get(invoice_type='SALE', total_amount=8)
+        response = self.client.patch(f'/api/invoices/{invoice.id}/', {'customer': other.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.buckets(self.customer), [7, 3, 0, 4, 0, 0])
+        self.assertEqual(self.buckets(other), [8, 0, 0, 0, 0, 8])
+        self.client.patch(f'/api/invoices/{invoice.id}/', {'due_date': str(self.today)}, format='json')
+        self.assertEqual(self.buckets(other), [8, 8, 0, 0, 0, 0])
+
+        self.client.force_authenticate(User.objects.create_user('boss', password='pw', role='ADMIN'))
+        self.assertEqual(self.client.delete(f'/api/invoices/{invoice.id}/').status_code, 204)
+        self.assertEqual(self.buckets(other), [0, 0, 0, 0, 0, 0])
+        self.assertEqual(reconcile_balances(Customer), [])
+
+    def test_aging_endpoint_reads_only_party_rows(self):
+        self.post_history()
+        Customer.objects.create(name='Settled')
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/customers/aging/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'api_invoice' in q['sql']])
+        self.assertEqual(response.data['totals']['count'], 1)
+        self.assertEqual(response.data['totals']['aging_over_90'], '8.00')
+        [row] = response.data['results']
+        self.assertEqual((row['name'], row['balance'], row['aging_31_60']), ('Bob', '15.00', '4.00'))
+        self.assertEqual(self.client.get('/api/suppliers/aging/').data['totals']['aging_1_30'], '32.00')
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        self.post_history()
+        self.assertEqual(reconcile_balances(Customer), [])
+        Customer.objects.filter(pk=self.customer.pk).update(balance=0)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_balances', check=True, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('reconcile_balances', stdout=out)
+        self.assertIn('balance: stored 0.00, expected 15.00', out.getvalue())
+        self.assertEqual(self.buckets(self.customer), [15, 3, 0, 4, 0, 8])
+
+        # Ageing forward moves amounts along without counting as drift
+        self.assertEqual(reconcile_balances(Customer, as_of=self.today + timedelta(days=40)), [])
+        self.assertEqual(self.buckets(self.customer), [15, 1, 2, 0, 4, 8])
+        self.post_invoice('SALE', 64, due_in=-1, customer=self.customer.id)
+        self.assertEqual(self.buckets(self.customer), [79, 1, 2, 64, 4, 8])  # 41 days overdue as of aged_on
+        self.assertEqual(reconcile_balances(Customer, as_of=self.today + timedelta(days=40)), [])
+
+class ChangeFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('admin', password='pw', role='ADMIN'))
+        self.tools = Category.objects.create(name='Tools')
+        self.paint = Category.objects.create(name='Paint')
+        self.glue = Category.objects.create(name='Glue')
+
+    def sync(self, cursor):
+        response = self.client.get('/api/categories/', {'updated_since': cursor, 'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_returns_changes_and_deletions_since_cursor(self):
+        snapshot = self.sync('0')
+        self.assertEqual([row['name'] for row in snapshot['results']], ['Tools', 'Paint', 'Glue'])
+        self.assertEqual(snapshot['deleted'], [])
+        # The cursor trails the clock so in-flight writes are not skipped
+        self.assertLess(decode_cursor(snapshot['cursor']), timezone.now())
+
+        Category.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.client.patch(f'/api/categories/{self.paint.id}/', {'name': 'Paints'}, format='json')
+        Category.objects.create(name='Tape')
+        self.client.delete(f'/api/categories/{self.glue.id}/')
+
+        changes = self.sync(snapshot['cursor'])
+        self.assertEqual([row['name'] for row in changes['results']], ['Paints', 'Tape'])
+        self.assertEqual(changes['deleted'], [self.glue.id])
+        self.assertGreaterEqual(int(changes['cursor']), int(snapshot['cursor']))
+
+    def test_feed_pages_follow_next_to_the_end(self):
+        Category.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = encode_cursor(timezone.now() - timedelta(hours=2))
+        self.client.delete(f'/api/categories/{self.glue.id}/')
+        for name in ('Tape', 'Wax', 'Oil'):
+            Category.objects.create(name=name)
+
+        first = self.client.get('/api/categories/', {'updated_since': cursor, 'page_size': 2, 'fields': 'id,name'}).data
+        self.assertEqual([row['name'] for row in first['results']], ['Tools', 'Paint'])
+        self.assertEqual(first['deleted'], [self.glue.id])
+        # Rows written mid-pass sort after every position already served
+        Category.objects.create(name='Felt')
+        pages, url = [first], first['next']
+        while url:
+            pages.append(self.client.get(url).data)
+            url = pages[-1]['next']
+        self.assertEqual([row['name'] for page in pages for row in page['results']],
+                         ['Tools', 'Paint', 'Tape', 'Wax', 'Oil', 'Felt'])
+        self.assertEqual({page['cursor'] for page in pages}, {first['cursor']})
+        self.assertEqual([page['deleted'] for page in pages[1:]], [[], []])
+        self.assertEqual(set(pages[-1]['results'][0]), {'id', 'name'})
+
+        response = self.client.get('/api/categories/', {'updated_since': cursor, 'after': 'page-2'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_deletes_bump_rows_they_change(self):
+        widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=10, category=self.tools)
+        Product.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = encode_cursor(timezone.now() - timedelta(minutes=5))
+        self.client.delete(f'/api/categories/{self.tools.id}/')
+        [row] = self.client.get('/api/products/', {'updated_since': cursor, 'fields': 'id,category'}).data['results']
+        self.assertEqual(row, {'id': widget.id, 'category': None})
+
+    def test_party_balance_postings_show_up_in_feed(self):
+        customer = Customer.objects.create(name='Bob')
+        widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=10)
+        Customer.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = encode_cursor(timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.client.get('/api/customers/', {'updated_since': cursor}).data['results'], [])
+        self.client.post('/api/invoices/', {
+            'invoice_type': 'SALE', 'customer': customer.id,
+            'items': [{'product': widget.id, 'quantity': 2, 'unit_price': '1.00'}],
+        }, format='json')
+        cache.clear()  # Version bumps wait for a commit that never comes here
+        [row] = self.client.get('/api/customers/', {'updated_since': cursor}).data['results']
+        self.assertEqual(row['balance'], '2.00')
+
+    def test_prune_drops_only_expired_tombstones(self):
+        self.client.delete(f'/api/categories/{self.glue.id}/')
+        self.client.delete(f'/api/categories/{self.paint.id}/')
+        Tombstone.objects.filter(object_id=self.glue.id).update(deleted_at=timezone.now() - TOMBSTONE_RETENTION - timedelta(days=1))
+        call_command('prune_tombstones', stdout=io.StringIO())
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [self.paint.id])
+
+    def test_bad_and_expired_cursors(self):
+        response = self.client.get('/api/categories/', {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        expired = encode_cursor(timezone.now() - TOMBSTONE_RETENTION - timedelta(days=1))
+        self.assertEqual(self.client.get('/api/categories/', {'updated_since': expired}).status_code, 410)
+
+class RecordingBackend(LocalBackend):
+    """Stand-in for a cross-process backend: keeps what was published."""
+    in_process = False
+
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def publish(self, message):
+        self.published.append(message)
+        super().publish(message)
+
+class StockStreamTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('clerk', password='pw', role='EDITOR')
+        self.auth = f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}'
+        self.widget = Product.objects.create(name='Widget', sku='W-1', price=Decimal('2.00'), stock_quantity=10)
+
+    @override_settings(STOCK_BROADCAST_BACKEND='api.tests.RecordingBackend')
+    def test_committed_invoices_publish_stock_levels(self):
+        self.client.force_authenticate(self.user)
+        published = get_broadcaster().backend.published
+        published.clear()
+        for quantity in (3, 30):  # The second is refused for lack of stock
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/invoices/', {
+                    'invoice_type': 'SALE',
+                    'items': [{'product': self.widget.id, 'quantity': quantity, 'unit_price': '2.00'}],
+                }, format='json')
+        self.assertEqual(published, [('stock', [{'id': self.widget.id, 'stock_quantity': 7}])])
+
+    @override_settings(STOCK_BROADCAST_BACKEND='api.tests.RecordingBackend')
+    def test_catalog_import_publishes_stock_levels(self):
+        published = get_broadcaster().backend.published
+        published.clear()
+        upload = io.BytesIO(b'sku,name,price,stock_quantity\nW-1,Widget,2.00,25\nN-1,New,1.00,0\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductCatalogImport(upload).run()
+        self.assertEqual(published, [('stock', [{'id': self.widget.id, 'stock_quantity': 25}])])
+
+    async def test_broadcaster_fans_out_and_resets_slow_subscribers(self):
+        broadcaster = Broadcaster(LocalBackend())
+        self.assertFalse(broadcaster.has_listeners())
+        with broadcaster.subscribe() as first, broadcaster.subscribe() as second:
+            await asyncio.to_thread(broadcaster.publish, ('stock', [{'id': 1, 'stock_quantity': 5}]))
+            self.assertEqual(await first.get(), ('stock', [{'id': 1, 'stock_quantity': 5}]))
+            for _ in range(SUBSCRIBER_BUFFER):
+                broadcaster.publish(('stock', []))
+            await asyncio.sleep(0)
+            self.assertIsNone(await second.get())
+            self.assertEqual(await first.get(), ('stock', []))
+        self.assertFalse(broadcaster.has_listeners())
+
+    def test_stream_is_refused_under_wsgi(self):
+        response = self.client.get('/api/async/stream/stock/', headers={'Authorization': self.auth})
+        self.assertEqual(response.status_code, 501)
+
+    async def test_stream_sends_events_to_authenticated_clients(self):
+        self.assertEqual((await self.async_client.get('/api/async/stream/stock/')).status_code, 401)
+        response = await self.async_client.get('/api/async/stream/stock/', headers={'Authorization': self.auth})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b'retry:'))
+        get_broadcaster().publish(('stock', [{'id': self.widget.id, 'stock_quantity': 4}]))
+        event = await asyncio.wait_for(anext(events), 1)
+        self.assertEqual(event, b'event: stock\ndata: [{"id": %d, "stock_quantity": 4}]\n\n' % self.widget.id)
+        # A client disconnect cancels the response task while it waits
+        waiting = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertFalse(get_broadcaster().has_listeners())
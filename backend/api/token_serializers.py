@@ -8,6 +8,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
         token['role'] = user.role
         token['username'] = user.username
+        token['token_version'] = user.token_version
         return token
 
 class MyTokenObtainPairView(TokenObtainPairView):
@@ -1,8 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
+from .metrics import metrics_view
 from .views import (
     UserViewSet, CategoryViewSet, SupplierViewSet, 
-    CustomerViewSet, ProductViewSet, InvoiceViewSet
+    CustomerViewSet, ProductViewSet, InvoiceViewSet, DashboardViewSet, CacheViewSet,
+    ReportViewSet, JobViewSet
 )
 
 router = DefaultRouter()
@@ -12,7 +15,17 @@ router.register(r'suppliers', SupplierViewSet)
 router.register(r'customers', CustomerViewSet)
 router.register(r'products', ProductViewSet)
 router.register(r'invoices', InvoiceViewSet)
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
+router.register(r'cache', CacheViewSet, basename='cache')
+router.register(r'reports', ReportViewSet, basename='reports')
+router.register(r'jobs', JobViewSet)
 
 urlpatterns = [
+    path('metrics/', metrics_view, name='metrics'),
+    # Native async read endpoints, for deployment under ASGI
+    path('async/dashboard/summary/', async_views.dashboard_summary, name='async-dashboard-summary'),
+    path('async/stream/stock/', async_views.stock_stream, name='stock-stream'),
+    path('async/<str:resource>/', async_views.resource_list, name='async-list'),
+    path('async/<str:resource>/<int:pk>/', async_views.resource_detail, name='async-detail'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .caching import bump_generations
+from .models import ModelVersion
+
+def _bump(labels):
+    now = timezone.now()
+    for label in labels:
+        rows = ModelVersion.objects.filter(label=label)
+        if not rows.update(version=F('version') + 1, changed_at=now):
+            ModelVersion.objects.get_or_create(label=label)
+            rows.update(version=F('version') + 1, changed_at=now)
+    bump_generations(labels)
+
+def bump_versions(*models):
+    """Bump the change counters of ``models`` once the current transaction commits.
+
+    Bumping after commit means a reader can never pair a new version with
+    old rows; at worst it briefly pairs new rows with the old version and
+    simply re-fetches on its next request.
+    """
+    labels = [model._meta.label_lower for model in models]
+    transaction.on_commit(lambda: _bump(labels))
+
+def get_versions(models):
+    """Return ``{label: (version, changed_at)}`` for ``models``; untouched tables are ``(0, None)``."""
+    labels = [model._meta.label_lower for model in models]
+    found = {
+        label: (version, changed_at)
+        for label, version, changed_at in ModelVersion.objects.filter(label__in=labels)
+        .values_list('label', 'version', 'changed_at')
+    }
+    return {label: found.get(label, (0, None)) for label in labels}
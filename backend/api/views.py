@@ -1,18 +1,236 @@
-from rest_framework import viewsets, permissions, status
+import hashlib
+import heapq
+import json
+import logging
+from copy import copy
+from datetime import datetime, time, timedelta
+from itertools import islice
+from types import GeneratorType
+from operator import itemgetter
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import mixins, viewsets, permissions, status, serializers
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
-from .models import User, Category, Supplier, Customer, Product, Invoice
+from rest_framework.utils.urls import replace_query_param
+from .models import (
+    User, Category, Supplier, Customer, Product, Invoice, InvoiceItem, ArchivedInvoice, ArchivedInvoiceItem,
+    Job, LowStockEntry,
+)
 from .serializers import (
     UserSerializer, CategorySerializer, SupplierSerializer, CustomerSerializer,
-    ProductSerializer, InvoiceSerializer
+    ProductSerializer, InvoiceSerializer, JobSerializer, is_plain_id,
 )
 from .permissions import IsAdmin, IsEditor, IsViewer
+from .aging import aging_report, move_invoice_balance, record_invoice_balance
+from .archive import MergedRows
+from .dashboard import get_summary
+from .parsers import NDJSONParser
+from .exports import EXPORT_CHUNK_SIZE, INVOICE_CSV_FIELDS, export_response, get_export_format, invoice_csv_rows
+from .fastrows import FastRows
+from .filters import InvoiceFilterBackend, parse_day
+from .imports import ProductCatalogImport
+from .jobs import JOB_TYPES, enqueue, job_file_path, save_upload
+from .ledger import stock_at as ledger_stock_at
+from .sync import (
+    SYNC_LAG, TOMBSTONE_RETENTION, decode_cursor, decode_position, deleted_since, encode_cursor, encode_position,
+)
+from .search import MAX_SEARCH_LIMIT, SEARCH_LIMIT, search_products
+from .versioning import get_versions
+from .authentication import revoke_claims
+from .reports import (
+    DEFAULT_REPORT_DAYS, REPORT_DIMENSIONS, build_report, move_invoice_rollups, record_invoice_rollups, saved_items,
+)
+from .caching import get_cached_response, get_generations, get_stats, set_cached_response
+
+logger = logging.getLogger('api.bulk')
+
+BULK_CHUNK_SIZE = 200
+MAX_BULK_CHUNK_SIZE = 1000
+AGING_LIMIT = 100
+MAX_AGING_LIMIT = 1000
+# Invoice reads that honour ?include_archived=
+ARCHIVE_READ_ACTIONS = ('list', 'retrieve', 'export')
+
+class ConditionalGetMixin:
+    """Answers list/retrieve with ETag and Last-Modified derived from per-table
+    change counters, returning 304 before any serialization when the client's
+    copy is current.
+
+    With ``cache_responses`` (and a shared cache, see RESPONSE_CACHE) the
+    counters come from the cache instead of the database and rendered
+    payloads are cached under the ETag, so repeat reads never touch the ORM.
+    """
+    # Models whose changes can alter this endpoint's output; defaults to the queryset model
+    version_models = ()
+    cache_responses = False
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        models = self.version_models or (self.queryset.model,)
+        if self.uses_response_cache():
+            versions = get_generations(models)
+            last_modified = None
+        else:
+            versions = get_versions(models)
+            changed = [changed_at for _, changed_at in versions.values() if changed_at]
+            last_modified = int(max(changed).timestamp()) if changed else None
+        # The path carries pagination, ?fields= and filters, all of which shape the body
+        fingerprint = f"{request.get_full_path()}|{sorted(versions.items())}"
+        etag = '"%s"' % hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest()
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.cached_response(etag, handler, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Let browsers keep the body but revalidate on every use
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def uses_response_cache(self):
+        return self.cache_responses and settings.RESPONSE_CACHE
+
+    def cached_response(self, etag, handler, request, *args, **kwargs):
+        if not self.uses_response_cache():
+            return handler(request, *args, **kwargs)
+        key = f'response:{etag}'
+        data = get_cached_response(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_cached_response(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+def wants_background(request):
+    return request.query_params.get('background') in ('1', 'true')
+
+def enqueue_job(view, request, job_type, params, upload=None):
+    """Validate and queue a job on behalf of ``request.user``; answers 202 with the job."""
+    spec = JOB_TYPES.get(job_type)
+    if spec is None:
+        raise serializers.ValidationError({'job_type': f"Expected one of: {', '.join(sorted(JOB_TYPES))}."})
+    if not spec.permission().has_permission(request, view):
+        view.permission_denied(request)
+    if not isinstance(params, dict):
+        raise serializers.ValidationError({'params': 'Expected an object.'})
+    params = spec.clean(params)
+    if spec.needs_upload:
+        if upload is None:
+            raise serializers.ValidationError({'file': 'A file upload is required for this job type.'})
+        params['upload'] = save_upload(upload)
+    job = enqueue(job_type, params, user_id=request.user.pk)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': f'/api/jobs/{job.pk}/'})
+
+class FastReadMixin:
+    """Builds list pages and export rows from ``values_list()`` tuples
+    (api/fastrows.py) instead of model instances; the output is the same.
+    FAST_READS = False falls back to the serializers.
+    """
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_READS:
+            return super().list(request, *args, **kwargs)
+        rows = FastRows.for_serializer(self.get_serializer())
+        queryset = rows.values(self.filter_queryset(self.get_queryset()), named=True)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(rows.serialize(queryset))
+        return self.get_paginated_response(rows.serialize(page))
+
+    def export_rows(self, queryset):
+        if settings.FAST_READS:
+            rows = FastRows.for_serializer(self.get_serializer(), queryset.model)
+            return rows.iter_serialized(queryset, EXPORT_CHUNK_SIZE)
+        return (self.get_serializer(instance).data for instance in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+    def serialize_rows(self, queryset):
+        if settings.FAST_READS:
+            rows = FastRows.for_serializer(self.get_serializer(), queryset.model)
+            return rows.serialize(rows.values(queryset))
+        return self.get_serializer(queryset, many=True).data
+
+class ChangeFeedMixin:
+    """``?updated_since=<cursor>`` lists only the rows created or updated since
+    the cursor plus the ids deleted since then, with a cursor for the next
+    sync; ``0`` starts from a full copy. Filters do not apply.
+
+    Rows come in pages of ``page_size`` ordered by (updated_at, id). While
+    more remain, ``next`` links the following page; it carries the pass's
+    sync cursor in ``updated_since`` and where the page ended in ``after``,
+    and repeats neither the cursor's computation nor the deletions.
+
+    Rows are matched on their own updated_at, so fields read through a
+    relation (e.g. a product's category name) only refresh when the row does.
+    Deletes bump the rows they change through on_delete (api/sync.py), but
+    renames of a related row do not.
+    """
+    def list(self, request, *args, **kwargs):
+        if 'updated_since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.change_list(request)
+
+    def change_list(self, request):
+        started = timezone.now()
+        raw = request.query_params['updated_since']
+        since = decode_cursor(raw)
+        if raw != '0' and since < started - TOMBSTONE_RETENTION:
+            return Response({'error': 'Cursor is older than the deletion history; sync again from updated_since=0.'},
+                            status=status.HTTP_410_GONE)
+        model = self.queryset.model
+        after = request.query_params.get('after')
+        if after is None:
+            cursor = encode_cursor(max(since, started - SYNC_LAG))
+            deleted = [] if raw == '0' else deleted_since(model, since)
+            changed = self.get_queryset().filter(updated_at__gte=since)
+        else:
+            # A later page of the pass the first page returned ``raw`` for
+            cursor, deleted = raw, []
+            updated_at, pk = decode_position(after)
+            changed = self.get_queryset().filter(updated_at__gte=updated_at).exclude(updated_at=updated_at, pk__lte=pk)
+        changed = changed.order_by('updated_at', 'id')
+
+        page_size = self.paginator.get_page_size(request)
+        keys = list(changed.values_list('updated_at', 'id')[:page_size + 1])
+        next_link = None
+        if len(keys) > page_size:
+            keys = keys[:page_size]
+            next_link = replace_query_param(request.build_absolute_uri(), 'updated_since', cursor)
+            next_link = replace_query_param(next_link, 'after', encode_position(*keys[-1]))
+        return Response({
+            'cursor': cursor,
+            'next': next_link,
+            'results': self.serialize_rows(changed.filter(pk__in=[pk for _, pk in keys])),
+            'deleted': deleted,
+        })
+
+class BaseRBACViewSet(ConditionalGetMixin, ChangeFeedMixin, FastReadMixin, viewsets.ModelViewSet):
+    # Custom @action names that write data and so need Editor rights
+    extra_write_actions = []
 
-class BaseRBACViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['destroy']:
             permission_classes = [IsAdmin]
-        elif self.action in ['create', 'update', 'partial_update']:
+        elif self.action in ['create', 'update', 'partial_update', *self.extra_write_actions]:
             permission_classes = [IsEditor]
         else:
             permission_classes = [IsViewer]
@@ -30,6 +248,7 @@ class UserViewSet(viewsets.ModelViewSet):
         if role in dict(User.ROLES):
             user.role = role
             user.save()
+            revoke_claims(user)
             return Response({'status': 'role updated', 'role': role})
         return Response({'error': 'invalid role'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -46,22 +265,352 @@ class UserViewSet(viewsets.ModelViewSet):
 class CategoryViewSet(BaseRBACViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_responses = True
+
+class AgingMixin:
+    """``aging`` action: outstanding balances split by days overdue, read from
+    the fields invoice posting maintains (api/aging.py), never from invoices.
+    """
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        return self.conditional_response(request, self.aging_list)
 
-class SupplierViewSet(BaseRBACViewSet):
+    def aging_list(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', AGING_LIMIT)), MAX_AGING_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(aging_report(self.get_queryset(), max(limit, 1)))
+
+class SupplierViewSet(AgingMixin, BaseRBACViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
+    cache_responses = True
 
-class CustomerViewSet(BaseRBACViewSet):
+class CustomerViewSet(AgingMixin, BaseRBACViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    cache_responses = True
 
 class ProductViewSet(BaseRBACViewSet):
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('category', 'supplier')
     serializer_class = ProductSerializer
+    version_models = (Product, Category, Supplier)
+    extra_write_actions = ['import_csv']
+
+    def list(self, request, *args, **kwargs):
+        if 'search' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(request, self.search_list)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """``/products/search/?search=``: the same ranked matches as ``?search=`` on the list."""
+        if not request.query_params.get('search', '').strip():
+            return Response({'error': 'search is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.conditional_response(request, self.search_list)
+
+    def search_list(self, request):
+        # Ranked and capped rather than cursor-paginated; same envelope shape
+        try:
+            limit = min(int(request.query_params.get('limit', SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        products = search_products(request.query_params['search'], max(limit, 1), self.get_queryset())
+        serializer = self.get_serializer(products, many=True)
+        return Response({'next': None, 'previous': None, 'results': serializer.data})
+
+    @action(detail=False, methods=['get'])
+    def low_stock(self, request):
+        return self.conditional_response(request, self.low_stock_list)
+
+    def low_stock_list(self, request):
+        # Reads the low-stock set, not the catalog; most recently flagged first
+        entries = list(
+            LowStockEntry.objects.select_related('product__category', 'product__supplier').order_by('-since', '-product_id')
+        )
+        results = self.get_serializer([entry.product for entry in entries], many=True).data
+        for row, entry in zip(results, entries):
+            row['low_stock_since'] = entry.since
+        return Response({'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'CSV file required in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+        if wants_background(request):
+            return enqueue_job(self, request, 'import_products', {}, upload)
+        return Response(ProductCatalogImport(upload.file).run())
+
+    @action(detail=True, methods=['get'])
+    def stock_at(self, request, pk=None):
+        """Stock level as of ``?at=`` (ISO datetime, or a date meaning end of that day)."""
+        product = self.get_object()
+        raw = request.query_params.get('at')
+        when = timezone.now()
+        if raw:
+            # Check for a bare date first; parse_datetime also accepts one as midnight.
+            # Both raise ValueError for well-formed but impossible values (2020-13-45)
+            try:
+                day = parse_date(raw)
+                when = datetime.combine(day, time.max) if day else parse_datetime(raw)
+            except ValueError:
+                when = None
+            if when is None:
+                return Response({'error': 'at must be an ISO date or datetime'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        stock, snapshot = ledger_stock_at(product.pk, when)
+        return Response({
+            'product': product.pk,
+            'sku': product.sku,
+            'at': when,
+            'stock_quantity': stock,
+            'snapshot_at': snapshot.taken_at if snapshot else None,
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        if wants_background(request):
+            return enqueue_job(self, request, 'export_products', request.query_params.dict())
+        export_format = get_export_format(request)
+        rows = self.export_rows(self.filter_queryset(self.get_queryset()).order_by('id'))
+        return export_response(rows, list(self.get_serializer().fields), export_format, 'products')
+
+class CacheViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdmin]
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(get_stats())
+
+class DashboardViewSet(viewsets.ViewSet):
+    permission_classes = [IsViewer]
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        return Response(get_summary())
+
+class ReportViewSet(viewsets.ViewSet):
+    """Sales and purchase totals from the daily rollups.
+
+    ``?group_by=`` one of REPORT_DIMENSIONS (default ``day``), an inclusive
+    ``date_from``/``date_to`` range (default the last 30 days) and an
+    optional ``invoice_type``.
+    """
+    permission_classes = [IsViewer]
+
+    def list(self, request):
+        params = request.query_params
+        group_by = params.get('group_by', 'day')
+        if group_by not in REPORT_DIMENSIONS:
+            raise serializers.ValidationError({'group_by': f"Expected one of {', '.join(REPORT_DIMENSIONS)}."})
+        invoice_type = params.get('invoice_type')
+        if invoice_type and invoice_type not in dict(Invoice.INVOICE_TYPES):
+            raise serializers.ValidationError({'invoice_type': 'Expected PURCHASE or SALE.'})
+        date_to = parse_day(params.get('date_to'), 'date_to') or timezone.localdate()
+        date_from = parse_day(params.get('date_from'), 'date_from') or date_to - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+        if date_from > date_to:
+            raise serializers.ValidationError({'date_from': 'Must not be after date_to.'})
+        return Response({
+            'group_by': group_by,
+            'date_from': date_from,
+            'date_to': date_to,
+            'invoice_type': invoice_type,
+            'results': build_report(group_by, date_from, date_to, invoice_type),
+        })
+
+class JobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Queue background work and follow its status and progress.
+
+    POST ``{"job_type": ..., "params": {...}}``; ``import_products`` is sent
+    as multipart with the CSV in ``file``. Admins see every job, other
+    users only their own.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsViewer]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.role != 'ADMIN':
+            queryset = queryset.filter(created_by_id=self.request.user.pk)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        params = request.data.get('params') or {}
+        if isinstance(params, str):
+            # Multipart bodies carry params as a JSON string
+            try:
+                params = json.loads(params)
+            except ValueError:
+                raise serializers.ValidationError({'params': 'Expected a JSON object.'})
+        return enqueue_job(self, request, request.data.get('job_type'), params, request.FILES.get('file'))
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        name = (job.result or {}).get('file') if job.status == 'SUCCEEDED' else None
+        if not name or not job_file_path(name).exists():
+            raise Http404('No file for this job')
+        return FileResponse(open(job_file_path(name), 'rb'), as_attachment=True, filename=name)
 
 class InvoiceViewSet(BaseRBACViewSet):
-    queryset = Invoice.objects.all()
+    """Invoices of open periods. Reads take ``?include_archived=1`` to also
+    cover closed periods (see api/archive.py); writes only see open ones.
+    """
+    queryset = Invoice.objects.select_related('supplier', 'customer', 'user').prefetch_related(
+        Prefetch('items', queryset=InvoiceItem.objects.select_related('product'))
+    )
+    archived_queryset = ArchivedInvoice.objects.select_related('supplier', 'customer', 'user').prefetch_related(
+        Prefetch('items', queryset=ArchivedInvoiceItem.objects.select_related('product'))
+    )
     serializer_class = InvoiceSerializer
 
+    filter_backends = [InvoiceFilterBackend]
+    # Archiving also bumps Invoice, so ArchivedInvoice needs no counter of its own
+    version_models = (Invoice, Supplier, Customer, Product, User)
+    extra_write_actions = ['bulk']
+
+    def include_archived(self):
+        return (self.action in ARCHIVE_READ_ACTIONS
+                and self.request.query_params.get('include_archived') in ('1', 'true'))
+
+    def list(self, request, *args, **kwargs):
+        # Change feeds cover open periods only; archiving shows up as deletions
+        if not self.include_archived() or 'updated_since' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(request, self.archive_list)
+
+    def archive_list(self, request):
+        rows = MergedRows(
+            [self.filter_queryset(queryset) for queryset in (self.get_queryset(), self.archived_queryset.all())],
+            self.serialize_rows,
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(rows[:])
+        return self.get_paginated_response(page)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if not self.include_archived():
+                raise
+        invoice = get_object_or_404(self.filter_queryset(self.archived_queryset.all()), pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, invoice)
+        return invoice
+
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # request.user may be a claims-only user, so assign by id
+        serializer.save(user_id=self.request.user.pk)
+
+    def perform_update(self, serializer):
+        before = copy(serializer.instance)
+        with transaction.atomic():
+            invoice = serializer.save()
+            move_invoice_balance(before, invoice)
+            move_invoice_rollups(before, invoice)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            record_invoice_balance(instance, reverse=True)
+            record_invoice_rollups(instance, saved_items(instance), reverse=True)
+            instance.delete()
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Ingest a JSON array or NDJSON stream of invoices in chunked transactions.
+
+        Each invoice is saved in its own savepoint, so a bad record is reported
+        in the results without rolling back the rest of its chunk.
+        """
+        records = request.data
+        # A JSON array, or the lazy generator NDJSONParser returns
+        if not isinstance(records, (list, GeneratorType)):
+            return Response({'error': 'Expected a JSON array or NDJSON stream of invoices'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', BULK_CHUNK_SIZE))
+        except ValueError:
+            return Response({'error': 'chunk_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        chunk_size = max(1, min(chunk_size, MAX_BULK_CHUNK_SIZE))
+
+        results = []
+        records = enumerate(records)
+        while chunk := list(islice(records, chunk_size)):
+            results.extend(self._ingest_chunk(chunk))
+
+        created = sum(1 for result in results if 'id' in result)
+        return Response({'created': created, 'failed': len(results) - created, 'results': results})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream invoices as NDJSON (one nested invoice per line) or CSV (one row per item).
+
+        Rows are fetched one chunk at a time, so memory stays flat regardless
+        of history size; ``?include_archived=1`` merges in closed periods.
+        With ``?background=1`` the file is written by a worker instead (see
+        /api/jobs/).
+        """
+        if wants_background(request):
+            return enqueue_job(self, request, 'export_invoices', request.query_params.dict())
+        export_format = get_export_format(request)
+        sources = [self.get_queryset()]
+        if self.include_archived():
+            sources.append(self.archived_queryset.all())
+        invoices = [self.filter_queryset(queryset).order_by('id') for queryset in sources]
+        if export_format == 'ndjson':
+            rows = heapq.merge(*map(self.export_rows, invoices), key=itemgetter('id'))
+        else:
+            rows = heapq.merge(*map(invoice_csv_rows, invoices), key=itemgetter('invoice_id'))
+        return export_response(rows, INVOICE_CSV_FIELDS, export_format, 'invoices')
+
+    def _ingest_chunk(self, chunk):
+        invoices = [raw for _, raw in chunk if isinstance(raw, dict)]
+        context = {**self.get_serializer_context(), 'preloaded': self._preload_related(invoices)}
+        results = []
+        with transaction.atomic():
+            for index, raw in chunk:
+                if isinstance(raw, Exception):
+                    results.append({'index': index, 'errors': [str(raw)]})
+                    continue
+                if not isinstance(raw, dict):
+                    results.append({'index': index, 'errors': ['Expected an invoice object']})
+                    continue
+                serializer = InvoiceSerializer(data=raw, context=context)
+                try:
+                    # Validation may query too, so it shares the invoice's savepoint
+                    with transaction.atomic():
+                        if not serializer.is_valid():
+                            results.append({'index': index, 'errors': serializer.errors})
+                            continue
+                        invoice = serializer.save(user_id=self.request.user.pk)
+                except serializers.ValidationError as exc:
+                    results.append({'index': index, 'errors': exc.detail})
+                    continue
+                except DatabaseError:
+                    # Rolled back to the savepoint; the rest of the chunk carries on
+                    logger.exception("Bulk invoice %s failed to save", index)
+                    results.append({'index': index, 'errors': ['Database error; the invoice was not saved']})
+                    continue
+                results.append({'index': index, 'id': invoice.id})
+        return results
+
+    def _preload_related(self, invoices):
+        # One query per related table for the whole chunk instead of one per id
+        def ids(values):
+            return {int(v) for v in values if is_plain_id(v)}
+
+        product_ids = ids(
+            item.get('product') for invoice in invoices if isinstance(invoice.get('items'), list)
+            for item in invoice['items'] if isinstance(item, dict)
+        )
+        return {
+            Product: Product.objects.in_bulk(product_ids),
+            Supplier: Supplier.objects.in_bulk(ids(invoice.get('supplier') for invoice in invoices)),
+            Customer: Customer.objects.in_bulk(ids(invoice.get('customer') for invoice in invoices)),
+        }
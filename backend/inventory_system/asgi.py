@@ -13,4 +13,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_system.settings')
 
+# Serve with an ASGI server (e.g. uvicorn inventory_system.asgi:application)
+# for /api/async/ reads and the /api/async/stream/stock/ event stream, whose
+# idle connections then wait on the event loop rather than on threads.
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its total covers the rest of the stack
+    'api.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,12 +80,80 @@ WSGI_APPLICATION = 'inventory_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_PROFILE selects the backend: 'sqlite' (default) or 'postgres'.
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'inventory'),
+            'USER': os.environ.get('DB_USER', 'inventory'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Verify a reused connection before handing it to a request
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DB_POOL', '1') == '1':
+        # psycopg connection pool (requires psycopg[pool]); pooling replaces CONN_MAX_AGE
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+                'timeout': 10,
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # Keep connections (and their PRAGMAs) across requests
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                # WAL lets readers proceed during a write; NORMAL sync is safe with WAL
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                # busy_timeout, in seconds: wait for the write lock instead of failing
+                'timeout': 20,
+                # Take the write lock at BEGIN so a transaction never fails
+                # mid-way upgrading a read lock ("database is locked")
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Backs the dashboard snapshot and the reference-data response cache.
+# locmem is per-process: when running several workers (the job worker
+# included) set DJANGO_CACHE_DIR so they share one file cache and a write
+# in one invalidates all of them.
+
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
     }
-}
+
+# Cached response payloads are only safe when every process sees the same
+# cache, otherwise one serves stale rows after another's write; without a
+# shared cache the endpoints fall back to database-checked ETags.
+RESPONSE_CACHE = bool(os.environ.get('DJANGO_CACHE_DIR'))
 
 
 # Password validation
@@ -123,10 +194,25 @@ STATIC_URL = 'static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'api.authentication.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.IdCursorPagination',
+    'PAGE_SIZE': 100,
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.fastrows.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# List and export reads are built from values_list() rows (api/fastrows.py);
+# FAST_READS=0 serves them through the DRF serializers instead.
+FAST_READS = os.environ.get('FAST_READS', '1') == '1'
+
+# Fan-out for the live stock stream (api/broadcast.py). The local backend
+# only reaches clients of the same process: serve the stream from one ASGI
+# worker, or point this at a backend that relays between workers.
+STOCK_BROADCAST_BACKEND = 'api.broadcast.LocalBackend'
+
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -134,5 +220,28 @@ SIMPLE_JWT = {
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_EXPOSE_HEADERS = ['Server-Timing']
+
+# Request metrics (api/metrics.py). SLOW_QUERY_MS turns on the slow-query
+# log; METRICS_TOKEN, when set, must be sent as a Bearer token to /api/metrics/
+# (for a scraper), which otherwise takes an admin's access token.
+SLOW_QUERY_MS = float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Background jobs (api/jobs.py, run_worker): uploads waiting to be imported
+# and finished export files. Must be shared by the web and worker processes.
+JOB_FILES_DIR = Path(os.environ.get('JOB_FILES_DIR', BASE_DIR / 'job_files'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.slow_queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'api.jobs': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
 
 AUTH_USER_MODEL = 'api.User'
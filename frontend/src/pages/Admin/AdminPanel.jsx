@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import api from '../../services/api';
+import api, { fetchAll } from '../../services/api';
 import { UserCheck, Shield, Plus, X, Key } from 'lucide-react';
 
 const AdminPanel = () => {
@@ -22,8 +22,7 @@ const AdminPanel = () => {
 
     const fetchUsers = async () => {
         try {
-            const res = await api.get('users/');
-            setUsers(res.data);
+            setUsers(await fetchAll('users/'));
         } catch (error) {
             console.error("Failed to fetch users");
         }
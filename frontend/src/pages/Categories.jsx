@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import api from '../services/api';
+import api, { fetchAll } from '../services/api';
 import { Plus, Edit, Trash2 } from 'lucide-react';
 
 const Categories = () => {
@@ -12,8 +12,7 @@ const Categories = () => {
 
     const fetchCategories = async () => {
         try {
-            const res = await api.get('categories/');
-            setCategories(res.data);
+            setCategories(await fetchAll('categories/'));
         } catch (error) { console.error("Failed to fetch categories"); }
     };
 
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import api from '../services/api';
+import api, { fetchAll } from '../services/api';
 import { Plus, Edit, Trash2 } from 'lucide-react';
 
 const Customers = () => {
@@ -12,8 +12,7 @@ const Customers = () => {
 
     const fetchCustomers = async () => {
         try {
-            const res = await api.get('customers/');
-            setCustomers(res.data);
+            setCustomers(await fetchAll('customers/'));
         } catch (error) { console.error("Failed to fetch customers"); }
     };
 
@@ -15,30 +15,18 @@ const Dashboard = () => {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [productsRes, categoriesRes] = await Promise.all([
-                    api.get('products/'),
-                    api.get('categories/')
-                ]);
-
-                const products = productsRes.data;
-                const totalValue = products.reduce((acc, curr) => acc + (parseFloat(curr.price) * curr.stock_quantity), 0);
-                const lowStock = products.filter(p => p.stock_quantity < 10).length;
+                const res = await api.get('dashboard/summary/');
+                const summary = res.data;
 
                 setStats({
-                    productsCount: products.length,
-                    totalValue: totalValue.toFixed(2),
-                    lowStockCount: lowStock,
-                    categoriesCount: categoriesRes.data.length
+                    productsCount: summary.products_count,
+                    totalValue: summary.total_value,
+                    lowStockCount: summary.low_stock_count,
+                    categoriesCount: summary.categories_count
                 });
 
-                // Prepare Chart Data (Category distribution)
-                const catMap = {};
-                products.forEach(p => {
-                    const catName = p.category_name || 'Uncategorized';
-                    catMap[catName] = (catMap[catName] || 0) + 1;
-                });
-                const data = Object.keys(catMap).map(key => ({ name: key, count: catMap[key] }));
-                setChartData(data);
+                // Category distribution is aggregated server-side
+                setChartData(summary.category_distribution);
 
             } catch (error) {
                 console.error("Error loading dashboard data", error);
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../../services/api';
+import api, { streamEvents, syncList } from '../../services/api';
 import { Plus, Trash2, Save, X } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 
@@ -30,20 +30,50 @@ const CreateInvoice = () => {
         fetchMetadata();
     }, []);
 
+    useEffect(() => {
+        // Live stock from other terminals; after a reset or a dropped stream, catch up and reconnect
+        const controller = new AbortController();
+        const listen = async () => {
+            while (!controller.signal.aborted) {
+                try {
+                    await streamEvents('async/stream/stock/', (event, data) => {
+                        if (event === 'stock') applyStock(data);
+                    }, controller.signal);
+                } catch (error) {
+                    // 501: the backend runs under WSGI, which cannot hold the stream open
+                    if (controller.signal.aborted || error.status === 501) return;
+                }
+                await new Promise((resolve) => setTimeout(resolve, 3000));
+                if (!controller.signal.aborted) fetchMetadata();
+            }
+        };
+        listen();
+        return () => controller.abort();
+    }, []);
+
+    const applyStock = (rows) => {
+        const levels = new Map(rows.map((row) => [row.id, row.stock_quantity]));
+        setMetadata((prev) => ({
+            ...prev,
+            products: prev.products.map((p) => (levels.has(p.id) ? { ...p, stock_quantity: levels.get(p.id) } : p)),
+        }));
+        setItems((prev) => prev.map((item) => {
+            const id = parseInt(item.product);
+            return levels.has(id) ? { ...item, stock: levels.get(id) } : item;
+        }));
+    };
+
     const fetchMetadata = async () => {
         try {
-            const [supRes, custRes, prodRes, catRes] = await Promise.all([
-                api.get('suppliers/'),
-                api.get('customers/'),
-                api.get('products/'),
-                api.get('categories/')
+            // Dropdowns only need a few columns; later opens fetch just the changes
+            const names = { fields: 'id,name' };
+            const [suppliers, customers, products, categories] = await Promise.all([
+                syncList('suppliers/', names),
+                syncList('customers/', names),
+                syncList('products/', { fields: 'id,name,sku,price,stock_quantity' }),
+                syncList('categories/', names)
             ]);
-            setMetadata({
-                suppliers: supRes.data,
-                customers: custRes.data,
-                products: prodRes.data,
-                categories: catRes.data
-            });
+            setMetadata({ suppliers, customers, products, categories });
         } catch (error) {
             console.error("Error fetching metadata");
         }
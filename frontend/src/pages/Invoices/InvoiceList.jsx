@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import api from '../../services/api';
+import api, { fetchAll } from '../../services/api';
 import { Plus, Eye, ArrowUpRight, ArrowDownLeft } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 
@@ -13,8 +13,7 @@ const InvoiceList = () => {
 
     const fetchInvoices = async () => {
         try {
-            const res = await api.get('invoices/');
-            setInvoices(res.data);
+            setInvoices(await fetchAll('invoices/'));
         } catch (error) {
             console.error("Failed to fetch invoices");
         }
@@ -1,37 +1,74 @@
 import React, { useEffect, useState } from 'react';
-import api from '../services/api';
+import api, { fetchAll } from '../services/api';
 import { Plus, Edit, Trash2, Search } from 'lucide-react';
 
+// Catalog rows fetched per page; "Load more" follows the cursor's `next` link
+const PAGE_SIZE = 50;
+
 const Products = () => {
     const [products, setProducts] = useState([]);
+    const [nextPage, setNextPage] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [categories, setCategories] = useState([]);
     const [suppliers, setSuppliers] = useState([]);
     const [isModalOpen, setIsModalOpen] = useState(false);
     const [currentProduct, setCurrentProduct] = useState({
-        name: '', sku: '', description: '', price: '', stock_quantity: 0, category: '', supplier: ''
+        name: '', sku: '', description: '', price: '', stock_quantity: 0, reorder_level: 10, category: '', supplier: ''
     });
     const [isEditing, setIsEditing] = useState(false);
     const [searchTerm, setSearchTerm] = useState('');
+    const [searchResults, setSearchResults] = useState([]);
 
     useEffect(() => {
         fetchProducts();
         fetchMetadata();
     }, []);
 
+    // Search runs server-side against the product index, debounced per keystroke
+    useEffect(() => {
+        const term = searchTerm.trim();
+        if (!term) return;
+        const timer = setTimeout(async () => {
+            try {
+                const res = await api.get('products/search/', { params: { search: term, limit: 50 } });
+                setSearchResults(res.data.results);
+            } catch (error) {
+                console.error("Failed to search products");
+            }
+        }, 250);
+        return () => clearTimeout(timer);
+    }, [searchTerm]);
+
+    // Starts over from the newest page, e.g. after an edit
     const fetchProducts = async () => {
         try {
-            const res = await api.get('products/');
-            setProducts(res.data);
+            const res = await api.get('products/', { params: { page_size: PAGE_SIZE } });
+            setProducts(res.data.results);
+            setNextPage(res.data.next);
         } catch (error) {
             console.error("Failed to fetch products");
         }
     };
 
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const res = await api.get(nextPage);
+            setProducts((loaded) => [...loaded, ...res.data.results]);
+            setNextPage(res.data.next);
+        } catch (error) {
+            console.error("Failed to fetch more products");
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const fetchMetadata = async () => {
         try {
-            const [catRes, supRes] = await Promise.all([api.get('categories/'), api.get('suppliers/')]);
-            setCategories(catRes.data);
-            setSuppliers(supRes.data);
+            const params = { fields: 'id,name' };
+            const [cats, sups] = await Promise.all([fetchAll('categories/', params), fetchAll('suppliers/', params)]);
+            setCategories(cats);
+            setSuppliers(sups);
         } catch (error) {
             console.error("Failed to fetch metadata");
         }
@@ -54,7 +91,7 @@ const Products = () => {
             }
             setIsModalOpen(false);
             fetchProducts();
-            setCurrentProduct({ name: '', sku: '', description: '', price: '', stock_quantity: 0, category: '', supplier: '' });
+            setCurrentProduct({ name: '', sku: '', description: '', price: '', stock_quantity: 0, reorder_level: 10, category: '', supplier: '' });
         } catch (error) {
             alert("Error saving product");
         }
@@ -66,12 +103,12 @@ const Products = () => {
             setCurrentProduct(product);
         } else {
             setIsEditing(false);
-            setCurrentProduct({ name: '', sku: '', description: '', price: '', stock_quantity: 0, category: '', supplier: '' });
+            setCurrentProduct({ name: '', sku: '', description: '', price: '', stock_quantity: 0, reorder_level: 10, category: '', supplier: '' });
         }
         setIsModalOpen(true);
     };
 
-    const filteredProducts = products.filter(p => p.name.toLowerCase().includes(searchTerm.toLowerCase()) || p.sku.toLowerCase().includes(searchTerm.toLowerCase()));
+    const filteredProducts = searchTerm.trim() ? searchResults : products;
 
     return (
         <div className="space-y-6">
@@ -116,7 +153,7 @@ const Products = () => {
                                     </span>
                                 </td>
                                 <td className="p-4">${product.price}</td>
-                                <td className={`p-4 font-bold ${product.stock_quantity < 10 ? 'text-red-400' : 'text-green-400'}`}>
+                                <td className={`p-4 font-bold ${product.stock_quantity < product.reorder_level ? 'text-red-400' : 'text-green-400'}`}>
                                     {product.stock_quantity}
                                 </td>
                                 <td className="p-4 flex gap-3">
@@ -128,6 +165,13 @@ const Products = () => {
                     </tbody>
                 </table>
                 {filteredProducts.length === 0 && <div className="p-8 text-center text-gray-500">No products found.</div>}
+                {!searchTerm.trim() && nextPage && (
+                    <div className="p-4 text-center border-t border-gray-700">
+                        <button onClick={loadMore} disabled={loadingMore} className="px-4 py-2 rounded bg-gray-700 hover:bg-gray-600 disabled:opacity-50">
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
 
             {isModalOpen && (
@@ -137,9 +181,10 @@ const Products = () => {
                         <form onSubmit={handleSubmit} className="space-y-4">
                             <input className="w-full p-2 rounded bg-gray-700 border border-gray-600" placeholder="Product Name" value={currentProduct.name} onChange={e => setCurrentProduct({ ...currentProduct, name: e.target.value })} required />
                             <input className="w-full p-2 rounded bg-gray-700 border border-gray-600" placeholder="SKU" value={currentProduct.sku} onChange={e => setCurrentProduct({ ...currentProduct, sku: e.target.value })} required />
-                            <div className="grid grid-cols-2 gap-4">
+                            <div className="grid grid-cols-3 gap-4">
                                 <input className="w-full p-2 rounded bg-gray-700 border border-gray-600" type="number" placeholder="Price" value={currentProduct.price} onChange={e => setCurrentProduct({ ...currentProduct, price: e.target.value })} required />
                                 <input className="w-full p-2 rounded bg-gray-700 border border-gray-600" type="number" placeholder="Stock" value={currentProduct.stock_quantity} onChange={e => setCurrentProduct({ ...currentProduct, stock_quantity: e.target.value })} required />
+                                <input className="w-full p-2 rounded bg-gray-700 border border-gray-600" type="number" min="0" placeholder="Reorder Level" title="Reorder Level" value={currentProduct.reorder_level} onChange={e => setCurrentProduct({ ...currentProduct, reorder_level: e.target.value })} required />
                             </div>
                             <select className="w-full p-2 rounded bg-gray-700 border border-gray-600" value={currentProduct.category || ''} onChange={e => setCurrentProduct({ ...currentProduct, category: e.target.value })}>
                                 <option value="">Select Category</option>
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import api from '../services/api';
+import api, { fetchAll } from '../services/api';
 import { Plus, Edit, Trash2 } from 'lucide-react';
 
 const Suppliers = () => {
@@ -12,8 +12,7 @@ const Suppliers = () => {
 
     const fetchSuppliers = async () => {
         try {
-            const res = await api.get('suppliers/');
-            setSuppliers(res.data);
+            setSuppliers(await fetchAll('suppliers/'));
         } catch (error) { console.error("Failed to fetch suppliers"); }
     };
 
@@ -41,4 +41,84 @@ api.interceptors.response.use(
     }
 );
 
+// List endpoints are cursor-paginated; follow `next` links until exhausted.
+export const fetchAll = async (url, params = {}) => {
+    let results = [];
+    let next = url;
+    let query = { page_size: 1000, ...params };
+    while (next) {
+        const res = await api.get(next, { params: query });
+        results = results.concat(res.data.results);
+        next = res.data.next;
+        query = undefined; // `next` already carries the query string
+    }
+    return results;
+};
+
+// Local copies of list endpoints kept current through their ?updated_since=
+// change feeds, so reopening a form only downloads what changed. Feeds are
+// paged; `next` links are followed until the copy has caught up.
+const syncedLists = new Map();
+
+export const syncList = async (url, params = {}) => {
+    const key = `${url}?${new URLSearchParams(params)}`;
+    const local = syncedLists.get(key) || { cursor: '0', rows: new Map() };
+    let next = url;
+    let query = { page_size: 1000, ...params, updated_since: local.cursor };
+    let cursor;
+    while (next) {
+        let res;
+        try {
+            res = await api.get(next, { params: query });
+        } catch (error) {
+            if (error.response?.status !== 410) throw error;
+            // Cursor outlived the deletion history; start over from a full copy
+            syncedLists.delete(key);
+            return syncList(url, params);
+        }
+        // Deletions first: a recreated id can appear in both
+        res.data.deleted.forEach((id) => local.rows.delete(id));
+        res.data.results.forEach((row) => local.rows.set(row.id, row));
+        cursor = res.data.cursor;
+        next = res.data.next;
+        query = undefined; // `next` already carries the query string
+    }
+    // Only a finished pass moves the cursor on
+    local.cursor = cursor;
+    syncedLists.set(key, local);
+    return [...local.rows.values()];
+};
+
+// Server-Sent Events read through fetch, which unlike EventSource can send
+// the Authorization header. Calls onEvent(name, data) until the stream ends.
+export const streamEvents = async (path, onEvent, signal) => {
+    const res = await fetch(`${api.defaults.baseURL}${path}`, {
+        headers: { Authorization: `Bearer ${localStorage.getItem('access')}` },
+        signal,
+    });
+    if (!res.ok) {
+        const error = new Error(`Stream failed with ${res.status}`);
+        error.status = res.status;
+        throw error;
+    }
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+            let event = 'message';
+            let data = '';
+            buffer.slice(0, end).split('\n').forEach((line) => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            buffer = buffer.slice(end + 2);
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+};
+
 export default api;